@@ -0,0 +1 @@
+from .fakes import FakeJinaServer, FakeChatGenerator, FakeGeminiClient, SyntheticPages, load_recorded_payloads
@@ -0,0 +1,318 @@
+import hashlib
+import json
+import math
+import random
+import string
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from itertools import product
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from haystack import component
+from haystack.dataclasses import ChatMessage, StreamingChunk, StreamingCallbackT, ToolCall
+
+if TYPE_CHECKING:
+    import tiktoken
+
+# Vocabulary of the synthetic pages, sized so that distinct pages share few shingles
+_WORDS = [
+    f"{stem}{suffix}"
+    for stem in ("market", "build", "permit", "energy", "policy", "model", "agent", "search", "report", "source",
+                 "house", "contract", "budget", "region", "study", "metric", "user", "design", "system", "cost")
+    for suffix in ("", "s", "ing", "ed", "al", "ity", "er", "ion")
+]
+
+
+def _rng(*keys: Any) -> random.Random:
+    digest = hashlib.blake2b(json.dumps(keys).encode("utf-8"), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+class SyntheticPages:
+    """Deterministic page texts of a given size, assembled from a fixed pool of paragraphs."""
+
+    def __init__(self, page_chars: int, seed: int = 0, pool_size: int = 256, paragraph_chars: int = 400):
+        self.page_chars = page_chars
+        self.seed = seed
+        rng = random.Random(seed)
+        self.paragraphs = []
+        for _ in range(pool_size):
+            words = []
+            while sum(len(word) + 1 for word in words) < paragraph_chars:
+                words.append(rng.choice(_WORDS))
+            self.paragraphs.append(" ".join(words).capitalize() + ".")
+
+    def content(self, query: str, idx: int) -> str:
+        rng = _rng(self.seed, query, idx)
+        parts = [f"# {query} ({idx})"]
+        size = len(parts[0])
+        while size < self.page_chars:
+            paragraph = rng.choice(self.paragraphs)
+            parts.append(paragraph)
+            size += len(paragraph) + 2
+        return "\n\n".join(parts)[:self.page_chars]
+
+    def payload(self, query: str, num: int) -> Dict[str, Any]:
+        data = []
+        for idx in range(num):
+            content = self.content(query, idx)
+            slug = hashlib.blake2b(query.encode("utf-8"), digest_size=6).hexdigest()
+            data.append({
+                "url": f"https://bench.example/{slug}/{idx}",
+                "title": f"{query} ({idx})",
+                "description": content[:160],
+                "content": content,
+                "usage": {"tokens": math.ceil(len(content) / 4)},
+            })
+        return {
+            "code": 200,
+            "data": data,
+            "meta": {"usage": {"tokens": sum(page["usage"]["tokens"] for page in data)}},
+        }
+
+
+def load_recorded_payloads(path: str | Path) -> List[Dict[str, Any]]:
+    """Reads Jina search response bodies (with "data" and "meta.usage"), one JSON object per line."""
+    payloads = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                payloads.append(json.loads(line))
+    if not payloads:
+        raise ValueError(f"{path} holds no recorded payloads")
+    return payloads
+
+
+class FakeJinaServer:
+    """
+    Local HTTP stand-in for s.jina.ai. Serves recorded response bodies (chosen by query, cut to the
+    requested page count) or synthetic pages of page_chars characters after latency seconds.
+    """
+
+    def __init__(
+        self,
+        page_chars: int = 8000,
+        latency: float = 0.0,
+        recorded_payloads: Optional[List[Dict[str, Any]]] = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.recorded_payloads = recorded_payloads
+        self.pages = SyntheticPages(page_chars, seed)
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def payload(self, query: str, num: int) -> Dict[str, Any]:
+        if not self.recorded_payloads:
+            return self.pages.payload(query, num)
+        recorded = self.recorded_payloads[_rng(query).randrange(len(self.recorded_payloads))]
+        data = recorded["data"][:num]
+        return {**recorded, "data": data, "meta": {"usage": {"tokens": sum(page["usage"]["tokens"] for page in data)}}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                query = params.get("q", [""])[0]
+                num = int(params.get("num", ["5"])[0])
+                body = json.dumps(server.payload(query, num)).encode("utf-8")
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeJinaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-jina", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _fake_value(schema: Dict[str, Any], defs: Dict[str, Any], name: str, rng: random.Random, serial: int) -> Any:
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs, name, rng, serial)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return _fake_value(options[0], defs, name, rng, serial)
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {key: _fake_value(value, defs, key, rng, serial) for key, value in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [_fake_value(schema.get("items", {}), defs, name, rng, serial * 10 + idx) for idx in range(3)]
+    if schema_type == "integer":
+        return min(max(3, schema.get("minimum", 3)), schema.get("maximum", 5))
+    if schema_type == "number":
+        return 0.5
+    if schema_type == "boolean":
+        return True
+    # strings are unique per reply, so that generated search queries are never repeats
+    return f"{name.replace('_', ' ')} {serial} " + " ".join(rng.choice(_WORDS) for _ in range(6))
+
+
+@component
+class FakeChatGenerator:
+    """
+    Stand-in for the chat generators of nlp.pipes. Replies after latency plus seconds_per_token for each
+    completion token, reports usage like the real generators and fills JSON schemas of structured output.
+    With tools it asks for tool_rounds web searches before answering.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        latency: float = 0.0,
+        seconds_per_token: float = 0.0,
+        completion_tokens: int = 200,
+        tool_rounds: int = 0,
+        seed: int = 0,
+    ):
+        self.provider = provider
+        self.model = model
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.completion_tokens = completion_tokens
+        self.tool_rounds = tool_rounds
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _structured_reply(self, generation_kwargs: Dict[str, Any], serial: int) -> Optional[str]:
+        if "response_format" in generation_kwargs:
+            schema = generation_kwargs["response_format"]["json_schema"]["schema"]
+        elif "response_json_schema" in generation_kwargs:
+            schema = generation_kwargs["response_json_schema"]
+        else:
+            return None
+        return json.dumps(_fake_value(schema, schema.get("$defs", {}), "value", self._rng, serial))
+
+    def _tool_call(self, messages: List[ChatMessage], tools: List[Any], generation_kwargs: Dict[str, Any], serial: int) -> Optional[ToolCall]:
+        if not tools or generation_kwargs.get("tool_choice") == "none":
+            return None
+        if sum(bool(msg.tool_calls) for msg in messages) >= self.tool_rounds:
+            return None
+        return ToolCall(tool_name=tools[0].name, arguments={"query": f"bench query {serial}"})
+
+    @component.output_types(replies=List[ChatMessage])
+    def run(
+        self,
+        messages: List[ChatMessage],
+        streaming_callback: Optional[StreamingCallbackT] = None,
+        generation_kwargs: Optional[Dict[str, Any]] = None,
+        tools: Optional[Any] = None,
+        tools_strict: Optional[bool] = None,
+    ):
+        generation_kwargs = generation_kwargs or {}
+        with self._lock:
+            self.calls += 1
+            serial = self.calls
+
+        text = None
+        completion_tokens = self.completion_tokens
+        tool_call = self._tool_call(messages, tools, generation_kwargs, serial)
+        if tool_call is not None:
+            completion_tokens = 20
+        elif (text := self._structured_reply(generation_kwargs, serial)) is not None:
+            completion_tokens = max(1, len(text) // 4)
+        else:
+            text = " ".join(self._rng.choice(_WORDS) for _ in range(self.completion_tokens))
+
+        time.sleep(self.latency + completion_tokens * self.seconds_per_token)
+        if streaming_callback is not None and text:
+            for word in text.split(" "):
+                streaming_callback(StreamingChunk(content=word + " "))
+
+        prompt_tokens = sum(len(msg.text or "") for msg in messages) // 4
+        reply = ChatMessage.from_assistant(
+            text=text,
+            tool_calls=[tool_call] if tool_call else None,
+            meta={
+                "model": self.model,
+                "finish_reason": "tool_calls" if tool_call else "stop",
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+        return {"replies": [reply]}
+
+
+class FakeGeminiClient:
+    """Stand-in for the token counting client, counts len / 4 after latency seconds."""
+
+    class _TokenCount:
+        def __init__(self, total_tokens: int):
+            self.total_tokens = total_tokens
+
+    class _Models:
+        def __init__(self, client: "FakeGeminiClient"):
+            self._client = client
+
+        def count_tokens(self, model: str, contents: str):
+            with self._client._lock:
+                self._client.calls += 1
+            if self._client.latency:
+                time.sleep(self._client.latency)
+            return FakeGeminiClient._TokenCount(math.ceil(len(contents) / 4))
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.models = self._Models(self)
+
+
+def build_fake_openai_encoder() -> "tiktoken.Encoding":
+    """
+    Offline stand-in for o200k_base: a byte-level encoding whose vocabulary holds every run of up to three lowercase
+    letters, with or without a leading space, so that English-like text comes out at three to four chars per token.
+    """
+    import tiktoken
+
+    pieces = [bytes([byte]) for byte in range(256)]
+    for length in (1, 2, 3):
+        for letters in product(string.ascii_lowercase, repeat=length):
+            word = "".join(letters).encode("ascii")
+            if length > 1:
+                pieces.append(word)
+            pieces.append(b" " + word)
+    return tiktoken.Encoding(
+        name="bench_o200k_standin",
+        pat_str=r" ?[a-z]{1,3}| ?[^a-z\s]|\s+",
+        mergeable_ranks={piece: rank for rank, piece in enumerate(pieces)},
+        special_tokens={},
+    )
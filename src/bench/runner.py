@@ -0,0 +1,259 @@
+"""
+Offline end-to-end benchmark of base_deepsearch and v1_deepsearch against local stand-ins for Jina,
+the chat generators and Gemini token counting. No API key or quota is used.
+
+    python -m src.bench.runner --apps v1 base --rounds 2 5 --page-chars 2000 8000 --runs 3
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, field
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional
+
+from rich.console import Console
+from rich.logging import RichHandler
+from rich.table import Table
+
+logger = logging.getLogger(__name__)
+
+BENCH_QUERY = "What does it take to build an energy-efficient house, from permits to contractors?"
+
+
+@dataclass
+class BenchScenario:
+    app: Literal["v1", "base"]
+    # search rounds of v1 (MAX_NUMBER_SEARCHES) or tool calling rounds of base
+    rounds: int
+    page_chars: int
+    pages_per_search: int = 5
+
+
+@dataclass
+class BenchSettings:
+    runs: int = 3
+    jina_latency: float = 0.0
+    llm_latency: float = 0.0
+    seconds_per_token: float = 0.0
+    completion_tokens: int = 200
+    count_tokens_latency: float = 0.0
+    recorded_payloads_path: Optional[str] = None
+    seed: int = 0
+
+
+@dataclass
+class ScenarioResult:
+    scenario: BenchScenario
+    run_seconds: List[float] = field(default_factory=list)
+    action_seconds: Dict[str, List[float]] = field(default_factory=dict)
+    api_calls: Dict[str, int] = field(default_factory=dict)
+    peak_rss_mb: float = 0.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def _install_stand_ins(scenario: BenchScenario, settings: BenchSettings):
+    """Points Jina, the pipes, token counting and the OpenAI tokenizer at local stand-ins. Returns the server, the generators by provider and the client."""
+    from ..core import get_jina_config, get_rate_limit_config
+    from ..nlp import set_generator_override, set_gemini_client, set_openai_encoder
+    from .fakes import FakeJinaServer, FakeChatGenerator, FakeGeminiClient, load_recorded_payloads, build_fake_openai_encoder
+
+    recorded = load_recorded_payloads(settings.recorded_payloads_path) if settings.recorded_payloads_path else None
+    server = FakeJinaServer(scenario.page_chars, settings.jina_latency, recorded, settings.seed).start()
+
+    # the stand-in takes no key, searches are never served from the cache and provider quotas do not apply
+    os.environ.setdefault("JINA_API_KEY", "bench")
+    jina_config = get_jina_config()
+    jina_config.SEARCH_URL = server.url
+    jina_config.NUM_PAGES_PER_SEARCH = scenario.pages_per_search
+    jina_config.CACHE_ENABLED = False
+    get_rate_limit_config().PROVIDERS = {}
+
+    generators: Dict[str, List[FakeChatGenerator]] = {}
+
+    def build_generator(provider: str, model: str) -> FakeChatGenerator:
+        generator = FakeChatGenerator(
+            provider,
+            model,
+            latency=settings.llm_latency,
+            seconds_per_token=settings.seconds_per_token,
+            completion_tokens=settings.completion_tokens,
+            tool_rounds=scenario.rounds,
+            seed=settings.seed,
+        )
+        generators.setdefault(provider, []).append(generator)
+        return generator
+
+    set_generator_override(build_generator)
+    gemini_client = FakeGeminiClient(settings.count_tokens_latency)
+    set_gemini_client(gemini_client)
+    # o200k_base would be downloaded on a clean machine
+    set_openai_encoder(build_fake_openai_encoder())
+    return server, generators, gemini_client
+
+
+def _build_app(scenario: BenchScenario, profile_dir: str):
+    if scenario.app == "v1":
+        from ..fsm.v1_deepsearch.app import build_burr_app
+        from ..fsm.v1_deepsearch.config import fsm_config
+        fsm_config.MAX_NUMBER_SEARCHES = scenario.rounds
+    else:
+        from ..fsm.base_deepsearch.app import build_burr_app
+        from ..fsm.base_deepsearch.config import fsm_config
+        fsm_config.LLM_ITERATIONS_THRESHOLD = scenario.rounds
+    fsm_config.PROFILE_DIR = profile_dir
+    return build_burr_app()
+
+
+def run_scenario(scenario: BenchScenario, settings: BenchSettings) -> ScenarioResult:
+    """
+    Runs one scenario settings.runs times in the calling process, from a temporary working directory
+    so that content stores, checkpoints and token caches start empty. Meant to run in a fresh process.
+    """
+    workdir = tempfile.mkdtemp(prefix="deepsearch-bench-")
+    os.chdir(workdir)
+    profile_dir = str(Path(workdir) / "profiles")
+
+    server, generators, gemini_client = _install_stand_ins(scenario, settings)
+    result = ScenarioResult(scenario)
+    try:
+        for _ in range(settings.runs):
+            app = _build_app(scenario, profile_dir)
+            started = time.perf_counter()
+            app.run(halt_after=["end"], inputs={"query": BENCH_QUERY})
+            result.run_seconds.append(time.perf_counter() - started)
+
+            profile = json.loads((Path(profile_dir) / f"{app.uid}.json").read_text(encoding="utf-8"))
+            for action in profile["actions"]:
+                result.action_seconds.setdefault(action["action"], []).append(action["wall_seconds"])
+    finally:
+        server.stop()
+
+    result.api_calls = {"jina": server.requests, "gemini_count_tokens": gemini_client.calls}
+    for provider, provider_generators in generators.items():
+        result.api_calls[provider] = sum(generator.calls for generator in provider_generators)
+    # ru_maxrss is in kilobytes on Linux
+    result.peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def run_benchmarks(scenarios: List[BenchScenario], settings: BenchSettings) -> List[ScenarioResult]:
+    """Runs every scenario in its own spawned process, so that imports, caches and peak RSS are not shared."""
+    results = []
+    for scenario in scenarios:
+        logger.info(f"Running {scenario}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results.append(executor.submit(run_scenario, scenario, settings).result())
+    return results
+
+
+def summarize(result: ScenarioResult) -> Dict[str, Any]:
+    runs = len(result.run_seconds) or 1
+    return {
+        **asdict(result.scenario),
+        "runs": len(result.run_seconds),
+        "wall_seconds_p50": percentile(result.run_seconds, 50),
+        "wall_seconds_p95": percentile(result.run_seconds, 95),
+        "peak_rss_mb": result.peak_rss_mb,
+        "api_calls_per_run": {provider: calls / runs for provider, calls in result.api_calls.items()},
+        "actions": {
+            action: {
+                "count": len(seconds),
+                "p50_seconds": percentile(seconds, 50),
+                "p95_seconds": percentile(seconds, 95),
+            }
+            for action, seconds in result.action_seconds.items()
+        },
+    }
+
+
+def print_summaries(summaries: List[Dict[str, Any]], console: Console):
+    totals = Table(title="Runs")
+    for column in ("app", "rounds", "page chars", "wall p50 (s)", "wall p95 (s)", "peak RSS (MB)", "API calls per run"):
+        totals.add_column(column)
+    for summary in summaries:
+        calls = ", ".join(f"{provider} {count:g}" for provider, count in summary["api_calls_per_run"].items())
+        totals.add_row(
+            summary["app"], str(summary["rounds"]), str(summary["page_chars"]),
+            f"{summary['wall_seconds_p50']:.3f}", f"{summary['wall_seconds_p95']:.3f}",
+            f"{summary['peak_rss_mb']:.0f}", calls,
+        )
+    console.print(totals)
+
+    actions = Table(title="Actions")
+    for column in ("app", "rounds", "page chars", "action", "count", "p50 (ms)", "p95 (ms)"):
+        actions.add_column(column)
+    for summary in summaries:
+        for action, stats in summary["actions"].items():
+            actions.add_row(
+                summary["app"], str(summary["rounds"]), str(summary["page_chars"]), action, str(stats["count"]),
+                f"{stats['p50_seconds'] * 1000:.1f}", f"{stats['p95_seconds'] * 1000:.1f}",
+            )
+    console.print(actions)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[
+            RichHandler(
+                rich_tracebacks=True,
+                show_time=True,
+                show_path=True,
+                markup=True
+            )
+        ]
+    )
+
+    parser = argparse.ArgumentParser(description="Benchmark the deep search apps offline against local stand-ins")
+    parser.add_argument("--apps", nargs="+", choices=["v1", "base"], default=["v1", "base"])
+    parser.add_argument("--rounds", nargs="+", type=int, default=[3], help="search or tool calling rounds per run")
+    parser.add_argument("--page-chars", nargs="+", type=int, default=[8000], help="characters per synthetic page")
+    parser.add_argument("--pages-per-search", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario")
+    parser.add_argument("--jina-latency", type=float, default=0.0, help="seconds before the fake Jina server answers")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds before a fake generator answers")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0, help="extra generator latency per completion token")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="tokens of free-text replies")
+    parser.add_argument("--count-tokens-latency", type=float, default=0.0, help="seconds per fake count_tokens request")
+    parser.add_argument("--jina-fixtures", help="JSONL of recorded Jina response bodies served instead of synthetic pages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summaries as JSON")
+    args = parser.parse_args()
+
+    settings = BenchSettings(
+        runs=args.runs,
+        jina_latency=args.jina_latency,
+        llm_latency=args.llm_latency,
+        seconds_per_token=args.seconds_per_token,
+        completion_tokens=args.completion_tokens,
+        count_tokens_latency=args.count_tokens_latency,
+        recorded_payloads_path=str(Path(args.jina_fixtures).resolve()) if args.jina_fixtures else None,
+        seed=args.seed,
+    )
+    scenarios = [
+        BenchScenario(app, rounds, page_chars, args.pages_per_search)
+        for app, rounds, page_chars in product(args.apps, args.rounds, args.page_chars)
+    ]
+
+    summaries = [summarize(result) for result in run_benchmarks(scenarios, settings)]
+    print_summaries(summaries, Console())
+    if args.output:
+        Path(args.output).write_text(json.dumps(summaries, indent=2), encoding="utf-8")
+        logger.info(f"Benchmark results saved to {args.output}")
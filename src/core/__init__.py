@@ -1 +1,11 @@
-from .config import jina_config, openai_config, azure_config, gemini_config
+from .config import get_openai_config, get_azure_config, get_gemini_config, get_jina_config, get_rate_limit_config
+from .content_store import ContentStore
+from .profiling import RunProfile, CallRecord, ActionRecord, profiled, profile_call, annotate, in_current_context, enter_action, exit_action
+from .replay import ReplayArchive, ReplayMiss, get_replay_archive, set_replay_archive, use_replay_archive
+from .ratelimit import TokenBucketLimiter, get_rate_limiter, rate_limit_stats, is_rate_limit_error, retry_after_seconds, parse_retry_after
+
+
+def __getattr__(name: str):
+    # jina_config, openai_config, ... are built by the config module on first access
+    from . import config
+    return getattr(config, name)
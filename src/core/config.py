@@ -1,10 +1,51 @@
+from functools import lru_cache
 from pathlib import Path
 
-from ..models import OpenAISettings, AzureOpenAISettings, JinaConfig, GeminiSettings
-
-openai_config = OpenAISettings()
-azure_config = AzureOpenAISettings()
-gemini_config = GeminiSettings()
+from ..models import OpenAISettings, AzureOpenAISettings, JinaConfig, GeminiSettings, RateLimitConfig
 
 jina_config_path = Path(__file__).parent / "jina.yaml"
-jina_config = JinaConfig.from_yaml(jina_config_path)
+rate_limit_config_path = Path(__file__).parent / "ratelimit.yaml"
+
+
+# Settings are built on first use, so importing the package needs neither env files nor YAML parsing
+
+
+@lru_cache(maxsize=None)
+def get_openai_config() -> OpenAISettings:
+    return OpenAISettings()
+
+
+@lru_cache(maxsize=None)
+def get_azure_config() -> AzureOpenAISettings:
+    return AzureOpenAISettings()
+
+
+@lru_cache(maxsize=None)
+def get_gemini_config() -> GeminiSettings:
+    return GeminiSettings()
+
+
+@lru_cache(maxsize=None)
+def get_jina_config() -> JinaConfig:
+    return JinaConfig.from_yaml(jina_config_path)
+
+
+@lru_cache(maxsize=None)
+def get_rate_limit_config() -> RateLimitConfig:
+    return RateLimitConfig.from_yaml(rate_limit_config_path)
+
+
+_lazy_configs = {
+    "openai_config": get_openai_config,
+    "azure_config": get_azure_config,
+    "gemini_config": get_gemini_config,
+    "jina_config": get_jina_config,
+    "rate_limit_config": get_rate_limit_config,
+}
+
+
+def __getattr__(name: str):
+    # the former module-level instances, still available by name
+    if name in _lazy_configs:
+        return _lazy_configs[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
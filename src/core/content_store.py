@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from ..models import PageRecord, SearchRecord, StoredWebPage, StoredSearchResult
+
+logger = logging.getLogger(__name__)
+
+
+class ContentStore:
+    """
+    Content-addressed store for page texts, keyed by a blake2b digest of the text.
+    Keeps texts in memory, or in one file per digest under path so that they survive the process.
+
+    In memory every put() takes a reference that release() gives back, a text is freed with its last reference.
+    Files are never freed implicitly, prune() deletes those not stored again for a while.
+    """
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path) if path is not None else None
+        self._texts: Dict[str, str] = {}
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.path / digest[:2] / f"{digest}.txt"
+
+    def put(self, text: str) -> str:
+        digest = self.digest(text)
+        if self.path is None:
+            with self._lock:
+                self._texts.setdefault(digest, text)
+                self._refs[digest] = self._refs.get(digest, 0) + 1
+            return digest
+
+        blob_path = self._blob_path(digest)
+        if blob_path.exists():
+            # a blob stored again is in use, prune() goes by this time
+            os.utime(blob_path)
+        else:
+            blob_path.parent.mkdir(exist_ok=True)
+            # write to a temporary file first so that readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=blob_path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, blob_path)
+        return digest
+
+    def release(self, digests: Iterable[str]):
+        """Gives back one reference per digest (repeat a digest to give back several), freeing unreferenced texts in memory."""
+        if self.path is not None:
+            return
+        with self._lock:
+            for digest in digests:
+                refs = self._refs.get(digest, 0) - 1
+                if refs > 0:
+                    self._refs[digest] = refs
+                else:
+                    self._refs.pop(digest, None)
+                    self._texts.pop(digest, None)
+
+    def prune(self, max_age_seconds: float, keep: Iterable[str] = ()) -> int:
+        """Deletes files not stored for max_age_seconds unless their digest is in keep. Returns the number deleted."""
+        if self.path is None:
+            return 0
+        keep = set(keep)
+        cutoff = time.time() - max_age_seconds
+        deleted = 0
+        for blob_path in self.path.glob("*/*"):
+            # .tmp files are leftovers of interrupted writes
+            if blob_path.stem in keep and blob_path.suffix == ".txt":
+                continue
+            try:
+                if blob_path.stat().st_mtime < cutoff:
+                    blob_path.unlink()
+                    deleted += 1
+            except FileNotFoundError:
+                continue
+        logger.info(f"Pruned {deleted} texts from {self.path}")
+        return deleted
+
+    def get(self, digest: str) -> str:
+        if self.path is None:
+            return self._texts[digest]
+        try:
+            return self._blob_path(digest).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            raise KeyError(digest) from None
+
+    def __len__(self) -> int:
+        if self.path is None:
+            return len(self._texts)
+        return sum(1 for _ in self.path.glob("*/*.txt"))
+
+    def __contains__(self, digest: str) -> bool:
+        if self.path is None:
+            return digest in self._texts
+        return self._blob_path(digest).exists()
+
+    # references are built with model_construct, every field comes from an already validated record
+
+    def store_page(self, page: PageRecord) -> StoredWebPage:
+        return StoredWebPage.model_construct(
+            url=page.url,
+            title=page.title,
+            description=page.description,
+            content_hash=self.put(page.content),
+            jina_tokens=page.jina_tokens,
+            content_tokens=page.content_tokens,
+            evaluation=page.evaluation,
+        )
+
+    def load_page(self, page: StoredWebPage) -> PageRecord:
+        return PageRecord(
+            url=page.url,
+            title=page.title,
+            description=page.description,
+            content=self.get(page.content_hash),
+            jina_tokens=page.jina_tokens,
+            content_tokens=page.content_tokens,
+            evaluation=page.evaluation,
+        )
+
+    def store_result(self, search_result: SearchRecord) -> StoredSearchResult:
+        return StoredSearchResult.model_construct(
+            query=search_result.query,
+            success=search_result.success,
+            scraped_pages=[self.store_page(page) for page in search_result.scraped_pages],
+            total_jina_tokens=search_result.total_jina_tokens,
+            from_cache=search_result.from_cache,
+        )
+
+    def load_result(self, search_result: StoredSearchResult) -> SearchRecord:
+        return SearchRecord(
+            query=search_result.query,
+            success=search_result.success,
+            scraped_pages=[self.load_page(page) for page in search_result.scraped_pages],
+            total_jina_tokens=search_result.total_jina_tokens,
+            from_cache=search_result.from_cache,
+        )
@@ -0,0 +1,71 @@
+"""
+Import-time budget check: every module below is imported in a fresh interpreter, from an empty
+working directory and without provider keys, and must load within its budget without writing any file.
+
+    python -m src.core.import_budget
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# cumulative import time per module in milliseconds, none of them may need credentials or env files
+IMPORT_BUDGETS_MS: Dict[str, float] = {
+    "src.models": 400,
+    "src.core": 450,
+    "src.tools": 700,
+    "src.nlp": 700,
+    "src.fsm.v1_deepsearch.app": 2500,
+}
+
+_CREDENTIAL_PREFIXES = ("OPENAI_", "AZURE_", "GEMINI_", "GOOGLE_", "JINA_")
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def measure_import(module: str) -> Tuple[bool, float, str, List[str]]:
+    """Imports module in a subprocess and returns (succeeded, cumulative milliseconds, stderr, files created in the working directory)."""
+    repo_root = Path(__file__).resolve().parents[2]
+    env = {key: value for key, value in os.environ.items() if not key.startswith(_CREDENTIAL_PREFIXES)}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(repo_root), env.get("PYTHONPATH")]))
+
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        created = sorted(os.listdir(cwd))
+
+    cumulative_us = 0
+    for match in _IMPORT_TIME_LINE.finditer(proc.stderr):
+        if match.group(2) == module:
+            cumulative_us = int(match.group(1))
+    return proc.returncode == 0, cumulative_us / 1000, proc.stderr, created
+
+
+def check_import_budgets(budgets: Dict[str, float] = IMPORT_BUDGETS_MS) -> bool:
+    ok = True
+    for module, budget_ms in budgets.items():
+        succeeded, elapsed_ms, stderr, created = measure_import(module)
+        if not succeeded:
+            ok = False
+            error = stderr.strip().splitlines()[-1] if stderr.strip() else "unknown error"
+            print(f"FAIL {module}: import failed without credentials ({error})")
+        elif created:
+            ok = False
+            print(f"FAIL {module}: import created {', '.join(created)}")
+        elif elapsed_ms > budget_ms:
+            ok = False
+            print(f"FAIL {module}: {elapsed_ms:.0f} ms > {budget_ms:.0f} ms budget")
+        else:
+            print(f"ok   {module}: {elapsed_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_import_budgets() else 1)
@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# What a provider call spends its time on, so that a slow action can be attributed at a glance
+OPERATION_CATEGORIES = {
+    "search": "network",
+    "count_tokens": "tokenization",
+    "generate": "generation",
+}
+
+
+@dataclass
+class CallRecord:
+    provider: str
+    operation: str
+    action: Optional[str] = None
+    sequence_id: Optional[int] = None
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    jina_tokens: int = 0
+    cache_hit: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class ActionRecord:
+    action: str
+    sequence_id: int
+    started_at: float
+    wall_seconds: float = 0.0
+    error: Optional[str] = None
+    calls: List[CallRecord] = field(default_factory=list)
+
+
+class RunProfile:
+    """Timings of the actions of one application run and of every provider call made inside them."""
+
+    def __init__(self, app_id: str):
+        self.app_id = app_id
+        self.actions: List[ActionRecord] = []
+        # calls made outside of any action, e.g. before the application runs
+        self.unattributed_calls: List[CallRecord] = []
+        self._open_actions: Dict[int, ActionRecord] = {}
+        self._lock = threading.Lock()
+
+    def start_action(self, action: str, sequence_id: int) -> ActionRecord:
+        record = ActionRecord(action=action, sequence_id=sequence_id, started_at=time.time())
+        with self._lock:
+            self._open_actions[sequence_id] = record
+        return record
+
+    def finish_action(self, sequence_id: int, wall_seconds: float, error: Optional[BaseException] = None):
+        with self._lock:
+            record = self._open_actions.pop(sequence_id, None)
+            if record is None:
+                return
+            record.wall_seconds = wall_seconds
+            record.error = repr(error) if error is not None else None
+            self.actions.append(record)
+
+    def add_call(self, call: CallRecord):
+        with self._lock:
+            action = self._open_actions.get(call.sequence_id)
+            (action.calls if action is not None else self.unattributed_calls).append(call)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per action name: runs, wall time and the share of it spent per call category, plus token totals."""
+        with self._lock:
+            actions = list(self.actions)
+
+        summary: Dict[str, Dict[str, Any]] = {}
+        for record in actions:
+            entry = summary.setdefault(record.action, {
+                "runs": 0, "wall_seconds": 0.0, "queue_wait_seconds": 0.0,
+                "seconds_by_category": defaultdict(float), "calls": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "jina_tokens": 0,
+                "bytes_sent": 0, "bytes_received": 0,
+            })
+            entry["runs"] += 1
+            entry["wall_seconds"] += record.wall_seconds
+            for call in record.calls:
+                entry["calls"] += 1
+                entry["seconds_by_category"][OPERATION_CATEGORIES.get(call.operation, call.operation)] += call.wall_seconds
+                for key in ("queue_wait_seconds", "prompt_tokens", "completion_tokens", "jina_tokens", "bytes_sent", "bytes_received"):
+                    entry[key] += getattr(call, key)
+
+        for entry in summary.values():
+            entry["seconds_by_category"] = dict(entry["seconds_by_category"])
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            actions = [asdict(record) for record in self.actions]
+            unattributed = [asdict(call) for call in self.unattributed_calls]
+        return {
+            "app_id": self.app_id,
+            "summary": self.summary(),
+            "actions": actions,
+            "unattributed_calls": unattributed,
+        }
+
+    def write_json(self, path: str | Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    def to_openmetrics(self, prefix: str = "deepsearch") -> str:
+        """Counters per action and per (provider, operation, action) in the OpenMetrics text format."""
+        with self._lock:
+            actions = list(self.actions)
+            calls = [call for record in actions for call in record.calls] + list(self.unattributed_calls)
+
+        families: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = defaultdict(lambda: defaultdict(float))
+        for record in actions:
+            labels = (("app_id", self.app_id), ("action", record.action))
+            families["action_runs"][labels] += 1
+            families["action_seconds"][labels] += record.wall_seconds
+            if record.error is not None:
+                families["action_errors"][labels] += 1
+
+        for call in calls:
+            labels = (("app_id", self.app_id), ("provider", call.provider), ("operation", call.operation), ("action", call.action or ""))
+            families["provider_calls"][labels] += 1
+            families["provider_seconds"][labels] += call.wall_seconds
+            families["provider_queue_wait_seconds"][labels] += call.queue_wait_seconds
+            if call.error is not None:
+                families["provider_errors"][labels] += 1
+            for direction in ("sent", "received"):
+                families["provider_bytes"][labels + (("direction", direction),)] += getattr(call, f"bytes_{direction}")
+            for kind in ("prompt", "completion", "jina"):
+                tokens = getattr(call, f"{kind}_tokens")
+                if tokens:
+                    families["provider_tokens"][labels + (("kind", kind),)] += tokens
+
+        lines = []
+        for family, samples in families.items():
+            name = f"{prefix}_{family}"
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in samples.items():
+                label_str = ",".join(f'{key}="{_escape_label(value_)}"' for key, value_ in labels)
+                lines.append(f"{name}_total{{{label_str}}} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str | Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(self.to_openmetrics(), encoding="utf-8")
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# (profile, action name, sequence id) of the action running in the current context
+_current_action: contextvars.ContextVar[Optional[Tuple[RunProfile, str, int]]] = contextvars.ContextVar("current_action", default=None)
+# record of the provider call running in the current context
+_current_call: contextvars.ContextVar[Optional[CallRecord]] = contextvars.ContextVar("current_call", default=None)
+
+
+def enter_action(profile: RunProfile, action: str, sequence_id: int) -> contextvars.Token:
+    profile.start_action(action, sequence_id)
+    return _current_action.set((profile, action, sequence_id))
+
+
+def exit_action(token: contextvars.Token, wall_seconds: float, error: Optional[BaseException] = None):
+    current = _current_action.get()
+    _current_action.reset(token)
+    if current is not None:
+        profile, _, sequence_id = current
+        profile.finish_action(sequence_id, wall_seconds, error)
+
+
+def annotate(**values: Any):
+    """Adds to the record of the provider call in progress, numbers are summed. No-op outside a profiled call."""
+    call = _current_call.get()
+    if call is None:
+        return
+    for key, value in values.items():
+        current = getattr(call, key, None)
+        if _is_number(current):
+            # summed fields only take numbers, jina_tokens=None (Jina reported no usage) is skipped
+            if _is_number(value):
+                setattr(call, key, current + value)
+        elif value is not None:
+            setattr(call, key, value)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@contextlib.contextmanager
+def profile_call(provider: str, operation: str) -> Iterator[Optional[CallRecord]]:
+    """
+    Records wall time and whatever the body annotates (queue wait, bytes, tokens) as one call
+    of the running action. Yields None and records nothing outside a profiled action.
+    """
+    current = _current_action.get()
+    if current is None:
+        yield None
+        return
+
+    profile, action, sequence_id = current
+    call = CallRecord(provider=provider, operation=operation, action=action, sequence_id=sequence_id, started_at=time.time())
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        call.error = repr(e)
+        raise
+    finally:
+        call.wall_seconds = time.perf_counter() - started
+        _current_call.reset(token)
+        profile.add_call(call)
+
+
+def profiled(provider: str, operation: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator form of profile_call for sync and async functions."""
+
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with profile_call(provider, operation):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_call(provider, operation):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def in_current_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wraps fn to run in a copy of the caller's context, so that calls from worker threads are attributed to the running action."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
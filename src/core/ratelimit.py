@@ -0,0 +1,225 @@
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .config import get_rate_limit_config
+from .profiling import annotate
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budget of one provider, shared by every thread and event loop.
+
+    Both buckets hold a minute of budget and refill continuously. A caller reserves its request and
+    estimated tokens up front and then waits until the buckets are no longer in debt, so callers are
+    served in arrival order and a burst never exceeds the quota. The difference between the estimate
+    and the actual usage is settled afterwards with reconcile().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        backoff_base: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._requests = requests_per_minute or 0.0
+        self._tokens = tokens_per_minute or 0.0
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_rate_limits = 0
+        # running average of the actual tokens per request, used when a caller has no estimate
+        self._avg_tokens = 0.0
+        self._stats = {"requests": 0, "waited": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "rate_limited": 0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens: Optional[int] = None) -> int:
+        """Takes a request and tokens (the running average if None) from the buckets and returns the reserved tokens."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            reserved = int(self._avg_tokens if tokens is None else tokens)
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                # a single request larger than the whole bucket must still get through eventually
+                self._tokens -= min(reserved, self.tokens_per_minute)
+            return reserved
+
+    def _delay(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            delay = self._blocked_until - now
+            if self.requests_per_minute and self._requests < 0:
+                delay = max(delay, -self._requests * 60 / self.requests_per_minute)
+            if self.tokens_per_minute and self._tokens < 0:
+                delay = max(delay, -self._tokens * 60 / self.tokens_per_minute)
+            return max(0.0, delay)
+
+    def _record_wait(self, waited: float):
+        annotate(queue_wait_seconds=waited)
+        with self._lock:
+            self._stats["requests"] += 1
+            if waited > 0.001:
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        if waited >= 1:
+            logger.info(f"Waited {waited:.1f}s in the {self.name} rate limit queue")
+
+    def acquire(self, tokens: Optional[int] = None) -> int:
+        """Blocks until a request with the given token estimate fits the budget. Returns the reserved tokens."""
+        reserved = self.reserve(tokens)
+        started = time.monotonic()
+        while (delay := self._delay()) > 0:
+            time.sleep(delay)
+        self._record_wait(time.monotonic() - started)
+        return reserved
+
+    async def acquire_async(self, tokens: Optional[int] = None) -> int:
+        reserved = self.reserve(tokens)
+        started = time.monotonic()
+        while (delay := self._delay()) > 0:
+            await asyncio.sleep(delay)
+        self._record_wait(time.monotonic() - started)
+        return reserved
+
+    def reconcile(self, reserved: int, actual: Optional[int]):
+        """Settles the token bucket once the actual usage of a request is known."""
+        if actual is None:
+            return
+        with self._lock:
+            self._avg_tokens = actual if self._avg_tokens == 0 else 0.9 * self._avg_tokens + 0.1 * actual
+            if self.tokens_per_minute:
+                self._tokens -= actual - min(reserved, self.tokens_per_minute)
+            self._consecutive_rate_limits = 0
+
+    def refund(self, reserved: int):
+        """Gives the tokens of a request that used none (e.g. a 429 or a failed attempt) back, the request itself still counts."""
+        with self._lock:
+            if self.tokens_per_minute:
+                self._tokens = min(self.tokens_per_minute, self._tokens + min(reserved, self.tokens_per_minute))
+
+    def rate_limited(self, retry_after: Optional[float] = None):
+        """Pauses the provider for everybody after a 429, for retry_after or an exponentially growing backoff."""
+        with self._lock:
+            self._consecutive_rate_limits += 1
+            self._stats["rate_limited"] += 1
+            backoff = retry_after if retry_after is not None else self.backoff_base * 2 ** (self._consecutive_rate_limits - 1)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + min(backoff, self.max_backoff))
+        logger.warning(f"{self.name} rate limited the request, pausing for {min(backoff, self.max_backoff):.1f}s")
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args,
+        tokens: Optional[int] = None,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+        can_retry: Optional[Callable[[], bool]] = None,
+        **kwargs,
+    ) -> T:
+        """
+        Calls fn within the budget, retrying after rate limit errors as long as can_retry() allows it.
+        usage extracts the actual token usage from the result, otherwise the estimate is kept.
+        """
+        max_retries = get_rate_limit_config().MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            reserved = self.acquire(tokens)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if attempt < max_retries and is_rate_limit_error(e) and (can_retry is None or can_retry()):
+                    self.rate_limited(retry_after_seconds(e))
+                    continue
+                raise
+            self.reconcile(reserved, usage(result) if usage else reserved)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def _error_chain(e: BaseException):
+    while e is not None:
+        yield e
+        e = e.__cause__ or e.__context__
+
+
+def is_rate_limit_error(e: BaseException) -> bool:
+    """Recognizes 429s of requests, httpx, openai and google-genai, also when wrapped by a pipeline error."""
+    for error in _error_chain(e):
+        response = getattr(error, "response", None)
+        codes = (getattr(error, "status_code", None), getattr(error, "code", None), getattr(response, "status_code", None))
+        if 429 in codes:
+            return True
+    return False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    if value.replace(".", "", 1).isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def retry_after_seconds(e: BaseException) -> Optional[float]:
+    for error in _error_chain(e):
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers:
+            return parse_retry_after(headers.get("retry-after"))
+    return None
+
+
+_rate_limiters: Dict[str, TokenBucketLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> TokenBucketLimiter:
+    """Process-wide limiter of a provider with the budgets from ratelimit.yaml, unknown providers are not limited."""
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            rate_limit_config = get_rate_limit_config()
+            limits = rate_limit_config.PROVIDERS.get(provider)
+            _rate_limiters[provider] = TokenBucketLimiter(
+                provider,
+                requests_per_minute=limits.RPM if limits else None,
+                tokens_per_minute=limits.TPM if limits else None,
+                backoff_base=rate_limit_config.BACKOFF_BASE,
+                max_backoff=rate_limit_config.MAX_BACKOFF,
+            )
+        return _rate_limiters[provider]
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Requests, queue waits and 429s per provider since the start of the process."""
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    return {provider: limiter.stats() for provider, limiter in limiters.items()}
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional, Tuple
+
+ReplayMode = Literal["record", "replay"]
+
+
+class ReplayMiss(LookupError):
+    """A replayed run made a call that the archive does not hold."""
+
+
+class ReplayArchive:
+    """
+    Single-file SQLite archive of external calls. Requests and responses are stored once as zlib-compressed
+    JSON blobs keyed by their blake2b digest. A call is identified by the digest of (provider, operation, request)
+    and its occurrence, so a request sent twice replays both of its answers in order.
+
+    In "record" mode every call goes out and is stored, in "replay" mode calls are answered from the archive
+    only and raise ReplayMiss when they were not recorded.
+    """
+
+    def __init__(self, path: str | Path, mode: ReplayMode):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self._local = threading.local()
+        self._occurrences: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if mode == "replay" and not self.path.exists():
+            raise FileNotFoundError(f"Replay archive {self.path} does not exist")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                data BLOB NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS calls (
+                key TEXT NOT NULL,
+                occurrence INTEGER NOT NULL,
+                provider TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                request TEXT NOT NULL,
+                response TEXT NOT NULL,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (key, occurrence)
+            )"""
+        )
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads, so every thread gets its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def encode(value: Any) -> str:
+        return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    @staticmethod
+    def digest(data: str) -> str:
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def call_key(self, provider: str, operation: str, request: Any) -> Tuple[str, str]:
+        """Returns (call key, canonical request JSON)."""
+        encoded = self.encode(request)
+        return self.digest(f"{provider}|{operation}|{encoded}"), encoded
+
+    def _next_occurrence(self, key: str) -> int:
+        with self._lock:
+            occurrence = self._occurrences.get(key, 0)
+            self._occurrences[key] = occurrence + 1
+            return occurrence
+
+    def _put_blob(self, data: str) -> str:
+        digest = self.digest(data)
+        self._connection().execute(
+            "INSERT OR IGNORE INTO blobs (digest, data) VALUES (?, ?)",
+            (digest, zlib.compress(data.encode("utf-8"))),
+        )
+        return digest
+
+    def _get_blob(self, digest: str) -> str:
+        row = self._connection().execute("SELECT data FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise ReplayMiss(f"Blob {digest} is missing from {self.path}")
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def store(self, provider: str, operation: str, request: Any, response: Any):
+        key, encoded = self.call_key(provider, operation, request)
+        request_digest = self._put_blob(encoded)
+        response_digest = self._put_blob(self.encode(response))
+        self._connection().execute(
+            """INSERT OR REPLACE INTO calls (key, occurrence, provider, operation, request, response, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (key, self._next_occurrence(key), provider, operation, request_digest, response_digest, time.time()),
+        )
+
+    def load(self, provider: str, operation: str, request: Any) -> Any:
+        key, _ = self.call_key(provider, operation, request)
+        # a request sent more often than recorded gets its last recorded answer
+        row = self._connection().execute(
+            "SELECT response FROM calls WHERE key = ? AND occurrence <= ? ORDER BY occurrence DESC LIMIT 1",
+            (key, self._next_occurrence(key)),
+        ).fetchone()
+        if row is None:
+            raise ReplayMiss(f"No recorded {provider} {operation} call matches the request (key {key})")
+        return json.loads(self._get_blob(row[0]))
+
+    def call(self, provider: str, operation: str, request: Any, fetch: Callable[[], Any]) -> Any:
+        """Records the JSON-serializable response of fetch() or replays it without calling fetch."""
+        if self.replaying:
+            return self.load(provider, operation, request)
+        response = fetch()
+        self.store(provider, operation, request, response)
+        # recorded and replayed runs see the same JSON round trip
+        return json.loads(self.encode(response))
+
+    async def call_async(self, provider: str, operation: str, request: Any, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if self.replaying:
+            return self.load(provider, operation, request)
+        response = await fetch()
+        self.store(provider, operation, request, response)
+        return json.loads(self.encode(response))
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        calls = dict(conn.execute("SELECT provider || ' ' || operation, COUNT(*) FROM calls GROUP BY provider, operation").fetchall())
+        blobs, compressed = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        return {"calls": calls, "blobs": blobs, "compressed_bytes": compressed}
+
+
+# Archive every provider call goes through, None calls the providers directly
+_replay_archive: Optional[ReplayArchive] = None
+
+
+def get_replay_archive() -> Optional[ReplayArchive]:
+    return _replay_archive
+
+
+def set_replay_archive(archive: Optional[ReplayArchive]) -> Optional[ReplayArchive]:
+    """Routes Jina searches, Gemini token counts and pipeline runs through archive, None turns recording/replay off."""
+    global _replay_archive
+    _replay_archive = archive
+    return archive
+
+
+def use_replay_archive(path: Optional[str | Path], mode: Optional[ReplayMode]) -> Optional[ReplayArchive]:
+    """Opens the archive at path in mode and activates it, a None mode turns recording/replay off."""
+    if mode is None:
+        return set_replay_archive(None)
+    if path is None:
+        raise ValueError(f"Replay mode {mode} needs an archive path")
+    return set_replay_archive(ReplayArchive(path, mode))
@@ -1 +1,2 @@
-from .v1_deepsearch.app import build_burr_app
\ No newline at end of file
+from .profiling import ProfilingHook
+from .v1_deepsearch.app import build_burr_app
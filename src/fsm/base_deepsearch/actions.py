@@ -5,7 +5,8 @@ from burr.core import action
 
 from haystack.dataclasses import ChatMessage, ChatRole, StreamingCallbackT
 
-from ...nlp import build_azure_openai_chat_pipe
+from ...core import get_jina_config
+from ...nlp import get_pipe, build_azure_openai_chat_pipe
 from ...tools import init_tool_invoker
 from .models import ApplicationState
 from .config import fsm_config, CURRENT_TOOLS
@@ -49,7 +50,7 @@ def ai_response(
     max_iterations: int,
     streaming_callback: Optional[StreamingCallbackT] = None,
 ) -> ApplicationState:
-    generator_pipe, input_builder, output_parser = build_azure_openai_chat_pipe(fsm_config.AZURE_DEPLOYMENT)
+    generator_pipe, input_builder, output_parser = get_pipe(build_azure_openai_chat_pipe, fsm_config.AZURE_DEPLOYMENT)
     pipe_input = input_builder(
                     msgs=state.chat_history,
                     generator_run_kwargs={
@@ -94,7 +95,11 @@ def tool_invocation(
         state.should_continue = False
         return state
 
-    tool_invoker = init_tool_invoker(CURRENT_TOOLS)
+    # web searches requested in the same turn run concurrently, capped like the async Jina API
+    tool_invoker = init_tool_invoker(
+        CURRENT_TOOLS,
+        tool_invoker_kwargs={"max_workers": get_jina_config().MAX_CONCURRENT_REQUESTS},
+    )
     tool_invoker_result = tool_invoker.run(
         messages=[ass_msg]
     )
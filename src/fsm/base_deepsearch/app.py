@@ -7,6 +7,8 @@ from burr.core import Application, ApplicationBuilder, when
 from burr.integrations.pydantic import PydanticTypingSystem
 from haystack.components.generators.utils import print_streaming_chunk
 
+from ..profiling import ProfilingHook
+
 from .models import ApplicationState
 from .actions import (
     build_chat_msgs,
@@ -20,7 +22,7 @@ logger = logging.getLogger(__name__)
 
 
 def build_burr_app(visualize: bool = False) -> Application:
-    app = (
+    builder = (
         ApplicationBuilder()
         .with_actions(
             build_chat_msgs,
@@ -40,6 +42,13 @@ def build_burr_app(visualize: bool = False) -> Application:
         .with_typing(PydanticTypingSystem(ApplicationState))
         .with_state(ApplicationState())
         .with_entrypoint("build_chat_msgs")
+    )
+
+    if fsm_config.PROFILE_DIR:
+        builder = builder.with_hooks(ProfilingHook(fsm_config.PROFILE_DIR))
+
+    app = (
+        builder
         .with_tracker(project="base_deepsearch")
         .build()
     )
@@ -1,5 +1,6 @@
 import yaml
 from pathlib import Path
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -11,6 +12,8 @@ from ...tools import search_web_formatted_str_out
 class FSMConfig(BaseModel):
     LLM_ITERATIONS_THRESHOLD: int
     AZURE_DEPLOYMENT: str
+    # directory for per-run timing profiles (<app_id>.json and .prom), None disables profiling
+    PROFILE_DIR: Optional[str] = None
 
     @classmethod
     def from_yaml(cls, path: str | Path) -> "FSMConfig":
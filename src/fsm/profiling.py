@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from burr.core import Action, State
+from burr.lifecycle import PreRunStepHook, PostRunStepHook
+
+from ..core import RunProfile, enter_action, exit_action
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingHook(PreRunStepHook, PostRunStepHook):
+    """
+    Times every action of an application together with the provider calls made inside it and
+    writes <output_dir>/<app_id>.json and <app_id>.prom after each step, so a crashed run keeps its profile.
+    """
+
+    def __init__(self, output_dir: str | Path):
+        self.output_dir = Path(output_dir)
+        self.profiles: Dict[str, RunProfile] = {}
+        self._running: Dict[Tuple[str, int], Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def get_profile(self, app_id: str) -> RunProfile:
+        with self._lock:
+            if app_id not in self.profiles:
+                self.profiles[app_id] = RunProfile(app_id)
+            return self.profiles[app_id]
+
+    def pre_run_step(self, *, app_id: str, sequence_id: int, action: Action, **future_kwargs: Any):
+        token = enter_action(self.get_profile(app_id), action.name, sequence_id)
+        self._running[(app_id, sequence_id)] = (token, time.perf_counter())
+
+    def post_run_step(
+        self,
+        *,
+        app_id: str,
+        sequence_id: int,
+        state: State,
+        action: Action,
+        result: Optional[dict],
+        exception: Exception,
+        **future_kwargs: Any,
+    ):
+        running = self._running.pop((app_id, sequence_id), None)
+        if running is None:
+            return
+        token, started = running
+        exit_action(token, time.perf_counter() - started, exception)
+
+        profile = self.get_profile(app_id)
+        try:
+            profile.write_json(self.output_dir / f"{app_id}.json")
+            profile.write_openmetrics(self.output_dir / f"{app_id}.prom")
+        except OSError:
+            logger.exception(f"Writing the profile of app {app_id} failed")
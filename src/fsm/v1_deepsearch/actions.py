@@ -1,76 +1,150 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from burr.core import action
 
-from haystack.dataclasses import ChatMessage
+from haystack.core.errors import PipelineRuntimeError
+from haystack.dataclasses import ChatMessage, StreamingCallbackT
 
-from ...models import SearchReasoningNextQuery
-from ...nlp import build_azure_openai_struct_pipe, build_gemini_chat_pipe, count_gemini_tokens
-from ...tools import jina_search, jina_result_to_formatted_pages
+from ...models import SearchReasoningNextQuery, SearchReasoningFollowUps, PageEvaluation, PageRecord, SearchRecord
+from ...nlp import get_pipe, parse_struct_reply, build_azure_openai_struct_pipe, build_gemini_chat_pipe, GeminiTokenCounter, set_token_count_cache_path, trim_to_token_budget, canonicalize_url, NearDuplicateIndex
+from ...tools import jina_search, jina_search_many
+from ...core import ContentStore, get_replay_archive, use_replay_archive, in_current_context
 
 from .models import ApplicationState
 from .config import fsm_config
-from .utils import format_llm_reasoning_next_query, format_pages_for_report, build_iterative_searcher_msgs, build_report_generator_msgs, count_content_tokens, trim_content_tokens
+from .utils import build_page_evaluation_msgs, format_llm_reasoning_next_query, format_llm_reasoning_follow_ups, format_search_round, format_pages_for_report, build_iterative_searcher_msgs, build_report_generator_msgs, count_content_tokens, trim_content_tokens
+from .packing import source_utility, pack_sources, retrieve_source_chunks
+from .prefetch import SearchPrefetcher
 from .prompt import get_iterative_web_results_user_prompt_template, get_iterative_web_results_user_prompt
 
 logger = logging.getLogger(__name__)
 
+# shared by all actions so that the estimator calibration survives between steps
+token_counter = GeminiTokenCounter(
+    fsm_config.GEMINI_MODEL,
+    mode=fsm_config.TOKEN_COUNTING,
+    margin=fsm_config.TOKEN_ESTIMATE_MARGIN,
+    calibration_samples=fsm_config.TOKEN_CALIBRATION_SAMPLES,
+    max_workers=fsm_config.TOKEN_COUNT_MAX_WORKERS,
+)
+
+
+# created on first use so that importing writes nothing, the lock keeps concurrently built apps from opening them twice
+_stores_lock = threading.RLock()
+_content_store: Optional[ContentStore] = None
+_run_stores_open = False
+
+
+def get_content_store() -> ContentStore:
+    """Page texts live here, the state only holds their hashes so that tracked snapshots stay small."""
+    global _content_store
+    with _stores_lock:
+        if _content_store is None:
+            _content_store = ContentStore(fsm_config.CONTENT_STORE_PATH)
+        return _content_store
+
+
+def open_run_stores():
+    """Opens the token count cache, the replay archive and the content store of fsm_config, once per process."""
+    global _run_stores_open
+    with _stores_lock:
+        if _run_stores_open:
+            return
+        set_token_count_cache_path(fsm_config.TOKEN_CACHE_PATH)
+        # an archive opened explicitly (e.g. by --record/--replay) wins over the configured one
+        if fsm_config.REPLAY_MODE and get_replay_archive() is None:
+            use_replay_archive(fsm_config.REPLAY_PATH, fsm_config.REPLAY_MODE)
+        get_content_store()
+        _run_stores_open = True
+
 
 @action.pydantic(
     reads=[],
     writes=[
         "user_query",
-        "next_search_query",
+        "next_search_queries",
         "msg_history",
     ],
 )
 def init_msg_history(
     state: ApplicationState,
+    fan_out: int,
     query: Optional[str] = None,
+    prefetch_candidates: int = 0,
 ) -> ApplicationState:
     if not query:
         query = input("Type your question:\n")
 
     state.user_query = query
-    state.next_search_query = query
-    state.msg_history = build_iterative_searcher_msgs()
+    state.next_search_queries = [query]
+    state.msg_history = build_iterative_searcher_msgs(fan_out, prefetch_candidates)
 
     return state
 
 
 @action.pydantic(
     reads=[
-        "next_search_query",
+        "next_search_queries",
+        "search_counter",
     ],
     writes=[
         "executed_queries",
         "search_results",
         "sources_token_counter",
         "search_counter",
+        "last_round_size",
     ],
 )
 def invoke_web_search_tool(
     state: ApplicationState,
     search_token_limit: int,
+    max_searches: int,
+    prefetcher: Optional[SearchPrefetcher] = None,
 ) -> ApplicationState:
-    logger.info(f"Calling Jina API with query='{state.next_search_query}'")
-    search_result = jina_search(state.next_search_query)
-
-    logger.info(f"Burned Jina API tokens: {search_result.total_jina_tokens}")
-    logger.info(f"Jina API returned {len(search_result.scraped_pages)} pages")
-
-    tokenizer = lambda t: count_gemini_tokens(t, fsm_config.GEMINI_MODEL)
-    total_tokens, search_result = count_content_tokens(search_result, tokenizer)
-    logger.info(f"Counted {total_tokens} page content tokens ({search_token_limit} allowed)")
-
-    trimmed_tokens, search_result = trim_content_tokens(search_result, tokenizer, search_token_limit)
-    logger.info(f"{trimmed_tokens} tokens left after trimming ({len(search_result.scraped_pages)} pages)")
-
-    state.search_results.append(search_result)
-    state.executed_queries.append(state.next_search_query)
-    state.sources_token_counter += trimmed_tokens
-    state.search_counter += 1
+    # every query counts as a separate search towards the limit
+    queries = state.next_search_queries[:max(1, max_searches - state.search_counter)]
+
+    search_results = [prefetcher.take(query) if prefetcher is not None else None for query in queries]
+    for query, search_result in zip(queries, search_results):
+        if search_result is not None:
+            logger.info(f"Query '{query}' served by prefetched search '{search_result.query}'")
+
+    missing = [query for query, search_result in zip(queries, search_results) if search_result is None]
+    if len(missing) == 1:
+        logger.info(f"Calling Jina API with query='{missing[0]}'")
+        fetched = iter([jina_search(missing[0])])
+    elif missing:
+        logger.info(f"Calling Jina API concurrently with {len(missing)} queries: {missing}")
+        fetched = iter(jina_search_many(missing))
+    search_results = [search_result if search_result is not None else next(fetched) for search_result in search_results]
+
+    # pages were validated at the API boundary, from here on they are handled as plain records
+    search_results = [SearchRecord.from_result(search_result) for search_result in search_results]
+
+    for search_result in search_results:
+        # a prefetched candidate may differ from the chosen query, the searched one is what was executed
+        query = search_result.query
+        if search_result.from_cache:
+            logger.info(f"Search cache returned {len(search_result.scraped_pages)} pages for '{query}'")
+        else:
+            logger.info(f"Burned Jina API tokens: {search_result.total_jina_tokens}")
+            logger.info(f"Jina API returned {len(search_result.scraped_pages)} pages")
+
+        total_tokens, search_result = count_content_tokens(search_result, token_counter)
+        logger.info(f"Counted {total_tokens} page content tokens ({search_token_limit} allowed)")
+
+        trimmed_tokens, search_result = trim_content_tokens(search_result, token_counter, search_token_limit)
+        logger.info(f"{trimmed_tokens} tokens left after trimming ({len(search_result.scraped_pages)} pages)")
+
+        state.search_results.append(get_content_store().store_result(search_result))
+        state.executed_queries.append(query)
+        state.sources_token_counter += trimmed_tokens
+
+    state.search_counter += len(queries)
+    state.last_round_size = len(queries)
 
     return state
 
@@ -103,31 +177,44 @@ def loop_breaker(
         "msg_history",
         "user_query",
         "executed_queries",
+        "last_round_size",
+        "candidate_queries",
     ],
     writes=[
-        "next_search_query",
+        "next_search_queries",
+        "candidate_queries",
         "msg_history",
     ],
 )
 def generate_search_params(
     state: ApplicationState,
+    fan_out: int,
+    prefetch_candidates: int = 0,
+    prefetcher: Optional[SearchPrefetcher] = None,
 ) -> ApplicationState:
     if not state.search_results:
         raise ValueError("There must be at least one search result")
-    pages_with_content = jina_result_to_formatted_pages(state.search_results[-1])
-    pages_without_content = jina_result_to_formatted_pages(state.search_results[-1], include_content=False)
+    if prefetcher is not None:
+        # the searches run while the LLM reasons, the next round takes them if it picks a matching query
+        prefetcher.prefetch([q for q in state.candidate_queries if q not in state.executed_queries])
+    last_round = [get_content_store().load_result(result) for result in state.search_results[-state.last_round_size:]]
+    pages_with_content = format_search_round(last_round)
+    pages_without_content = format_search_round(last_round, include_content=False)
+
+    follow_ups = fan_out > 1 or prefetch_candidates > 0
+    struct_model = SearchReasoningFollowUps if follow_ups else SearchReasoningNextQuery
 
     # this message will be swapped
     state.msg_history.append(
         ChatMessage.from_user(
-            get_iterative_web_results_user_prompt_template()
+            get_iterative_web_results_user_prompt_template(follow_ups)
         )
     )
 
-    struct_pipe, input_builder, output_parser = build_azure_openai_struct_pipe(fsm_config.AZURE_DEPLOYMENT)
+    struct_pipe, input_builder, output_parser = get_pipe(build_azure_openai_struct_pipe, fsm_config.AZURE_DEPLOYMENT)
     pipe_input = input_builder(
         msgs=state.msg_history,
-        struct_model=SearchReasoningNextQuery,
+        struct_model=struct_model,
         generator_run_kwargs={
             "generation_kwargs": {
                 # "reasoning_effort": "low",
@@ -135,7 +222,7 @@ def generate_search_params(
         },
         template_variables={
             "user_query": state.user_query,
-            "search_result": "\n---\n".join(pages_with_content),
+            "search_result": pages_with_content,
             "executed_queries": state.executed_queries,
         },
     )
@@ -143,23 +230,99 @@ def generate_search_params(
         pipe_input,
     )
     ass_msg: ChatMessage = output_parser(pipe_output)[0]
-    llm_reasoning = SearchReasoningNextQuery.model_validate_json(ass_msg.text)
+    llm_reasoning = parse_struct_reply(struct_model, ass_msg.text)
 
     # remove content from search results to save tokens
-    state.msg_history[-1] = ChatMessage.from_user(get_iterative_web_results_user_prompt("\n---\n".join(pages_without_content), state.executed_queries))
-    # format JSON to LLM-friendly text and append as assistant message
-    formatted_ass_msg = format_llm_reasoning_next_query(llm_reasoning)
-    state.msg_history.append(ChatMessage.from_assistant(formatted_ass_msg))
-    # extract next search query
-    state.next_search_query = llm_reasoning.next_search_query
+    state.msg_history[-1] = ChatMessage.from_user(get_iterative_web_results_user_prompt(pages_without_content, state.executed_queries, follow_ups))
+
+    if follow_ups:
+        # format JSON to LLM-friendly text and append as assistant message
+        state.msg_history.append(ChatMessage.from_assistant(format_llm_reasoning_follow_ups(llm_reasoning)))
+        # extract next search queries, skipping repeats of already executed ones
+        queries = list(dict.fromkeys(q.strip() for q in llm_reasoning.search_result_follow_ups if q.strip()))
+        novel_queries = [q for q in queries if q not in state.executed_queries]
+        if not (novel_queries or queries):
+            raise ValueError("LLM returned no follow-up search queries")
+        state.next_search_queries = (novel_queries or queries)[:fan_out]
+        state.candidate_queries = novel_queries[fan_out:fan_out + prefetch_candidates]
+    else:
+        # format JSON to LLM-friendly text and append as assistant message
+        state.msg_history.append(ChatMessage.from_assistant(format_llm_reasoning_next_query(llm_reasoning)))
+        # extract next search query
+        state.next_search_queries = [llm_reasoning.next_search_query]
 
     return state
 
 
+def evaluate_page(page: PageRecord, search_query: str, token_limit: int) -> Optional[PageEvaluation]:
+    struct_pipe, input_builder, output_parser = get_pipe(build_azure_openai_struct_pipe, fsm_config.EVALUATION_AZURE_DEPLOYMENT)
+    page_content, _ = trim_to_token_budget(page.content, token_limit, page.content_tokens)
+    pipe_input = input_builder(
+        msgs=build_page_evaluation_msgs(),
+        struct_model=PageEvaluation,
+        template_variables={
+            "search_query": search_query,
+            "page_content": page_content,
+        },
+    )
+
+    # the pipeline goes through the shared azure_openai rate limiter
+    try:
+        pipe_output = struct_pipe.run(pipe_input)
+        ass_msg: ChatMessage = output_parser(pipe_output)[0]
+        return parse_struct_reply(PageEvaluation, ass_msg.text)
+    # provider errors arrive wrapped by the pipeline, invalid replies fail validation,
+    # anything else (e.g. a ReplayMiss of a broken replay) must not pass as an unevaluated page
+    except (PipelineRuntimeError, ValueError, IndexError):
+        logger.exception(f"Evaluation of {page.url} failed")
+        return None
+
+
 @action.pydantic(
     reads=[
         "search_results",
     ],
+    writes=[
+        "search_results",
+    ],
+)
+def evaluate_pages(
+    state: ApplicationState,
+    token_limit: int,
+    max_workers: int,
+) -> ApplicationState:
+    # every distinct URL is evaluated once, against the query that found it first
+    to_evaluate = {}
+    for result in state.search_results:
+        for page in result.scraped_pages:
+            url = canonicalize_url(page.url)
+            if page.evaluation is None and url not in to_evaluate:
+                to_evaluate[url] = (get_content_store().load_page(page), result.query)
+
+    logger.info(f"Evaluating {len(to_evaluate)} pages with {fsm_config.EVALUATION_AZURE_DEPLOYMENT}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        evaluations = dict(zip(
+            to_evaluate,
+            executor.map(in_current_context(lambda item: evaluate_page(item[0], item[1], token_limit)), to_evaluate.values()),
+        ))
+
+    for result in state.search_results:
+        for page in result.scraped_pages:
+            if page.evaluation is None:
+                page.evaluation = evaluations.get(canonicalize_url(page.url))
+
+    evaluated = sum(evaluation is not None for evaluation in evaluations.values())
+    logger.info(f"Evaluated {evaluated} of {len(to_evaluate)} pages")
+
+    return state
+
+
+@action.pydantic(
+    reads=[
+        "user_query",
+        "executed_queries",
+        "search_results",
+    ],
     writes=[
         "report_sources",
     ],
@@ -167,39 +330,80 @@ def generate_search_params(
 def prepare_report_sources(
     state: ApplicationState,
     sources_token_limit: int,
+    min_relevance: int,
+    near_duplicate_threshold: float,
+    retrieval_token_limit: Optional[int] = None,
+    retrieval_chunk_chars: int = 1600,
 ) -> ApplicationState:
     selected = []
-    discarded = {"too_short": [], "duplicates": []}
+    utilities = []
+    discarded = {"too_short": [], "duplicates": [], "near_duplicates": [], "irrelevant": []}
     seen_urls = set()
-    for result in state.search_results:
-        for page in result.scraped_pages:
+    near_duplicates = NearDuplicateIndex(threshold=near_duplicate_threshold)
+    for query_idx, result in enumerate(state.search_results):
+        for search_rank, page in enumerate(result.scraped_pages):
+            url = canonicalize_url(page.url)
             if page.content_tokens < 500:
                 discarded["too_short"].append(page)
-            elif page.url in seen_urls:
+                continue
+            if url in seen_urls:
                 discarded["duplicates"].append(page)
-            else:
-                seen_urls.add(page.url)
-                selected.append(page)
+                continue
+            if page.evaluation is not None and page.evaluation.relevance_score < min_relevance:
+                discarded["irrelevant"].append(page)
+                continue
+
+            page = get_content_store().load_page(page)
+            signature = near_duplicates.signature(page.content)
+            _, similarity = near_duplicates.most_similar(signature)
+            if similarity >= near_duplicate_threshold:
+                discarded["near_duplicates"].append(page)
+                continue
+
+            near_duplicates.insert(url, signature)
+            seen_urls.add(url)
+            selected.append(page)
+            utilities.append(source_utility(page.evaluation, query_idx, search_rank, novelty=1 - similarity))
 
     token_count = sum(page.content_tokens for page in selected)
 
     logger.info(f"Selected {len(selected)} pages with a total of {token_count} content tokens")
-    logger.info(f"Discarded {len(discarded['too_short'])} short pages and {len(discarded['duplicates'])} duplicates")
-
-    if token_count > 0:
-        token_overflow_ratio = max(0, (token_count - sources_token_limit) / token_count)
-    else:
-        token_overflow_ratio = 0
-    logger.info(f"Every selected page's content will be trimmed by {token_overflow_ratio*100:.0f}%")
-    for page in selected:
-        slice_idx = int(len(page.content)*(1-token_overflow_ratio))
-        page.content = page.content[:slice_idx]
-        page.content_tokens = count_gemini_tokens(page.content, fsm_config.GEMINI_MODEL)
-
-    token_count = sum(page.content_tokens for page in selected)
-    logger.info(f"Total number of content tokens after trimming: {token_count}")
-
-    state.report_sources = selected
+    logger.info(f"Discarded {len(discarded['too_short'])} short pages, {len(discarded['duplicates'])} duplicates, {len(discarded['near_duplicates'])} near-duplicates and {len(discarded['irrelevant'])} irrelevant pages")
+
+    n_selected = len(selected)
+    if retrieval_token_limit:
+        # only the passages matching the user query or one of the executed sub-queries are kept
+        queries = [state.user_query, *state.executed_queries]
+        utility_by_page = {id(page): utility for page, utility in zip(selected, utilities)}
+        retrieved = retrieve_source_chunks(selected, utilities, queries, retrieval_token_limit, retrieval_chunk_chars)
+        token_count = sum(page.content_tokens for page in retrieved)
+        logger.info(f"Retrieved chunks from {len(retrieved)} of {len(selected)} pages, {token_count} content tokens")
+        # the retrieved passages are packed like whole pages, which matters when SOURCES_TOKEN_LIMIT is the tighter limit
+        selected = retrieved
+        utilities = [utility_by_page[id(page)] for page in retrieved]
+
+    if token_counter.is_near(token_count, sources_token_limit):
+        # estimates may be off by the margin, recount exactly before deciding how much to trim
+        exact_counts = token_counter.exact_many([page.content for page in selected])
+        for page, content_tokens in zip(selected, exact_counts):
+            page.content_tokens = content_tokens
+        token_count = sum(page.content_tokens for page in selected)
+        logger.info(f"Exact recount near the budget boundary: {token_count} content tokens")
+
+    # strong pages keep more of their content, weak ones are trimmed harder or dropped
+    budgets = pack_sources([page.content_tokens for page in selected], utilities, sources_token_limit)
+    packed = []
+    for page, utility, page_budget in sorted(zip(selected, utilities, budgets), key=lambda item: item[1], reverse=True):
+        if page_budget == 0:
+            continue
+        if page_budget < page.content_tokens:
+            page.content, page.content_tokens = trim_to_token_budget(page.content, page_budget, page.content_tokens)
+        packed.append(page)
+
+    token_count = sum(page.content_tokens for page in packed)
+    logger.info(f"Packed {len(packed)} of {n_selected} pages, {token_count} content tokens after trimming")
+
+    state.report_sources = [get_content_store().store_page(page) for page in packed]
 
     return state
 
@@ -215,13 +419,17 @@ def prepare_report_sources(
 )
 def generate_report(
     state: ApplicationState,
+    streaming_callback: Optional[StreamingCallbackT] = None,
 ) -> ApplicationState:
-    generator_pipe, input_builder, output_parser = build_gemini_chat_pipe(fsm_config.GEMINI_MODEL)
+    generator_pipe, input_builder, output_parser = get_pipe(build_gemini_chat_pipe, fsm_config.GEMINI_MODEL)
     pipe_input = input_builder(
         msgs=build_report_generator_msgs(),
+        generator_run_kwargs={
+            "streaming_callback": streaming_callback,
+        },
         template_variables={
             "user_query": state.user_query,
-            "sources": format_pages_for_report(state.report_sources),
+            "sources": format_pages_for_report([get_content_store().load_page(page) for page in state.report_sources]),
         },
     )
     pipe_output = generator_pipe.run(pipe_input)
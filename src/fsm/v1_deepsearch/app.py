@@ -1,13 +1,24 @@
+import argparse
+import json
 import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, List, Optional, Set, TextIO
 
 from rich.logging import RichHandler
 from rich.console import Console
 from rich.panel import Panel
 
 from burr.core import Application, ApplicationBuilder, when
+from burr.core.persistence import SQLitePersister
 from burr.integrations.pydantic import PydanticTypingSystem
 
-from haystack.dataclasses import ChatRole
+from haystack.dataclasses import ChatRole, StreamingCallbackT
+
+from ...core import rate_limit_stats, get_replay_archive, use_replay_archive
+from ...nlp import StdoutSink, FileSink, build_streaming_callback
+
+from ..profiling import ProfilingHook
 
 from .models import ApplicationState
 from .actions import (
@@ -15,46 +26,165 @@ from .actions import (
     loop_breaker,
     generate_search_params,
     invoke_web_search_tool,
+    evaluate_pages,
     prepare_report_sources,
     generate_report,
     end,
+    get_content_store,
+    open_run_stores,
 )
 from .config import fsm_config
+from .prefetch import SearchPrefetcher
 
 logger = logging.getLogger(__name__)
 
+CHECKPOINT_TABLE = "v1_deepsearch"
 
-def build_burr_app(visualize: bool = False) -> Application:
-    app = (
+
+def build_checkpoint_persister(path: str) -> SQLitePersister:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # concurrent runs of the batch runner write to the same file
+    persister = SQLitePersister.from_values(path, table_name=CHECKPOINT_TABLE, connect_kwargs={"timeout": 30})
+    persister.initialize()
+    return persister
+
+
+def state_content_hashes(state: ApplicationState) -> List[str]:
+    """Content hashes referenced by a state, once per reference."""
+    hashes = [page.content_hash for result in state.search_results for page in result.scraped_pages]
+    return hashes + [page.content_hash for page in state.report_sources]
+
+
+def _collect_content_hashes(value: Any, hashes: Set[str]):
+    if isinstance(value, dict):
+        if isinstance(value.get("content_hash"), str):
+            hashes.add(value["content_hash"])
+        for item in value.values():
+            _collect_content_hashes(item, hashes)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_content_hashes(item, hashes)
+
+
+def checkpointed_content_hashes(path: str | Path) -> Set[str]:
+    """Content hashes referenced by any checkpoint in the SQLite file at path."""
+    hashes = set()
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        for (state,) in conn.execute(f"SELECT state FROM {CHECKPOINT_TABLE}"):
+            _collect_content_hashes(json.loads(state), hashes)
+    except sqlite3.OperationalError:
+        # no run was checkpointed yet
+        pass
+    finally:
+        conn.close()
+    return hashes
+
+
+def prune_content_store(max_age_days: float) -> int:
+    """Deletes stored page texts unused for max_age_days that no checkpoint references, so resumable runs stay resumable."""
+    keep = set()
+    if fsm_config.CHECKPOINT_PATH and Path(fsm_config.CHECKPOINT_PATH).exists():
+        keep = checkpointed_content_hashes(fsm_config.CHECKPOINT_PATH)
+    return get_content_store().prune(max_age_days * 86400, keep)
+
+
+def build_burr_app(
+    visualize: bool = False,
+    report_streaming_callback: Optional[StreamingCallbackT] = None,
+    app_id: Optional[str] = None,
+    fork_from_app_id: Optional[str] = None,
+) -> Application:
+    """
+    With CHECKPOINT_PATH set, the state is saved after every action and an existing app_id
+    continues from its last completed action. fork_from_app_id starts a new run from a copy of another one.
+    """
+    # nothing is written to disk before the first app is built
+    open_run_stores()
+
+    # page evaluation sits between the search loop and source selection when enabled
+    sources_entrypoint = "evaluate_pages" if fsm_config.EVALUATE_PAGES else "prepare_report_sources"
+    # one per app, so that concurrent runs never take each other's candidates
+    prefetcher = SearchPrefetcher(fsm_config.PREFETCH_MATCH_THRESHOLD) if fsm_config.PREFETCH_CANDIDATES > 0 else None
+
+    builder = (
         ApplicationBuilder()
         .with_actions(
-            init_msg_history,
+            init_msg_history.bind(
+                fan_out=fsm_config.SEARCH_FAN_OUT,
+                prefetch_candidates=fsm_config.PREFETCH_CANDIDATES,
+            ),
             invoke_web_search_tool.bind(
                 search_token_limit=fsm_config.SEARCH_TOKEN_LIMIT,
+                max_searches=fsm_config.MAX_NUMBER_SEARCHES,
+                prefetcher=prefetcher,
             ),
             loop_breaker.bind(
                 max_searches=fsm_config.MAX_NUMBER_SEARCHES,
                 sources_token_limit=fsm_config.SOURCES_TOKEN_LIMIT,
             ),
-            generate_search_params,
+            generate_search_params.bind(
+                fan_out=fsm_config.SEARCH_FAN_OUT,
+                prefetch_candidates=fsm_config.PREFETCH_CANDIDATES,
+                prefetcher=prefetcher,
+            ),
+            evaluate_pages.bind(
+                token_limit=fsm_config.EVALUATION_TOKEN_LIMIT,
+                max_workers=fsm_config.EVALUATION_MAX_WORKERS,
+            ),
             prepare_report_sources.bind(
                 sources_token_limit=fsm_config.SOURCES_TOKEN_LIMIT,
+                min_relevance=fsm_config.EVALUATION_MIN_RELEVANCE,
+                near_duplicate_threshold=fsm_config.NEAR_DUPLICATE_THRESHOLD,
+                retrieval_token_limit=fsm_config.RETRIEVAL_TOKEN_LIMIT,
+                retrieval_chunk_chars=fsm_config.RETRIEVAL_CHUNK_CHARS,
+            ),
+            generate_report.bind(
+                streaming_callback=report_streaming_callback,
             ),
-            generate_report,
             end,
         )
         .with_transitions(
             ("init_msg_history", "invoke_web_search_tool"),
             ("invoke_web_search_tool", "loop_breaker"),
             ("loop_breaker", "generate_search_params", when(continue_search=True)),
-            ("loop_breaker", "prepare_report_sources", when(continue_search=False)),
+            ("loop_breaker", sources_entrypoint, when(continue_search=False)),
             ("generate_search_params", "invoke_web_search_tool"),
+            ("evaluate_pages", "prepare_report_sources"),
             ("prepare_report_sources", "generate_report"),
             ("generate_report", "end"),
         )
         .with_typing(PydanticTypingSystem(ApplicationState))
-        .with_state(ApplicationState())
-        .with_entrypoint("init_msg_history")
+    )
+
+    if fsm_config.CHECKPOINT_PATH:
+        if fsm_config.CONTENT_STORE_PATH is None:
+            logger.warning("CONTENT_STORE_PATH is not set, page texts of a checkpointed run will not survive the process")
+        persister = build_checkpoint_persister(fsm_config.CHECKPOINT_PATH)
+        builder = (
+            builder
+            .initialize_from(
+                persister,
+                resume_at_next_action=True,
+                default_state=ApplicationState().model_dump(),
+                default_entrypoint="init_msg_history",
+                fork_from_app_id=fork_from_app_id,
+            )
+            .with_state_persister(persister)
+            .with_identifiers(app_id=app_id)
+        )
+    else:
+        builder = (
+            builder
+            .with_state(ApplicationState())
+            .with_entrypoint("init_msg_history")
+        )
+
+    if fsm_config.PROFILE_DIR:
+        builder = builder.with_hooks(ProfilingHook(fsm_config.PROFILE_DIR))
+
+    app = (
+        builder
         .with_tracker(project="v1_deepsearch")
         .build()
     )
@@ -68,6 +198,43 @@ def build_burr_app(visualize: bool = False) -> Application:
     return app
 
 
+def write_report_header(f: TextIO, user_query: str):
+    # Header
+    f.write("# Research Report\n\n")
+    
+    # Research Task
+    f.write("## Research Task\n\n")
+    f.write(f"{user_query}\n\n")
+    f.write("---\n\n")
+    
+    # Final Report
+    f.write("## Report\n\n")
+
+
+def write_report_appendix(f: TextIO, typed_state: ApplicationState):
+    f.write("\n\n---\n\n")
+    
+    # Search Queries
+    f.write("## Search Queries\n\n")
+    f.write(f"*{len(typed_state.executed_queries)} queries executed across {typed_state.search_counter} iterations*\n\n")
+    for idx, query in enumerate(typed_state.executed_queries, 1):
+        f.write(f"{idx}. `{query}`\n")
+    f.write("\n---\n\n")
+    
+    # Report Sources
+    f.write("## Sources\n\n")
+    f.write(f"*{len(typed_state.report_sources)} sources used for report generation*\n\n")
+    for idx, page in enumerate(typed_state.report_sources, 1):
+        f.write(f"### [{idx}] {page.title}\n\n")
+        f.write(f"**URL:** {page.url}\n\n")
+        f.write(f"**Description:** {page.description}\n\n")
+        content = get_content_store().get(page.content_hash)
+        content_preview = content[:3000]
+        if len(content) > 3000:
+            content_preview += "..."
+        f.write(f"<details>\n<summary>Content preview ({page.content_tokens} tokens)</summary>\n\n```\n{content_preview}\n```\n\n</details>\n\n")
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
@@ -83,19 +250,67 @@ if __name__ == "__main__":
         ]
     )
 
-    app = build_burr_app()
     query = "How to build a house in Germany? Explore the whole process from city approval to buying materials and finding contractors."
     query = "I am looking for Ausbildung and Studium programs in the UI/UX domain. I live in Rosenheim, Germany. Research what current options are available for me to enroll."
     query = "How to build a house in Germany? Explain the whole process."
     query = "What are the investment philosophies of Duan Yongping, Warren Buffett, and Charlie Munger?"
     query = "From 2020 to 2050, how many elderly people will there be in Japan? What is their consumption potential across various aspects such as clothing, food, housing, and transportation? Based on population projections, elderly consumer willingness, and potential changes in their consumption habits, please produce a market size analysis report for the elderly demographic."
     query = "Write a research paper about SOTA in Deep Search agentic systems with practical examples."
+
+    parser = argparse.ArgumentParser(description="Run the v1 deep search FSM")
+    parser.add_argument("--query", default=query, help="research question of a new run")
+    runs = parser.add_mutually_exclusive_group()
+    runs.add_argument("--resume", metavar="APP_ID", help="continue a checkpointed run after its last completed action")
+    runs.add_argument("--fork", metavar="APP_ID", help="start a new run from the last checkpoint of another one")
+    replay = parser.add_mutually_exclusive_group()
+    replay.add_argument("--record", metavar="ARCHIVE", help="store every Jina, count_tokens and LLM call of the run in ARCHIVE")
+    replay.add_argument("--replay", metavar="ARCHIVE", help="answer every external call from ARCHIVE, without network")
+    parser.add_argument("--prune-content", action="store_true", help="delete stored page texts older than CONTENT_STORE_MAX_AGE_DAYS that no checkpoint references, then exit")
+    args = parser.parse_args()
+
+    if args.prune_content:
+        if not (fsm_config.CONTENT_STORE_PATH and fsm_config.CONTENT_STORE_MAX_AGE_DAYS is not None):
+            parser.error("--prune-content needs CONTENT_STORE_PATH and CONTENT_STORE_MAX_AGE_DAYS in config.yaml")
+        prune_content_store(fsm_config.CONTENT_STORE_MAX_AGE_DAYS)
+        raise SystemExit(0)
+
+    if (args.resume or args.fork) and not fsm_config.CHECKPOINT_PATH:
+        parser.error("--resume and --fork need CHECKPOINT_PATH in config.yaml")
+    if args.record or args.replay:
+        use_replay_archive(args.record or args.replay, "record" if args.record else "replay")
+
+    report_path = "research_report.md"
+    report_sink = None
+    report_streaming_callback = None
+    if fsm_config.STREAM_REPORT:
+        report_sink = FileSink(report_path)
+        report_streaming_callback = build_streaming_callback(StdoutSink(), report_sink)
+
+    app = build_burr_app(
+        report_streaming_callback=report_streaming_callback,
+        app_id=args.resume,
+        fork_from_app_id=args.fork,
+    )
+    logger.info(f"Running app {app.uid}, pass --resume {app.uid} to continue it if it stops")
+
+    # a resumed run keeps the question it was started with
+    query = app.state.data.user_query or args.query
+    # a run resumed after its report was generated streams nothing, the report is taken from the state
+    stream_report = report_sink is not None and not app.state.data.final_report
+    if stream_report:
+        # the report section is filled chunk by chunk while Gemini generates it
+        with open(report_path, "w") as f:
+            write_report_header(f, query)
+
     final_action, result, state = app.run(
         halt_after=["end"], 
         inputs={"query" : query}
     )
 
     typed_state: ApplicationState = state.data
+    if report_sink is not None and not stream_report:
+        # shown like a streamed report, it was generated before the resume
+        print(typed_state.final_report)
     console = Console()
 
     # Print message history with proper formatting
@@ -118,37 +333,20 @@ if __name__ == "__main__":
         )
 
     # Save research report to markdown
-    with open("research_report.md", "w") as f:
-        # Header
-        f.write("# Research Report\n\n")
-        
-        # Research Task
-        f.write("## Research Task\n\n")
-        f.write(f"{typed_state.user_query}\n\n")
-        f.write("---\n\n")
-        
-        # Final Report
-        f.write("## Report\n\n")
-        f.write(f"{typed_state.final_report}\n\n")
-        f.write("---\n\n")
-        
-        # Search Queries
-        f.write("## Search Queries\n\n")
-        f.write(f"*{len(typed_state.executed_queries)} queries executed across {typed_state.search_counter} iterations*\n\n")
-        for idx, query in enumerate(typed_state.executed_queries, 1):
-            f.write(f"{idx}. `{query}`\n")
-        f.write("\n---\n\n")
-        
-        # Report Sources
-        f.write("## Sources\n\n")
-        f.write(f"*{len(typed_state.report_sources)} sources used for report generation*\n\n")
-        for idx, page in enumerate(typed_state.report_sources, 1):
-            f.write(f"### [{idx}] {page.title}\n\n")
-            f.write(f"**URL:** {page.url}\n\n")
-            f.write(f"**Description:** {page.description}\n\n")
-            content_preview = page.content[:3000]
-            if len(page.content) > 3000:
-                content_preview += "..."
-            f.write(f"<details>\n<summary>Content preview ({page.content_tokens} tokens)</summary>\n\n```\n{content_preview}\n```\n\n</details>\n\n")
+    if stream_report:
+        report_sink.close()
+        with open(report_path, "a") as f:
+            write_report_appendix(f, typed_state)
+    else:
+        with open(report_path, "w") as f:
+            write_report_header(f, typed_state.user_query)
+            f.write(typed_state.final_report)
+            write_report_appendix(f, typed_state)
     
     logger.info("Research report saved to research_report.md")
+    if fsm_config.PROFILE_DIR:
+        logger.info(f"Timing profile saved to {Path(fsm_config.PROFILE_DIR) / app.uid}.json and .prom")
+    for provider, stats in rate_limit_stats().items():
+        logger.info(f"Rate limiter {provider}: {stats}")
+    if (replay_archive := get_replay_archive()) is not None:
+        logger.info(f"Replay archive {replay_archive.path} ({replay_archive.mode}): {replay_archive.stats()}")
@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from rich.logging import RichHandler
+
+from ...core import rate_limit_stats
+from ...nlp import FileSink, build_streaming_callback
+
+from .models import ApplicationState
+from .actions import get_content_store
+from .app import build_burr_app, write_report_header, write_report_appendix, state_content_hashes, prune_content_store
+from .config import fsm_config
+
+logger = logging.getLogger(__name__)
+
+
+def read_queries(path: str | Path) -> List[Dict[str, Any]]:
+    """Reads one {"query": ..., "id": ..., "app_id": ...} object per line, only "query" is required."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("query"):
+                raise ValueError(f"Line {line_no} of {path} has no query")
+            item.setdefault("id", f"query_{line_no:04d}")
+            queries.append(item)
+    return queries
+
+
+def report_file_name(query_id: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(query_id)) + ".md"
+
+
+def run_research(query: str, report_path: Path, app_id: Optional[str] = None) -> Dict[str, Any]:
+    """Runs one application to the end and writes its report. Jina pools, caches, pipes and rate limiters are module-level, so all runs share them."""
+    report_sink = None
+    report_streaming_callback = None
+    if fsm_config.STREAM_REPORT:
+        # opens the file on the first chunk, after the header is written
+        report_sink = FileSink(report_path)
+        report_streaming_callback = build_streaming_callback(report_sink)
+
+    app = build_burr_app(report_streaming_callback=report_streaming_callback, app_id=app_id)
+    # a resumed run keeps the question it was started with
+    query = app.state.data.user_query or query
+    logger.info(f"Started app {app.uid} for '{query}'")
+
+    # a run resumed after its report was generated streams nothing, the report is taken from the state
+    stream_report = report_sink is not None and not app.state.data.final_report
+    if stream_report:
+        with open(report_path, "w") as f:
+            write_report_header(f, query)
+
+    try:
+        _, _, state = app.run(
+            halt_after=["end"],
+            inputs={"query": query},
+        )
+        typed_state: ApplicationState = state.data
+        if stream_report:
+            report_sink.close()
+            with open(report_path, "a") as f:
+                write_report_appendix(f, typed_state)
+        else:
+            with open(report_path, "w") as f:
+                write_report_header(f, typed_state.user_query)
+                f.write(typed_state.final_report)
+                write_report_appendix(f, typed_state)
+    finally:
+        if report_sink is not None:
+            report_sink.close()
+        # texts kept in memory are freed once no other run references them
+        get_content_store().release(state_content_hashes(app.state.data))
+
+    return {"app_id": app.uid, "searches": typed_state.search_counter, "sources": len(typed_state.report_sources)}
+
+
+def run_batch(queries: List[Dict[str, Any]], output_dir: str | Path, max_workers: int) -> List[Dict[str, Any]]:
+    """Runs all queries on max_workers threads. A failed query is logged and reported, the others keep running."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    def run_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        report_path = output_dir / report_file_name(item["id"])
+        result = {"id": item["id"], "query": item["query"], "report_path": str(report_path)}
+        # known up front so that a failed checkpointed run can be resumed by putting its app_id back into the input
+        app_id = item.get("app_id") or (str(uuid.uuid4()) if fsm_config.CHECKPOINT_PATH else None)
+        if app_id is not None:
+            result["app_id"] = app_id
+        try:
+            result.update(run_research(item["query"], report_path, app_id))
+            result["status"] = "done"
+        except Exception as e:
+            logger.exception(f"Research for '{item['id']}' failed")
+            result.update({"status": "failed", "error": repr(e)})
+        return result
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_item, item) for item in queries]
+        for future in as_completed(futures):
+            result = future.result()
+            logger.info(f"[{len(results) + 1}/{len(queries)}] {result['id']}: {result['status']}")
+            results.append(result)
+
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(threadName)s %(message)s",
+        datefmt="[%X]",
+        handlers=[
+            RichHandler(
+                rich_tracebacks=True,
+                show_time=True,
+                show_path=True,
+                markup=True
+            )
+        ]
+    )
+
+    parser = argparse.ArgumentParser(description="Run the v1 deep search FSM over a JSONL file of queries")
+    parser.add_argument("queries", help='JSONL file with one {"query": ..., "id": ..., "app_id": ...} per line')
+    parser.add_argument("--output-dir", default="reports", help="directory for the reports and results.jsonl")
+    parser.add_argument("--workers", type=int, default=fsm_config.BATCH_MAX_WORKERS, help="runs executed concurrently")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    logger.info(f"Running {len(queries)} queries with {args.workers} workers")
+    results = run_batch(queries, args.output_dir, args.workers)
+
+    results_path = Path(args.output_dir) / "results.jsonl"
+    with open(results_path, "w", encoding="utf-8") as f:
+        for result in sorted(results, key=lambda result: str(result["id"])):
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if fsm_config.CONTENT_STORE_PATH and fsm_config.CONTENT_STORE_MAX_AGE_DAYS is not None:
+        prune_content_store(fsm_config.CONTENT_STORE_MAX_AGE_DAYS)
+
+    failed = [result["id"] for result in results if result["status"] != "done"]
+    logger.info(f"Finished {len(results) - len(failed)} of {len(results)} queries, results in {results_path}")
+    if failed:
+        logger.warning(f"Failed queries: {failed}")
+    for provider, stats in rate_limit_stats().items():
+        logger.info(f"Rate limiter {provider}: {stats}")
@@ -1,15 +1,55 @@
 import yaml
 from pathlib import Path
+from typing import Literal, Optional
 
 from pydantic import BaseModel
 
 
 class FSMConfig(BaseModel):
     MAX_NUMBER_SEARCHES: int
+    SEARCH_FAN_OUT: int = 1
+    # extra follow-up queries the LLM proposes each round, searched in the background while it reasons about the next one
+    PREFETCH_CANDIDATES: int = 0
+    # term overlap (Jaccard) above which a chosen query is served by a prefetched search of a candidate
+    PREFETCH_MATCH_THRESHOLD: float = 0.6
     SEARCH_TOKEN_LIMIT: int
     SOURCES_TOKEN_LIMIT: int
     AZURE_DEPLOYMENT: str
     GEMINI_MODEL: str
+    # score pages with a small model before selecting report sources
+    EVALUATE_PAGES: bool = False
+    EVALUATION_AZURE_DEPLOYMENT: str = "gpt-5-nano"
+    EVALUATION_TOKEN_LIMIT: int = 8000
+    EVALUATION_MIN_RELEVANCE: int = 2
+    EVALUATION_MAX_WORKERS: int = 8
+    # estimated Jaccard similarity above which a page counts as a copy of an earlier one
+    NEAR_DUPLICATE_THRESHOLD: float = 0.8
+    # report sources are cut down to the chunks best matching the queries, None sends whole pages
+    RETRIEVAL_TOKEN_LIMIT: Optional[int] = None
+    RETRIEVAL_CHUNK_CHARS: int = 1600
+    # stream the report to stdout and research_report.md while it is generated
+    STREAM_REPORT: bool = False
+    # "exact" calls the Gemini count_tokens API for every page, "estimate" counts offline
+    TOKEN_COUNTING: Literal["exact", "estimate"] = "exact"
+    TOKEN_ESTIMATE_MARGIN: float = 0.1
+    TOKEN_CALIBRATION_SAMPLES: int = 5
+    TOKEN_COUNT_MAX_WORKERS: int = 8
+    # applications run concurrently by the batch runner
+    BATCH_MAX_WORKERS: int = 4
+    # SQLite file where the state is saved after every action so that runs can be resumed, None disables it
+    CHECKPOINT_PATH: Optional[str] = None
+    # directory holding page texts referenced from the FSM state, None keeps them in memory
+    CONTENT_STORE_PATH: Optional[str] = None
+    # stored page texts not used for this long are pruned after a batch or with --prune-content, unless a checkpoint
+    # references them; None keeps them forever
+    CONTENT_STORE_MAX_AGE_DAYS: Optional[float] = 14
+    # directory for per-run timing profiles (<app_id>.json and .prom), None disables profiling
+    PROFILE_DIR: Optional[str] = None
+    # "record" stores every Jina, count_tokens and LLM call in REPLAY_PATH, "replay" answers them from it without network
+    REPLAY_MODE: Optional[Literal["record", "replay"]] = None
+    REPLAY_PATH: Optional[str] = None
+    # persistent tier of the token count cache, None keeps counts in memory only
+    TOKEN_CACHE_PATH: Optional[str] = None
 
     @classmethod
     def from_yaml(cls, path: str | Path) -> "FSMConfig":
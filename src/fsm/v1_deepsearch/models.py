@@ -2,17 +2,34 @@ from typing import List
 from pydantic import BaseModel
 from haystack.dataclasses import ChatMessage
 
-from ...models import JinaReaderSearchResult, ScrapedWebPage
+from burr.core.state import register_field_serde
+
+from ...models import StoredSearchResult, StoredWebPage
 
 
 class ApplicationState(BaseModel):
     user_query: str = ""
-    next_search_query: str = ""
+    next_search_queries: List[str] = []
+    # follow-ups not searched this round, prefetched while the next round is reasoned about
+    candidate_queries: List[str] = []
     final_report: str = ""
     executed_queries: List[str] = []
     msg_history: List[ChatMessage] = []
-    search_results: List[JinaReaderSearchResult] = []
-    report_sources: List[ScrapedWebPage] = []
+    search_results: List[StoredSearchResult] = []
+    report_sources: List[StoredWebPage] = []
     sources_token_counter: int = 0
     search_counter: int = 0
+    last_round_size: int = 0
     continue_search: bool = True
+
+
+def serialize_msg_history(value: List[ChatMessage], **kwargs) -> dict:
+    return {"messages": [msg.to_dict() for msg in value]}
+
+
+def deserialize_msg_history(value: dict, **kwargs) -> List[ChatMessage]:
+    return [ChatMessage.from_dict(msg) for msg in value["messages"]]
+
+
+# ChatMessage is a dataclass, without this Burr would persist it as its str() and could not restore it
+register_field_serde("msg_history", serialize_msg_history, deserialize_msg_history)
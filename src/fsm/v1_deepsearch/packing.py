@@ -0,0 +1,130 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from ...models import PageEvaluation, PageRecord
+from ...nlp import ChunkIndex
+
+# Marks content left out between two retrieved chunks of a page
+CHUNK_SEPARATOR = "\n\n[...]\n\n"
+
+# Utility decay for pages found by later queries and ranked lower within a search
+QUERY_ORDER_DECAY = 0.05
+SEARCH_RANK_DECAY = 0.1
+
+
+def source_utility(
+    evaluation: Optional[PageEvaluation],
+    query_idx: int,
+    search_rank: int,
+    novelty: float,
+) -> float:
+    """
+    Value of a page as a report source in (0, 1]: evaluation score (relevance times depth,
+    scale midpoint when not evaluated) weighted by query order, rank within its search and
+    how much of its content is not covered by already selected pages.
+    """
+    score = 9 if evaluation is None else evaluation.relevance_score * evaluation.depth_score
+    query_weight = 1 / (1 + QUERY_ORDER_DECAY * query_idx)
+    rank_weight = 1 / (1 + SEARCH_RANK_DECAY * search_rank)
+    return max(score / 25 * query_weight * rank_weight * novelty, 1e-6)
+
+
+def _water_level(tokens: List[int], utilities: List[float], active: List[int], token_limit: int) -> float:
+    # budget share per unit of utility so that sum(min(tokens_i, level * utility_i)) == token_limit
+    order = sorted(active, key=lambda i: tokens[i] / utilities[i])
+    remaining_budget = token_limit
+    remaining_utility = sum(utilities[i] for i in order)
+    for i in order:
+        level = remaining_budget / remaining_utility
+        if tokens[i] / utilities[i] > level:
+            return level
+        # the page fits whole below the current level
+        remaining_budget -= tokens[i]
+        remaining_utility -= utilities[i]
+    return float("inf")
+
+
+def pack_sources(tokens: List[int], utilities: List[float], token_limit: int, min_tokens: int = 500) -> List[int]:
+    """
+    Splits token_limit across pages and returns the tokens allotted to each, 0 for dropped pages.
+
+    Maximizes sum(utility_i * log(allotted_i)), a knapsack with diminishing returns per page:
+    every page gets a share proportional to its utility, capped at its size, with the budget
+    freed by short pages going to the rest (water-filling). The weakest pages are dropped until
+    every remaining share reaches min_tokens; dropping more pages only grows the others' shares,
+    so the number to drop is binary searched, which keeps the whole packing at O(n log^2 n).
+    """
+    if sum(tokens) <= token_limit:
+        return list(tokens)
+
+    by_utility = sorted((i for i in range(len(tokens)) if tokens[i] > 0), key=lambda i: utilities[i])
+
+    def allot(n_dropped: int) -> Dict[int, int]:
+        active = by_utility[n_dropped:]
+        if not active:
+            return {}
+        level = _water_level(tokens, utilities, active, token_limit)
+        if level == float("inf"):
+            return {i: tokens[i] for i in active}
+        return {i: min(tokens[i], int(level * utilities[i])) for i in active}
+
+    def large_enough(allotted: Dict[int, int]) -> bool:
+        return all(allotted[i] >= min(min_tokens, tokens[i]) for i in allotted)
+
+    lo, hi = 0, len(by_utility)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if large_enough(allot(mid)):
+            hi = mid
+        else:
+            lo = mid + 1
+
+    allotted = allot(lo)
+    return [allotted.get(i, 0) for i in range(len(tokens))]
+
+
+def retrieve_source_chunks(
+    pages: List[PageRecord],
+    utilities: List[float],
+    queries: List[str],
+    token_limit: int,
+    chunk_chars: int = 1600,
+) -> List[PageRecord]:
+    """
+    Keeps only the chunks of each page that best match the queries, up to token_limit in total.
+    Chunks are ranked by BM25 score weighted by the utility of their page and put back
+    in document order; pages are returned by their best chunk, pages without a match are dropped.
+    """
+    index = ChunkIndex(chunk_chars)
+    for page_idx, page in enumerate(pages):
+        index.add_document(page_idx, page.content)
+
+    hits = sorted(
+        ((page_idx, chunk, score * utilities[page_idx]) for page_idx, chunk, score in index.search(queries)),
+        key=lambda hit: hit[2],
+        reverse=True,
+    )
+
+    chosen = defaultdict(list)
+    best_score = {}
+    used_tokens = 0
+    for page_idx, chunk, score in hits:
+        page = pages[page_idx]
+        # chunk share of the page count, so no chunk has to be counted on its own
+        chunk_tokens = math.ceil((chunk.end - chunk.start) * page.content_tokens / max(1, len(page.content)))
+        if used_tokens + chunk_tokens > token_limit:
+            continue
+        chosen[page_idx].append((chunk, chunk_tokens))
+        best_score.setdefault(page_idx, score)
+        used_tokens += chunk_tokens
+
+    retrieved = []
+    for page_idx in sorted(chosen, key=best_score.get, reverse=True):
+        page = pages[page_idx]
+        chunks = sorted(chosen[page_idx], key=lambda item: item[0].start)
+        page.content = CHUNK_SEPARATOR.join(page.content[chunk.start:chunk.end] for chunk, _ in chunks)
+        page.content_tokens = sum(chunk_tokens for _, chunk_tokens in chunks)
+        retrieved.append(page)
+
+    return retrieved
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from ...models import JinaReaderSearchResult
+from ...nlp import tokenize_terms
+from ...tools import jina_search_background
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def query_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of the term sets of two queries."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SearchPrefetcher:
+    """
+    Searches candidate queries in the background so that a later round can pick up the results instead of
+    waiting for Jina. A chosen query is served by a pending search of the same query or, failing that, of the
+    candidate whose terms overlap it the most, when the overlap reaches match_threshold.
+    Searches that are not taken within ttl_seconds are cancelled, finished ones have their results in the search cache.
+    Every application gets its own prefetcher, so that a run is never served another run's candidates.
+    """
+
+    def __init__(self, match_threshold: float = 0.6, ttl_seconds: float = 600):
+        self.match_threshold = match_threshold
+        self.ttl_seconds = ttl_seconds
+        # normalized query -> (query terms, pending search, start time)
+        self._pending: Dict[str, Tuple[FrozenSet[str], Future, float]] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.served = 0
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        for key in [key for key, (_, _, started) in self._pending.items() if now - started > self.ttl_seconds]:
+            self._pending.pop(key)[1].cancel()
+
+    def prefetch(self, queries: List[str]):
+        """Starts a background search for every query that is not already pending."""
+        with self._lock:
+            self._drop_expired()
+            for query in queries:
+                key = normalize_query(query)
+                if not key or key in self._pending:
+                    continue
+                self._pending[key] = (frozenset(tokenize_terms(query)), jina_search_background(query), time.monotonic())
+                self.started += 1
+                logger.info(f"Prefetching search for candidate query '{query}'")
+
+    def _match(self, query: str) -> Optional[Future]:
+        key = normalize_query(query)
+        with self._lock:
+            self._drop_expired()
+            if key not in self._pending:
+                terms = frozenset(tokenize_terms(query))
+                scored = [(query_similarity(terms, candidate_terms), candidate) for candidate, (candidate_terms, _, _) in self._pending.items()]
+                similarity, key = max(scored, default=(0.0, None))
+                if key is None or similarity < self.match_threshold:
+                    return None
+            return self._pending.pop(key)[1]
+
+    def take(self, query: str) -> Optional[JinaReaderSearchResult]:
+        """
+        Returns the prefetched result matching query, waiting for it if the search is still running.
+        None when nothing matches or the prefetched search failed.
+        """
+        future = self._match(query)
+        if future is None:
+            return None
+        try:
+            search_result = future.result()
+        except Exception:
+            logger.exception(f"Prefetched search for '{query}' failed")
+            return None
+        if not search_result.success:
+            return None
+        with self._lock:
+            self.served += 1
+        return search_result
+
+    def clear(self):
+        """Cancels every pending search."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for _, future, _ in pending.values():
+            future.cancel()
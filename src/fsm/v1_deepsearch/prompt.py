@@ -150,10 +150,12 @@ Each search query you generate should be:
 """
 
 
-def get_iterative_searcher_follow_ups_sys_prompt() -> str:
-    return """You are an assistant that gathers web sources to support a research task.
+def get_iterative_searcher_follow_ups_sys_prompt(max_follow_ups: int = 3) -> str:
+    return f"""You are an assistant that gathers web sources to support a research task.
 
-Based on the latest search results, identify 1-3 promising directions for the next search to increase source coverage on the research topic.
+Based on the latest search results, identify 1-{max_follow_ups} promising directions for the next search to increase source coverage on the research topic.
+Every direction is sent to the web search engine as is, so phrase it as a search query.
+List the most promising direction first.
 
 Each search direction you generate should be:
 - **Relevant**: Sticks to the research goal
@@ -171,7 +173,7 @@ Collect diverse and relevant web sources for this task.
 """
 
 
-ITERATIVE_WEB_RESULTS_TEMPLATE = \
+ITERATIVE_WEB_RESULTS_HEADER = \
 """**Web Search Results:**
 {{ search_result }}
 
@@ -179,19 +181,27 @@ ITERATIVE_WEB_RESULTS_TEMPLATE = \
 {%- for q in executed_queries %}
 - {{ q }}
 {%- endfor %}
+"""
 
+ITERATIVE_WEB_RESULTS_TEMPLATE = ITERATIVE_WEB_RESULTS_HEADER + \
+"""
 Analyze the results and generate a new search query that is semantically different from all of the above.
 """
 
+ITERATIVE_WEB_RESULTS_FOLLOW_UPS_TEMPLATE = ITERATIVE_WEB_RESULTS_HEADER + \
+"""
+Analyze the results and list follow-up search queries, each semantically different from all of the above and from each other.
+"""
+
 
-def get_iterative_web_results_user_prompt_template() -> str:
+def get_iterative_web_results_user_prompt_template(follow_ups: bool = False) -> str:
     """Return raw template for Haystack's ChatPromptBuilder."""
-    return ITERATIVE_WEB_RESULTS_TEMPLATE
+    return ITERATIVE_WEB_RESULTS_FOLLOW_UPS_TEMPLATE if follow_ups else ITERATIVE_WEB_RESULTS_TEMPLATE
 
 
-def get_iterative_web_results_user_prompt(search_result: str, executed_queries: list[str]) -> str:
+def get_iterative_web_results_user_prompt(search_result: str, executed_queries: list[str], follow_ups: bool = False) -> str:
     """Render template with actual values (for message swapping)."""
-    template = Template(ITERATIVE_WEB_RESULTS_TEMPLATE)
+    template = Template(get_iterative_web_results_user_prompt_template(follow_ups))
     return template.render(search_result=search_result, executed_queries=executed_queries)
 
 
@@ -1,12 +1,11 @@
-import json
 import logging
-from pathlib import Path
-from typing import Callable, List
+from typing import List
 
 from haystack.dataclasses import ChatMessage
 
-from ...models import JinaReaderSearchResult, ScrapedWebPage, SearchReasoningNextQuery, SearchReasoningFollowUps
-from ...tools import jina_search
+from ...models import PageRecord, SearchRecord, SearchReasoningNextQuery, SearchReasoningFollowUps
+from ...nlp import GeminiTokenCounter, trim_to_token_budget
+from ...tools import jina_result_to_formatted_pages
 
 from .prompt import (
     get_page_eval_sys_prompt,
@@ -16,50 +15,13 @@ from .prompt import (
     get_page_relevance_user_prompt_template,
     get_page_depth_user_prompt_template,
     get_iterative_searcher_next_query_sys_prompt,
+    get_iterative_searcher_follow_ups_sys_prompt,
     get_final_report_sys_prompt,
     get_final_report_user_prompt_template,
     get_iterative_searcher_user_prompt_template,
 )
 logger = logging.getLogger(__name__)
 
-# Cache file path - in the same directory as temp.py
-CACHE_FILE = Path(__file__).parent / "jina_search_cache.json"
-
-
-def load_cache() -> dict:
-    if CACHE_FILE.exists():
-        with open(CACHE_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-
-def save_cache(cache: dict):
-    with open(CACHE_FILE, "w") as f:
-        json.dump(cache, f, indent=2)
-
-
-def get_cached_or_fetch(query: str, num_pages: int) -> JinaReaderSearchResult:    
-    cache = load_cache()
-    cache_key = f"{query}|{num_pages}"
-    
-    if cache_key in cache:
-        logger.info(f"Cache HIT for query: '{query[:50]}...'")
-        search_result = JinaReaderSearchResult.model_validate(cache[cache_key])
-        logger.info(f"Read {len(search_result.scraped_pages)} cached pages")
-    
-    else:
-        logger.info(f"Cache MISS for query: '{query[:50]}...' - fetching from Jina API")
-        search_result = jina_search(query, num_pages)
-        
-        logger.info(f"Number of burned Jina API tokens: {search_result.total_jina_tokens}")
-        logger.info(f"Jina API returned {len(search_result.scraped_pages)} pages")
-
-        # Save to cache (using model_dump with mode='json' for JSON-serializable output)
-        cache[cache_key] = search_result.model_dump(mode='json')
-        save_cache(cache)
-    
-    return search_result
-
 
 def build_page_relevance_msgs() -> List[ChatMessage]:
     sys_message = ChatMessage.from_system(get_page_relevance_sys_prompt())
@@ -82,14 +44,30 @@ def build_page_evaluation_msgs() -> List[ChatMessage]:
     return [sys_message, user_message]
 
 
-def build_iterative_searcher_msgs() -> List[ChatMessage]:
-    sys_message = ChatMessage.from_system(get_iterative_searcher_next_query_sys_prompt())
+def build_iterative_searcher_msgs(fan_out: int = 1, prefetch_candidates: int = 0) -> List[ChatMessage]:
+    if fan_out > 1 or prefetch_candidates > 0:
+        # prefetch candidates are asked for as extra follow-ups
+        sys_message = ChatMessage.from_system(get_iterative_searcher_follow_ups_sys_prompt(fan_out + prefetch_candidates))
+    else:
+        sys_message = ChatMessage.from_system(get_iterative_searcher_next_query_sys_prompt())
     user_message = ChatMessage.from_user(get_iterative_searcher_user_prompt_template())
 
     return [sys_message, user_message]
 
 
-def format_pages_for_report(pages: List[ScrapedWebPage]) -> str:
+def format_search_round(search_results: List[SearchRecord], include_content: bool = True) -> str:
+    if len(search_results) == 1:
+        return "\n---\n".join(jina_result_to_formatted_pages(search_results[0], include_content))
+
+    formatted = []
+    for search_result in search_results:
+        pages = jina_result_to_formatted_pages(search_result, include_content)
+        formatted.append(f"**Query:** {search_result.query}\n\n" + "\n---\n".join(pages))
+
+    return "\n===\n".join(formatted)
+
+
+def format_pages_for_report(pages: List[PageRecord]) -> str:
     if not pages:
         return "No sources available."
     
@@ -122,25 +100,25 @@ def format_llm_reasoning_follow_ups(llm_reasoning: SearchReasoningFollowUps) ->
 {follow_ups_formatted}"""
 
 
-def count_content_tokens(search_result: JinaReaderSearchResult, tokenizer: Callable[[str], int]):
-    total = 0
-    for page in search_result.scraped_pages:
-        content_tokens = tokenizer(page.content)
+def count_content_tokens(search_result: SearchRecord, tokenizer: GeminiTokenCounter):
+    pages = search_result.scraped_pages
+    counts = tokenizer.count_many([page.content for page in pages])
+    for page, content_tokens in zip(pages, counts):
         page.content_tokens = content_tokens
-        total += content_tokens
     
-    return total, search_result
+    return sum(counts), search_result
 
 
-def trim_content_tokens(search_result: JinaReaderSearchResult, tokenizer: Callable[[str], int], token_limit: int):
+def trim_content_tokens(search_result: SearchRecord, tokenizer: GeminiTokenCounter, token_limit: int):
     total = 0
     pages = []
     for page in search_result.scraped_pages:
         tokens_available = token_limit - total
+        # an estimate this close to the budget decides whether the page is cut, so count it exactly
+        if tokenizer.is_near(page.content_tokens, tokens_available):
+            page.content_tokens = tokenizer.exact(page.content)
         if page.content_tokens > tokens_available:
-            to_keep_ratio = tokens_available / page.content_tokens
-            page.content = page.content[:int(len(page.content) * to_keep_ratio)]
-            page.content_tokens = tokenizer(page.content)
+            page.content, page.content_tokens = trim_to_token_budget(page.content, tokens_available, page.content_tokens)
             pages.append(page)
             total += page.content_tokens
             break
@@ -1,3 +1,4 @@
-from .config import OpenAISettings, AzureOpenAISettings, JinaConfig, GeminiSettings
-from .jina import ScrapedWebPage, JinaReaderSearchResult
+from .config import OpenAISettings, AzureOpenAISettings, JinaConfig, GeminiSettings, ProviderLimits, RateLimitConfig
+from .jina import ScrapedWebPage, JinaReaderSearchResult, StoredWebPage, StoredSearchResult
 from .llm import PageEvaluation, PageEvaluationSeparate, PageRelevanceEvaluation, PageDepthEvaluation, SearchReasoningNextQuery, SearchReasoningFollowUps
+from .records import PageRecord, SearchRecord
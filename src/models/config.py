@@ -1,7 +1,9 @@
 import yaml
+from functools import cached_property
 from pathlib import Path
+from typing import Dict, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -43,8 +45,27 @@ class GeminiSettings(BaseSettings):
 
 
 class JinaConfig(BaseModel):
-    envs: JinaEnvs = Field(default_factory=JinaEnvs)
     NUM_PAGES_PER_SEARCH: int
+    # search endpoint, pointed at a local stand-in by the benchmarks
+    SEARCH_URL: str = "https://s.jina.ai/"
+    # HTTP session settings for s.jina.ai
+    POOL_SIZE: int = 10
+    CONNECT_TIMEOUT: float = 5
+    READ_TIMEOUT: float = 30
+    MAX_RETRIES: int = 3
+    RETRY_BACKOFF_FACTOR: float = 1.0
+    # max in-flight requests per event loop for the async API
+    MAX_CONCURRENT_REQUESTS: int = 5
+    # on-disk search cache shared across runs
+    CACHE_ENABLED: bool = True
+    CACHE_PATH: str = ".cache/jina_search.sqlite3"
+    CACHE_TTL_SECONDS: Optional[float] = 604800
+    CACHE_MAX_ENTRIES: Optional[int] = 10000
+
+    @cached_property
+    def envs(self) -> JinaEnvs:
+        # read on first use, only code that calls the API needs the key
+        return JinaEnvs()
 
     @classmethod
     def from_yaml(cls, path: str | Path) -> "JinaConfig":
@@ -55,3 +76,27 @@ class JinaConfig(BaseModel):
         data = yaml.safe_load(p.read_text(encoding="utf-8"))
 
         return cls.model_validate(data)
+
+
+class ProviderLimits(BaseModel):
+    # None leaves the dimension unlimited
+    RPM: Optional[float] = None
+    TPM: Optional[float] = None
+
+
+class RateLimitConfig(BaseModel):
+    PROVIDERS: Dict[str, ProviderLimits] = {}
+    # retries of a rate limited call and the backoff applied when the provider sends no Retry-After
+    MAX_RETRIES: int = 5
+    BACKOFF_BASE: float = 1.0
+    MAX_BACKOFF: float = 60.0
+
+    @classmethod
+    def from_yaml(cls, path: str | Path) -> "RateLimitConfig":
+        p = Path(path)
+        if p.suffix.lower() not in {".yaml", ".yml"}:
+            raise ValueError("The file must have a YAML extension")
+
+        data = yaml.safe_load(p.read_text(encoding="utf-8"))
+
+        return cls.model_validate(data)
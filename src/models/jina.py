@@ -1,6 +1,8 @@
 from typing import List, Optional
 from pydantic import BaseModel, HttpUrl
 
+from .llm import PageEvaluation
+
 
 class ScrapedWebPage(BaseModel):
     url: HttpUrl
@@ -9,6 +11,7 @@ class ScrapedWebPage(BaseModel):
     content: str
     jina_tokens: int
     content_tokens: Optional[int] = None
+    evaluation: Optional[PageEvaluation] = None
 
 
 class JinaReaderSearchResult(BaseModel):
@@ -16,3 +19,24 @@ class JinaReaderSearchResult(BaseModel):
     success: bool
     scraped_pages: List[ScrapedWebPage] = []
     total_jina_tokens: Optional[int] = None
+    from_cache: bool = False
+
+
+class StoredWebPage(BaseModel):
+    """ScrapedWebPage whose content is kept in a content store under content_hash."""
+    # validated when the page was scraped, kept as a string from then on
+    url: str
+    title: str
+    description: str
+    content_hash: str
+    jina_tokens: int
+    content_tokens: Optional[int] = None
+    evaluation: Optional[PageEvaluation] = None
+
+
+class StoredSearchResult(BaseModel):
+    query: str
+    success: bool
+    scraped_pages: List[StoredWebPage] = []
+    total_jina_tokens: Optional[int] = None
+    from_cache: bool = False
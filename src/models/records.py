@@ -0,0 +1,51 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .jina import ScrapedWebPage, JinaReaderSearchResult
+from .llm import PageEvaluation
+
+
+@dataclass(slots=True)
+class PageRecord:
+    """
+    Plain page record used inside the FSM loops. Fields are trusted, they were validated
+    when the page came from the Jina API, so no validation happens on creation or mutation.
+    """
+    url: str
+    title: str
+    description: str
+    content: str
+    jina_tokens: int
+    content_tokens: Optional[int] = None
+    evaluation: Optional[PageEvaluation] = None
+
+    @classmethod
+    def from_page(cls, page: ScrapedWebPage) -> "PageRecord":
+        return cls(
+            url=str(page.url),
+            title=page.title,
+            description=page.description,
+            content=page.content,
+            jina_tokens=page.jina_tokens,
+            content_tokens=page.content_tokens,
+            evaluation=page.evaluation,
+        )
+
+
+@dataclass(slots=True)
+class SearchRecord:
+    query: str
+    success: bool
+    scraped_pages: List[PageRecord] = field(default_factory=list)
+    total_jina_tokens: Optional[int] = None
+    from_cache: bool = False
+
+    @classmethod
+    def from_result(cls, search_result: JinaReaderSearchResult) -> "SearchRecord":
+        return cls(
+            query=search_result.query,
+            success=search_result.success,
+            scraped_pages=[PageRecord.from_page(page) for page in search_result.scraped_pages],
+            total_jina_tokens=search_result.total_jina_tokens,
+            from_cache=search_result.from_cache,
+        )
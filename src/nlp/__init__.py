@@ -1,2 +1,6 @@
-from .pipes import build_openai_chat_pipe, build_azure_openai_chat_pipe, build_azure_openai_struct_pipe, build_gemini_chat_pipe, build_gemini_struct_pipe
-from .tokenizer import count_openai_tokens, count_gemini_tokens
+from .pipes import get_pipe, clear_pipe_registry, set_generator_override, openai_response_format, gemini_response_schema, get_type_adapter, parse_struct_reply, build_openai_chat_pipe, build_azure_openai_chat_pipe, build_azure_openai_struct_pipe, build_gemini_chat_pipe, build_gemini_struct_pipe
+from .tokenizer import count_openai_tokens, count_gemini_tokens, count_openai_tokens_many, count_gemini_tokens_many, GeminiTokenCounter, TokenCountCache, token_count_cache, set_token_count_cache_path, get_gemini_client, set_gemini_client, get_openai_encoder, set_openai_encoder
+from .trimming import trim_to_token_budget, token_offsets
+from .streaming import StreamSink, StdoutSink, FileSink, QueueSink, build_streaming_callback
+from .dedup import canonicalize_url, minhash_signature, NearDuplicateIndex
+from .retrieval import ChunkIndex, analyze_document, chunk_spans, tokenize_terms
@@ -0,0 +1,107 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Ad click IDs and campaign parameters, they never select content (unlike e.g. "ref", which some sites route on)
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "ttclid", "igshid",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+_WORD = re.compile(r"\w+")
+_EMPTY_BIN = (1 << 64) - 1
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalizes scheme and host case, drops "www.", default ports, fragments, tracking parameters and trailing slashes."""
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if ":" in host:
+        # urlsplit strips the brackets of IPv6 literals
+        host = f"[{host}]"
+    if parts.port and (scheme, parts.port) not in {("http", 80), ("https", 443)}:
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+
+    # http and https variants of a page are the same page
+    return urlunsplit(("https" if scheme == "http" else scheme, host, path, urlencode(query), ""))
+
+
+def minhash_signature(text: str, num_perm: int = 64, shingle_size: int = 5) -> Tuple[int, ...]:
+    """
+    One-permutation MinHash over word shingles: every shingle is hashed once and only lowers
+    the minimum of the bin it falls into, so the cost is linear in the text length.
+    """
+    word_ids = [zlib.crc32(word.encode("utf-8")) for word in _WORD.findall(text.lower())]
+    n_shingles = max(1, len(word_ids) - shingle_size + 1)
+
+    signature = [_EMPTY_BIN] * num_perm
+    for i in range(n_shingles):
+        # hashes of int tuples do not depend on PYTHONHASHSEED
+        h = hash(tuple(word_ids[i:i + shingle_size])) & _EMPTY_BIN
+        b = h % num_perm
+        value = h // num_perm
+        if value < signature[b]:
+            signature[b] = value
+
+    return tuple(signature)
+
+
+def signature_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    used = [(x, y) for x, y in zip(a, b) if x != _EMPTY_BIN or y != _EMPTY_BIN]
+    if not used:
+        return 1.0
+    return sum(x == y for x, y in used) / len(used)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over MinHash signatures. Signatures are split into bands, only texts sharing
+    a band are compared, so adding n texts takes roughly linear time.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = defaultdict(list)
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        return minhash_signature(text, self.num_perm, self.shingle_size)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            if any(row != _EMPTY_BIN for row in rows):
+                yield band, rows
+
+    def most_similar(self, signature: Tuple[int, ...]) -> Tuple[Optional[str], float]:
+        """Best match among indexed texts sharing at least one band with the signature."""
+        candidates = {key for band_key in self._band_keys(signature) for key in self._buckets.get(band_key, [])}
+        best_key, best_similarity = None, 0.0
+        for key in candidates:
+            similarity = signature_similarity(signature, self._signatures[key])
+            if similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key, best_similarity
+
+    def insert(self, key: str, signature: Tuple[int, ...]):
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].append(key)
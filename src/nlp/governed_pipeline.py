@@ -0,0 +1,114 @@
+from typing import Any, Dict, Optional
+
+from haystack import Pipeline
+from haystack.dataclasses import ChatMessage, StreamingChunk
+
+from ..core import TokenBucketLimiter, ReplayArchive, get_replay_archive, annotate, profile_call
+
+# Rough chars per token of prompts, only used to reserve rate limit budget before a call
+PROMPT_CHARS_PER_TOKEN = 4
+
+
+class GovernedPipeline(Pipeline):
+    """
+    Pipeline whose runs go through the rate limiter of its LLM provider. Each run reserves the
+    estimated prompt tokens, is charged the usage reported by the generator and is retried after 429s.
+    While a replay archive is active, runs are recorded to it or answered from it.
+    """
+
+    def __init__(self, rate_limiter: TokenBucketLimiter, **kwargs):
+        super().__init__(**kwargs)
+        self.rate_limiter = rate_limiter
+
+    @staticmethod
+    def estimate_tokens(data: Dict[str, Any]) -> int:
+        prompt = data.get("prompt_builder", {})
+        chars = sum(len(msg.text or "") for msg in prompt.get("template", []))
+        chars += sum(len(str(value)) for value in prompt.get("template_variables", {}).values())
+        return chars // PROMPT_CHARS_PER_TOKEN
+
+    @staticmethod
+    def reported_tokens(result: Dict[str, Any]) -> Optional[int]:
+        replies = result.get("llm", {}).get("replies", [])
+        usage = [reply.meta.get("usage") or {} for reply in replies]
+        totals = [u.get("total_tokens") or (u.get("prompt_tokens", 0) + u.get("completion_tokens", 0)) for u in usage]
+        return sum(totals) or None
+
+    @staticmethod
+    def prompt_bytes(data: Dict[str, Any]) -> int:
+        prompt = data.get("prompt_builder", {})
+        size = sum(len((msg.text or "").encode("utf-8")) for msg in prompt.get("template", []))
+        return size + sum(len(str(value).encode("utf-8")) for value in prompt.get("template_variables", {}).values())
+
+    @staticmethod
+    def annotate_usage(result: Dict[str, Any]):
+        for reply in result.get("llm", {}).get("replies", []):
+            usage = reply.meta.get("usage") or {}
+            annotate(
+                bytes_received=len((reply.text or "").encode("utf-8")),
+                prompt_tokens=usage.get("prompt_tokens") or 0,
+                completion_tokens=usage.get("completion_tokens") or 0,
+            )
+
+    def replay_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """What identifies a run in a replay archive: generator, model, prompt and generation arguments."""
+        llm = self.get_component("llm")
+        prompt = data.get("prompt_builder", {})
+        llm_kwargs = data.get("llm", {})
+        return {
+            "generator": type(llm).__name__,
+            "model": getattr(llm, "model", None) or getattr(llm, "_model", None),
+            "template": [msg.to_dict() for msg in prompt.get("template", [])],
+            "template_variables": prompt.get("template_variables", {}),
+            "llm": {key: value for key, value in llm_kwargs.items() if key not in ("streaming_callback", "tools")},
+            "tools": [{"name": tool.name, "parameters": tool.parameters} for tool in llm_kwargs.get("tools") or []],
+        }
+
+    def _run_governed(self, data: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+        streamed = False
+        streaming_callback = data.get("llm", {}).get("streaming_callback")
+        if streaming_callback is not None:
+            def tracking_callback(chunk: StreamingChunk):
+                nonlocal streamed
+                streamed = True
+                streaming_callback(chunk)
+
+            data = {**data, "llm": {**data["llm"], "streaming_callback": tracking_callback}}
+
+        return self.rate_limiter.call(
+            super().run,
+            data,
+            *args,
+            tokens=self.estimate_tokens(data),
+            usage=self.reported_tokens,
+            # a retry would stream the reply again to sinks that already got part of it
+            can_retry=lambda: not streamed,
+            **kwargs,
+        )
+
+    def _run_archived(self, archive: ReplayArchive, data: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+        def fetch() -> Dict[str, Any]:
+            result = self._run_governed(data, *args, **kwargs)
+            return {"replies": [reply.to_dict() for reply in result.get("llm", {}).get("replies", [])]}
+
+        recorded = archive.call(self.rate_limiter.name, "generate", self.replay_request(data), fetch)
+        replies = [ChatMessage.from_dict(reply) for reply in recorded["replies"]]
+        streaming_callback = data.get("llm", {}).get("streaming_callback")
+        if archive.replaying and streaming_callback is not None:
+            # a replayed reply arrives in one piece
+            for reply in replies:
+                if reply.text:
+                    streaming_callback(StreamingChunk(content=reply.text))
+        return {"llm": {"replies": replies}}
+
+    def run(self, data: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+        with profile_call(self.rate_limiter.name, "generate") as call:
+            archive = get_replay_archive()
+            if archive is None:
+                result = self._run_governed(data, *args, **kwargs)
+            else:
+                result = self._run_archived(archive, data, *args, **kwargs)
+            if call is not None:
+                annotate(bytes_sent=self.prompt_bytes(data))
+                self.annotate_usage(result)
+            return result
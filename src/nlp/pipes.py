@@ -1,31 +1,118 @@
-from typing import Dict, Tuple, Callable, List, Any
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Tuple, Callable, List, Any, Optional, Type, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
-from haystack import Pipeline
-from haystack.dataclasses import ChatMessage
-from haystack.utils import Secret
-from haystack.components.builders import ChatPromptBuilder
-from haystack.components.generators.chat import OpenAIChatGenerator, AzureOpenAIChatGenerator
-from haystack_integrations.components.generators.google_genai import GoogleGenAIChatGenerator
+from ..core import get_openai_config, get_azure_config, get_gemini_config, get_rate_limiter
 
-from ..core import openai_config, azure_config, gemini_config
+# Haystack and the provider SDKs take seconds to import, builders import them on first use
+if TYPE_CHECKING:
+    from haystack import Pipeline
+    from haystack.dataclasses import ChatMessage
 
+PipeBundle = Tuple["Pipeline", Callable, Callable]
 
-def build_openai_chat_pipe(model: str) -> Tuple[Pipeline, Callable, Callable]:
-    prompt_builder = ChatPromptBuilder()
-    llm = OpenAIChatGenerator(
-        api_key=Secret.from_token(openai_config.API_KEY),
-        model=model,
-    )
+# Warm pipelines shared across FSM steps and runs, keyed by (builder, model)
+_pipe_registry: Dict[Tuple[str, str], PipeBundle] = {}
+_pipe_registry_lock = threading.Lock()
+
+
+def get_pipe(builder: Callable[[str], PipeBundle], model: str) -> PipeBundle:
+    """
+    Returns the pipeline built by builder for model, building and warming it up only on first use.
+    Generators keep their HTTP clients, so later calls reuse pooled connections. The pipelines hold no
+    per-run state (templates and generation kwargs are passed to run), so they can be run from several threads.
+    """
+    key = (builder.__name__, model)
+    with _pipe_registry_lock:
+        if key not in _pipe_registry:
+            pipe, input_builder, output_parser = builder(model)
+            pipe.warm_up()
+            _pipe_registry[key] = (pipe, input_builder, output_parser)
+        return _pipe_registry[key]
+
+
+def clear_pipe_registry():
+    with _pipe_registry_lock:
+        _pipe_registry.clear()
+
+
+# Builds the chat generator of every pipe from (provider, model) instead of the provider SDK, see set_generator_override
+_generator_override: Optional[Callable[[str, str], Any]] = None
+
+
+def set_generator_override(factory: Optional[Callable[[str, str], Any]]):
+    """
+    Makes pipes built from now on use factory(provider, model) as their chat generator, e.g. local
+    stand-ins for benchmarks. Providers are "openai", "azure_openai" and "gemini". None restores the real generators.
+    """
+    global _generator_override
+    _generator_override = factory
+    clear_pipe_registry()
+
+
+StructModel = TypeVar("StructModel", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def openai_response_format(struct_model: Type[BaseModel], strict: bool = True) -> Dict[str, Any]:
+    """JSON schema response format for a Pydantic model, generated once per model. Must not be mutated."""
+    pydantic_schema = struct_model.model_json_schema()
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": pydantic_schema["title"],
+            "description": pydantic_schema.get("description", ""),
+            "schema": {
+                "type": "object",
+                "properties": pydantic_schema["properties"],
+                "required": pydantic_schema.get("required", []),
+                **({"additionalProperties": False} if strict else {}),
+            },
+            "strict": strict
+        }
+    }
+
+
+@lru_cache(maxsize=None)
+def gemini_response_schema(struct_model: Type[BaseModel]) -> Dict[str, Any]:
+    """JSON schema of a Pydantic model for Gemini, generated once per model. Must not be mutated."""
+    return struct_model.model_json_schema()
 
-    pipe = Pipeline()
+
+@lru_cache(maxsize=None)
+def get_type_adapter(struct_model: Type[StructModel]) -> TypeAdapter[StructModel]:
+    return TypeAdapter(struct_model)
+
+
+def parse_struct_reply(struct_model: Type[StructModel], text: str) -> StructModel:
+    """Validates a structured JSON reply with the model's cached validator."""
+    return get_type_adapter(struct_model).validate_json(text)
+
+
+def build_openai_chat_pipe(model: str) -> PipeBundle:
+    from haystack.utils import Secret
+    from haystack.components.builders import ChatPromptBuilder
+    from haystack.components.generators.chat import OpenAIChatGenerator
+    from .governed_pipeline import GovernedPipeline
+
+    prompt_builder = ChatPromptBuilder()
+    if _generator_override is not None:
+        llm = _generator_override("openai", model)
+    else:
+        llm = OpenAIChatGenerator(
+            api_key=Secret.from_token(get_openai_config().API_KEY),
+            model=model,
+        )
+
+    pipe = GovernedPipeline(get_rate_limiter("openai"))
     pipe.add_component("prompt_builder", prompt_builder)
     pipe.add_component("llm", llm)
     pipe.connect("prompt_builder.prompt", "llm.messages")
 
     def input(
-        msgs: List[ChatMessage],
+        msgs: List["ChatMessage"],
         generator_run_kwargs: Dict[str, Any],
         template_variables: Dict[str, Any] | None = None,
     ) -> Dict:
@@ -37,28 +124,37 @@ def build_openai_chat_pipe(model: str) -> Tuple[Pipeline, Callable, Callable]:
             "llm": {**generator_run_kwargs},
         }
 
-    def output(response: Dict[str, Any]) -> List[ChatMessage]:
+    def output(response: Dict[str, Any]) -> List["ChatMessage"]:
         return response["llm"]["replies"]
 
     return pipe, input, output
 
 
 
-def build_azure_openai_chat_pipe(azure_deployment: str) -> Tuple[Pipeline, Callable, Callable]:
-    prompt_builder = ChatPromptBuilder()
-    llm = AzureOpenAIChatGenerator(
-        api_key=Secret.from_token(azure_config.OPENAI_API_KEY),
-        azure_endpoint=azure_config.OPENAI_ENDPOINT,
-        azure_deployment=azure_deployment,
-    )
+def build_azure_openai_chat_pipe(azure_deployment: str) -> PipeBundle:
+    from haystack.utils import Secret
+    from haystack.components.builders import ChatPromptBuilder
+    from haystack.components.generators.chat import AzureOpenAIChatGenerator
+    from .governed_pipeline import GovernedPipeline
 
-    pipe = Pipeline()
+    prompt_builder = ChatPromptBuilder()
+    if _generator_override is not None:
+        llm = _generator_override("azure_openai", azure_deployment)
+    else:
+        azure_config = get_azure_config()
+        llm = AzureOpenAIChatGenerator(
+            api_key=Secret.from_token(azure_config.OPENAI_API_KEY),
+            azure_endpoint=azure_config.OPENAI_ENDPOINT,
+            azure_deployment=azure_deployment,
+        )
+
+    pipe = GovernedPipeline(get_rate_limiter("azure_openai"))
     pipe.add_component("prompt_builder", prompt_builder)
     pipe.add_component("llm", llm)
     pipe.connect("prompt_builder.prompt", "llm.messages")
 
     def input(
-        msgs: List[ChatMessage],
+        msgs: List["ChatMessage"],
         generator_run_kwargs: Dict[str, Any],
         template_variables: Dict[str, Any] | None = None,
     ) -> Dict:
@@ -70,48 +166,41 @@ def build_azure_openai_chat_pipe(azure_deployment: str) -> Tuple[Pipeline, Calla
             "llm": {**generator_run_kwargs},
         }
 
-    def output(response: Dict[str, Any]) -> List[ChatMessage]:
+    def output(response: Dict[str, Any]) -> List["ChatMessage"]:
         return response["llm"]["replies"]
 
     return pipe, input, output
 
 
-def build_azure_openai_struct_pipe(azure_deployment: str) -> Tuple[Pipeline, Callable, Callable]:
-    prompt_builder = ChatPromptBuilder()
-    llm = AzureOpenAIChatGenerator(
-        api_key=Secret.from_token(azure_config.OPENAI_API_KEY),
-        azure_endpoint=azure_config.OPENAI_ENDPOINT,
-        azure_deployment=azure_deployment,
-    )
+def build_azure_openai_struct_pipe(azure_deployment: str) -> PipeBundle:
+    from haystack.utils import Secret
+    from haystack.components.builders import ChatPromptBuilder
+    from haystack.components.generators.chat import AzureOpenAIChatGenerator
+    from .governed_pipeline import GovernedPipeline
 
-    pipe = Pipeline()
+    prompt_builder = ChatPromptBuilder()
+    if _generator_override is not None:
+        llm = _generator_override("azure_openai", azure_deployment)
+    else:
+        azure_config = get_azure_config()
+        llm = AzureOpenAIChatGenerator(
+            api_key=Secret.from_token(azure_config.OPENAI_API_KEY),
+            azure_endpoint=azure_config.OPENAI_ENDPOINT,
+            azure_deployment=azure_deployment,
+        )
+
+    pipe = GovernedPipeline(get_rate_limiter("azure_openai"))
     pipe.add_component("prompt_builder", prompt_builder)
     pipe.add_component("llm", llm)
     pipe.connect("prompt_builder.prompt", "llm.messages")
 
     def input(
-        msgs: List[ChatMessage],
-        struct_model: BaseModel,
+        msgs: List["ChatMessage"],
+        struct_model: Type[BaseModel],
         generator_run_kwargs: Dict[str, Any] = {},
         template_variables: Dict[str, Any] | None = None,
         strict: bool = True,
     ) -> Dict:
-        pydantic_schema = struct_model.model_json_schema()
-        json_schema = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": pydantic_schema["title"],
-                "description": pydantic_schema.get("description", ""),
-                "schema": {
-                    "type": "object",
-                    "properties": pydantic_schema["properties"],
-                    "required": pydantic_schema.get("required", []),
-                    **({"additionalProperties": False} if strict else {}),
-                },
-                "strict": strict
-            }
-        }
-
         return {
             "prompt_builder": {
                 "template": msgs,
@@ -121,31 +210,39 @@ def build_azure_openai_struct_pipe(azure_deployment: str) -> Tuple[Pipeline, Cal
                 **generator_run_kwargs,
                 "generation_kwargs": {
                     **generator_run_kwargs.get("generation_kwargs", {}),
-                    "response_format": json_schema
+                    "response_format": openai_response_format(struct_model, strict)
                 }
             },
         }
 
-    def output(response: Dict[str, Any]) -> List[ChatMessage]:
+    def output(response: Dict[str, Any]) -> List["ChatMessage"]:
         return response["llm"]["replies"]
 
     return pipe, input, output
 
 
-def build_gemini_chat_pipe(model: str) -> Tuple[Pipeline, Callable, Callable]:
-    prompt_builder = ChatPromptBuilder()
-    llm = GoogleGenAIChatGenerator(
-        api_key=Secret.from_token(gemini_config.API_KEY),
-        model=model,
-    )
+def build_gemini_chat_pipe(model: str) -> PipeBundle:
+    from haystack.utils import Secret
+    from haystack.components.builders import ChatPromptBuilder
+    from haystack_integrations.components.generators.google_genai import GoogleGenAIChatGenerator
+    from .governed_pipeline import GovernedPipeline
 
-    pipe = Pipeline()
+    prompt_builder = ChatPromptBuilder()
+    if _generator_override is not None:
+        llm = _generator_override("gemini", model)
+    else:
+        llm = GoogleGenAIChatGenerator(
+            api_key=Secret.from_token(get_gemini_config().API_KEY),
+            model=model,
+        )
+
+    pipe = GovernedPipeline(get_rate_limiter("gemini"))
     pipe.add_component("prompt_builder", prompt_builder)
     pipe.add_component("llm", llm)
     pipe.connect("prompt_builder.prompt", "llm.messages")
 
     def input(
-        msgs: List[ChatMessage],
+        msgs: List["ChatMessage"],
         generator_run_kwargs: Dict[str, Any] = {},
         template_variables: Dict[str, Any] | None = None,
     ) -> Dict:
@@ -157,27 +254,35 @@ def build_gemini_chat_pipe(model: str) -> Tuple[Pipeline, Callable, Callable]:
             "llm": {**generator_run_kwargs},
         }
 
-    def output(response: Dict[str, Any]) -> List[ChatMessage]:
+    def output(response: Dict[str, Any]) -> List["ChatMessage"]:
         return response["llm"]["replies"]
 
     return pipe, input, output
 
 
-def build_gemini_struct_pipe(model: str) -> Tuple[Pipeline, Callable, Callable]:
-    prompt_builder = ChatPromptBuilder()
-    llm = GoogleGenAIChatGenerator(
-        api_key=Secret.from_token(gemini_config.API_KEY),
-        model=model,
-    )
+def build_gemini_struct_pipe(model: str) -> PipeBundle:
+    from haystack.utils import Secret
+    from haystack.components.builders import ChatPromptBuilder
+    from haystack_integrations.components.generators.google_genai import GoogleGenAIChatGenerator
+    from .governed_pipeline import GovernedPipeline
 
-    pipe = Pipeline()
+    prompt_builder = ChatPromptBuilder()
+    if _generator_override is not None:
+        llm = _generator_override("gemini", model)
+    else:
+        llm = GoogleGenAIChatGenerator(
+            api_key=Secret.from_token(get_gemini_config().API_KEY),
+            model=model,
+        )
+
+    pipe = GovernedPipeline(get_rate_limiter("gemini"))
     pipe.add_component("prompt_builder", prompt_builder)
     pipe.add_component("llm", llm)
     pipe.connect("prompt_builder.prompt", "llm.messages")
 
     def input(
-        msgs: List[ChatMessage],
-        struct_model: BaseModel,
+        msgs: List["ChatMessage"],
+        struct_model: Type[BaseModel],
         generator_run_kwargs: Dict[str, Any] = {},
         template_variables: Dict[str, Any] | None = None,
     ) -> Dict:
@@ -191,12 +296,12 @@ def build_gemini_struct_pipe(model: str) -> Tuple[Pipeline, Callable, Callable]:
                 "generation_kwargs": {
                     **generator_run_kwargs.get("generation_kwargs", {}),
                     "response_mime_type": "application/json",
-                    "response_json_schema": struct_model.model_json_schema(),
+                    "response_json_schema": gemini_response_schema(struct_model),
                 }
             },
         }
 
-    def output(response: Dict[str, Any]) -> List[ChatMessage]:
+    def output(response: Dict[str, Any]) -> List["ChatMessage"]:
         return response["llm"]["replies"]
 
     return pipe, input, output
@@ -0,0 +1,150 @@
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Tuple
+
+_WORD = re.compile(r"\w+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how in is it its of on or that the this to was were what when
+where which who why will with about into than then there these they their them those can could should would
+not no do does did so if such also more most other some any all our your you we i he she his her
+""".split())
+
+
+@dataclass(frozen=True)
+class Chunk:
+    start: int
+    end: int
+    terms: Dict[str, int]
+    length: int
+
+
+def tokenize_terms(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def _split_long(start: int, paragraph: str, max_chars: int) -> List[Tuple[int, int]]:
+    # sentence-sized pieces of a paragraph that exceeds the chunk size on its own
+    spans = []
+    piece_start = 0
+    for match in _SENTENCE_END.finditer(paragraph):
+        if match.start() - piece_start > max_chars:
+            spans.append((start + piece_start, start + match.start()))
+            piece_start = match.end()
+    spans.append((start + piece_start, start + len(paragraph)))
+
+    # hard split of anything still too long, e.g. tables without punctuation
+    return [
+        (s, min(s + max_chars, e))
+        for span_start, e in spans
+        for s in range(span_start, e, max_chars)
+    ]
+
+
+def chunk_spans(text: str, chunk_chars: int) -> List[Tuple[int, int]]:
+    """Char spans of paragraph-aligned chunks, consecutive short paragraphs are merged up to chunk_chars."""
+    paragraphs = []
+    pos = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        paragraphs.append((pos, match.start()))
+        pos = match.end()
+    paragraphs.append((pos, len(text)))
+
+    spans = []
+    chunk_start, chunk_end = None, None
+    for start, end in paragraphs:
+        if end - start > chunk_chars:
+            if chunk_start is not None:
+                spans.append((chunk_start, chunk_end))
+                chunk_start = None
+            spans.extend(_split_long(start, text[start:end], chunk_chars))
+        elif chunk_start is None:
+            chunk_start, chunk_end = start, end
+        elif end - chunk_start > chunk_chars:
+            spans.append((chunk_start, chunk_end))
+            chunk_start, chunk_end = start, end
+        else:
+            chunk_end = end
+    if chunk_start is not None:
+        spans.append((chunk_start, chunk_end))
+
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+def analyze_document(text: str, chunk_chars: int = 1600) -> Tuple[Chunk, ...]:
+    """Chunks and term statistics of a text."""
+    chunks = []
+    for start, end in chunk_spans(text, chunk_chars):
+        terms = tokenize_terms(text[start:end])
+        chunks.append(Chunk(start=start, end=end, terms=Counter(terms), length=len(terms)))
+    return tuple(chunks)
+
+
+class ChunkIndex:
+    """
+    Incremental BM25 index over paragraph chunks of many documents.
+    Adding a document only analyzes that document, IDF is derived at query time.
+    """
+
+    def __init__(self, chunk_chars: int = 1600, k1: float = 1.5, b: float = 0.75):
+        self.chunk_chars = chunk_chars
+        self.k1 = k1
+        self.b = b
+        self._chunks: List[Tuple[Hashable, Chunk]] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._documents: Dict[Hashable, int] = {}
+        self._total_length = 0
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._documents
+
+    def add_document(self, doc_id: Hashable, text: str):
+        if doc_id in self._documents:
+            return
+        chunks = analyze_document(text, self.chunk_chars)
+        self._documents[doc_id] = len(chunks)
+        for chunk in chunks:
+            chunk_idx = len(self._chunks)
+            self._chunks.append((doc_id, chunk))
+            self._total_length += chunk.length
+            for term, frequency in chunk.terms.items():
+                self._postings[term].append((chunk_idx, frequency))
+
+    def score(self, query: str) -> Dict[int, float]:
+        n_chunks = len(self._chunks)
+        if not n_chunks:
+            return {}
+        avg_length = self._total_length / n_chunks or 1
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize_terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_idx, frequency in postings:
+                length = self._chunks[chunk_idx][1].length
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[chunk_idx] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, queries: List[str]) -> List[Tuple[Hashable, Chunk, float]]:
+        """
+        All chunks matching any query, best first. Scores are normalized per query to its best chunk
+        and a chunk keeps its highest score, so every sub-query contributes its own top chunks.
+        """
+        combined: Dict[int, float] = {}
+        for query in queries:
+            scores = self.score(query)
+            if not scores:
+                continue
+            top = max(scores.values())
+            for chunk_idx, value in scores.items():
+                combined[chunk_idx] = max(combined.get(chunk_idx, 0.0), value / top)
+
+        ranked = sorted(combined.items(), key=lambda item: item[1], reverse=True)
+        return [(self._chunks[chunk_idx][0], self._chunks[chunk_idx][1], value) for chunk_idx, value in ranked]
@@ -0,0 +1,71 @@
+import queue
+import sys
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from haystack.dataclasses import StreamingChunk, StreamingCallbackT
+
+
+class StreamSink(ABC):
+    """Destination for streamed LLM text."""
+
+    @abstractmethod
+    def write(self, text: str):
+        ...
+
+    def close(self):
+        pass
+
+
+class StdoutSink(StreamSink):
+    def write(self, text: str):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class FileSink(StreamSink):
+    """Appends streamed text to a file, flushing every chunk so that readers see it immediately."""
+
+    def __init__(self, path: str | Path, mode: str = "a"):
+        self.path = Path(path)
+        self.mode = mode
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, text: str):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, self.mode, encoding="utf-8")
+            self._file.write(text)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class QueueSink(StreamSink):
+    """Puts streamed text on a queue, followed by None once the stream is closed."""
+
+    def __init__(self, text_queue: Optional[queue.Queue] = None):
+        self.queue = text_queue if text_queue is not None else queue.Queue()
+
+    def write(self, text: str):
+        self.queue.put(text)
+
+    def close(self):
+        self.queue.put(None)
+
+
+def build_streaming_callback(*sinks: StreamSink) -> "StreamingCallbackT":
+    def callback(chunk: "StreamingChunk"):
+        if chunk.content:
+            for sink in sinks:
+                sink.write(chunk.content)
+
+    return callback
@@ -1,22 +1,295 @@
-import tiktoken
-from google import genai
+import hashlib
+import math
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple
 
-from ..core import gemini_config
+from ..core import get_gemini_config, get_rate_limiter, get_replay_archive, annotate, in_current_context, profiled
 
-# OpenAI tokenizer (o200k_base for GPT-4o/GPT-5)
-_openai_encoder = tiktoken.get_encoding("o200k_base")
+if TYPE_CHECKING:
+    import tiktoken
+    from google import genai
 
-# Gemini client for token counting
-_gemini_client = genai.Client(api_key=gemini_config.API_KEY)
+
+@lru_cache(maxsize=None)
+def _load_openai_encoder() -> "tiktoken.Encoding":
+    import tiktoken
+    return tiktoken.get_encoding("o200k_base")
+
+
+# Stand-in for the OpenAI tokenizer, see set_openai_encoder
+_openai_encoder_override: Optional["tiktoken.Encoding"] = None
+
+
+def get_openai_encoder() -> "tiktoken.Encoding":
+    """OpenAI tokenizer (o200k_base for GPT-4o/GPT-5), loaded on first use."""
+    if _openai_encoder_override is not None:
+        return _openai_encoder_override
+    return _load_openai_encoder()
+
+
+def set_openai_encoder(encoder: Optional["tiktoken.Encoding"]):
+    """Replaces the OpenAI tokenizer, e.g. with a local stand-in that needs no download. None goes back to o200k_base."""
+    global _openai_encoder_override
+    _openai_encoder_override = encoder
+
+
+@lru_cache(maxsize=None)
+def _build_gemini_client() -> "genai.Client":
+    from google import genai
+    return genai.Client(api_key=get_gemini_config().API_KEY)
+
+
+# Stand-in for the token counting client, see set_gemini_client
+_gemini_client_override: Optional["genai.Client"] = None
+
+
+def get_gemini_client() -> "genai.Client":
+    """Gemini client for token counting, created on first use so that importing needs no Gemini key."""
+    if _gemini_client_override is not None:
+        return _gemini_client_override
+    return _build_gemini_client()
+
+
+def set_gemini_client(client: Optional["genai.Client"]):
+    """Replaces the token counting client, e.g. with a local stand-in for benchmarks. None goes back to the real one."""
+    global _gemini_client_override
+    _gemini_client_override = client
+
+
+class TokenCountCache:
+    """
+    Token counts keyed by (model, content digest), held in memory with an optional SQLite tier
+    that keeps counts across runs.
+    """
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self._memory: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # every thread's connection, so that all of them can be closed when the path changes
+        self._connections: List[sqlite3.Connection] = []
+        self.path = None
+        if path is not None:
+            self.set_path(path)
+
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+    def set_path(self, path: Optional[str | Path]):
+        self.close()
+        self.path = Path(path) if path is not None else None
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS token_counts (
+                model TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                PRIMARY KEY (model, digest)
+            )"""
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # used by its own thread only, close() may run on another one
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, model: str, digest: str) -> Optional[int]:
+        with self._lock:
+            tokens = self._memory.get((model, digest))
+        if tokens is not None or self.path is None:
+            return tokens
+
+        row = self._connection().execute(
+            "SELECT tokens FROM token_counts WHERE model = ? AND digest = ?", (model, digest)
+        ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self._memory[(model, digest)] = row[0]
+        return row[0]
+
+    def set(self, model: str, digest: str, tokens: int):
+        with self._lock:
+            self._memory[(model, digest)] = tokens
+        if self.path is not None:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO token_counts (model, digest, tokens) VALUES (?, ?, ?)",
+                (model, digest, tokens),
+            )
+
+
+# Process-wide memo of every count computed or requested so far
+token_count_cache = TokenCountCache()
+
+
+def set_token_count_cache_path(path: Optional[str | Path]):
+    """Enables (or with None disables) the persistent tier of the token count cache."""
+    token_count_cache.set_path(path)
 
 
 def count_openai_tokens(text: str) -> int:
-    return len(_openai_encoder.encode(text))
+    encoder = get_openai_encoder()
+    digest = token_count_cache.digest(text)
+    tokens = token_count_cache.get(encoder.name, digest)
+    if tokens is None:
+        tokens = len(encoder.encode(text))
+        token_count_cache.set(encoder.name, digest, tokens)
+    return tokens
 
 
-def count_gemini_tokens(text: str, model: str) -> int:
-    result = _gemini_client.models.count_tokens(
+@profiled("gemini", "count_tokens")
+def _request_gemini_token_count(text: str, model: str) -> int:
+    # counting is free of generation tokens, only the request rate is limited,
+    # the budget is shared by every thread and set in core/ratelimit.yaml
+    result = get_rate_limiter("gemini_count_tokens").call(
+        get_gemini_client().models.count_tokens,
         model=model,
         contents=text,
+        tokens=0,
     )
+    annotate(bytes_sent=len(text.encode("utf-8")))
     return result.total_tokens
+
+
+def _cached_gemini_token_count(text: str, model: str, digest: str) -> int:
+    tokens = token_count_cache.get(model, digest)
+    if tokens is None:
+        tokens = _request_gemini_token_count(text, model)
+        token_count_cache.set(model, digest, tokens)
+    return tokens
+
+
+def count_gemini_tokens(text: str, model: str) -> int:
+    digest = token_count_cache.digest(text)
+    archive = get_replay_archive()
+    if archive is None:
+        return _cached_gemini_token_count(text, model, digest)
+    # recorded also when served from the cache, so that a replay never depends on the cache contents
+    request = {"model": model, "contents_digest": digest}
+    return archive.call("gemini", "count_tokens", request, lambda: _cached_gemini_token_count(text, model, digest))
+
+
+def count_openai_tokens_many(texts: List[str], num_threads: int = 8) -> List[int]:
+    encoder = get_openai_encoder()
+    digests = [token_count_cache.digest(text) for text in texts]
+    counts = [token_count_cache.get(encoder.name, digest) for digest in digests]
+
+    # encode every distinct uncached text once, tiktoken spreads the batch across threads
+    missing = {digest: text for digest, text, tokens in zip(digests, texts, counts) if tokens is None}
+    if missing:
+        encoded = encoder.encode_batch(list(missing.values()), num_threads=num_threads)
+        for digest, tokens in zip(missing, encoded):
+            token_count_cache.set(encoder.name, digest, len(tokens))
+
+    return [token_count_cache.get(encoder.name, digest) for digest in digests]
+
+
+def count_gemini_tokens_many(texts: List[str], model: str, max_workers: int = 8) -> List[int]:
+    # identical texts are requested once, cached ones not at all
+    unique_texts = list(dict.fromkeys(texts))
+    if len(unique_texts) <= 1:
+        counts = {text: count_gemini_tokens(text, model) for text in unique_texts}
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_texts))) as executor:
+            counts = dict(zip(unique_texts, executor.map(in_current_context(lambda text: count_gemini_tokens(text, model)), unique_texts)))
+
+    return [counts[text] for text in texts]
+
+
+class GeminiTokenCounter:
+    """
+    Counts Gemini tokens either exactly via the API or offline with a chars-per-token ratio.
+    In "estimate" mode the ratio is fitted on the first few texts, which are counted exactly,
+    and refined by every later exact count.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        mode: Literal["exact", "estimate"] = "exact",
+        margin: float = 0.1,
+        calibration_samples: int = 5,
+        default_chars_per_token: float = 4.0,
+        max_workers: int = 8,
+    ):
+        self.model = model
+        self.mode = mode
+        self.margin = margin
+        self.calibration_samples = calibration_samples
+        self.default_chars_per_token = default_chars_per_token
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._samples = 0
+        self._sampled_chars = 0
+        self._sampled_tokens = 0
+
+    @property
+    def chars_per_token(self) -> float:
+        with self._lock:
+            if not self._sampled_tokens:
+                return self.default_chars_per_token
+            return self._sampled_chars / self._sampled_tokens
+
+    def __call__(self, text: str) -> int:
+        if self.mode == "exact" or self._samples < self.calibration_samples:
+            return self.exact(text)
+        return self.estimate(text)
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        if self.mode == "exact":
+            return self.exact_many(texts)
+
+        # the still missing calibration samples are counted exactly, the rest estimated
+        n_exact = max(0, self.calibration_samples - self._samples)
+        return self.exact_many(texts[:n_exact]) + [self.estimate(text) for text in texts[n_exact:]]
+
+    def exact(self, text: str) -> int:
+        tokens = count_gemini_tokens(text, self.model)
+        self._calibrate(text, tokens)
+        return tokens
+
+    def exact_many(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        counts = count_gemini_tokens_many(texts, self.model, self.max_workers)
+        for text, tokens in zip(texts, counts):
+            self._calibrate(text, tokens)
+        return counts
+
+    def _calibrate(self, text: str, tokens: int):
+        if text and tokens:
+            with self._lock:
+                self._samples += 1
+                self._sampled_chars += len(text)
+                self._sampled_tokens += tokens
+
+    def estimate(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def is_near(self, tokens: int, limit: int) -> bool:
+        """Tells whether an estimated count is too close to a budget boundary to be trusted."""
+        if self.mode == "exact":
+            return False
+        return abs(tokens - limit) <= self.margin * limit
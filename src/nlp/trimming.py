@@ -0,0 +1,96 @@
+import bisect
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .tokenizer import get_openai_encoder, token_count_cache
+
+# Sentence ends followed by whitespace, used when no paragraph break is close to the cut
+_SENTENCE_END = re.compile(r"[.!?。！？][\"')\]]*\s")
+_WHITESPACE = re.compile(r"\s")
+
+# Token offsets of recently trimmed texts by content digest, the texts themselves are not kept
+TOKEN_OFFSETS_CACHE_SIZE = 32
+_token_offsets_cache: "OrderedDict[str, List[int]]" = OrderedDict()
+_token_offsets_lock = threading.Lock()
+
+
+def token_offsets(text: str) -> List[int]:
+    """Char offset of every o200k token start in text."""
+    digest = token_count_cache.digest(text)
+    with _token_offsets_lock:
+        if digest in _token_offsets_cache:
+            _token_offsets_cache.move_to_end(digest)
+            return _token_offsets_cache[digest]
+
+    encoder = get_openai_encoder()
+    tokens = encoder.encode(text, disallowed_special=())
+    _, offsets = encoder.decode_with_offsets(tokens)
+
+    with _token_offsets_lock:
+        _token_offsets_cache[digest] = offsets
+        while len(_token_offsets_cache) > TOKEN_OFFSETS_CACHE_SIZE:
+            _token_offsets_cache.popitem(last=False)
+    return offsets
+
+
+def _snap_to_boundary(text: str, cut: int, boundary_window: float, max_boundary_chars: int) -> int:
+    lo = cut - min(int(cut * boundary_window), max_boundary_chars)
+    window = text[lo:cut]
+
+    paragraph_end = window.rfind("\n\n")
+    if paragraph_end != -1:
+        return lo + paragraph_end
+
+    sentence_ends = list(_SENTENCE_END.finditer(window))
+    if sentence_ends:
+        return lo + sentence_ends[-1].end()
+
+    line_end = window.rfind("\n")
+    if line_end != -1:
+        return lo + line_end
+
+    if cut >= len(text) or text[cut].isspace():
+        return cut
+    # never end inside a word, texts without whitespace in the window are cut as is
+    spaces = [match.start() for match in _WHITESPACE.finditer(window)]
+    return lo + spaces[-1] if spaces else cut
+
+
+def trim_to_token_budget(
+    text: str,
+    max_tokens: int,
+    total_tokens: Optional[int] = None,
+    boundary_window: float = 0.1,
+    max_boundary_chars: int = 200,
+) -> Tuple[str, int]:
+    """
+    Cuts text to at most max_tokens in a single pass over its o200k token offsets, preferring to end on a paragraph
+    or sentence boundary within the last boundary_window of the kept text, but no more than max_boundary_chars back.
+
+    If total_tokens (the text's count in another tokenizer, e.g. Gemini) is given,
+    offsets are scaled to that tokenizer, so no recount is needed after the cut.
+    Returns the trimmed text and its token count.
+    """
+    if max_tokens <= 0:
+        return "", 0
+
+    offsets = token_offsets(text)
+    if not offsets:
+        return text, total_tokens or 0
+
+    scale = total_tokens / len(offsets) if total_tokens else 1.0
+    if math.ceil(len(offsets) * scale) <= max_tokens:
+        return text, total_tokens if total_tokens is not None else len(offsets)
+
+    keep = int(max_tokens / scale)
+    while True:
+        cut = _snap_to_boundary(text, offsets[keep], boundary_window, max_boundary_chars)
+        trimmed = text[:cut].rstrip()
+        trimmed_tokens = math.ceil(bisect.bisect_left(offsets, len(trimmed)) * scale)
+        if trimmed_tokens <= max_tokens or keep == 0:
+            return trimmed, trimmed_tokens
+        # the scaled count can round past the budget, cut again by the overshoot
+        keep = max(0, keep - math.ceil((trimmed_tokens - max_tokens) / scale))
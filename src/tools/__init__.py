@@ -1,2 +1,3 @@
-from .jina import jina_search, search_web_formatted_str_out, search_web_structured_out, jina_result_to_formatted_pages
+from .jina import jina_search, jina_search_many, jina_search_background, async_jina_search, async_jina_search_many, search_web_formatted_str_out, search_web_structured_out, async_search_web_structured_out, jina_result_to_formatted_pages
 from .utils import init_tool_invoker
+from .cache import SearchCache
@@ -0,0 +1,121 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from ..models import JinaReaderSearchResult
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """
+    Single-file SQLite store for Jina search results with TTL and LRU eviction.
+    Safe to share between threads and between concurrently running processes.
+
+    Expired entries are never served. They are deleted, together with the least recently used entries
+    beyond max_entries, once every evict_every writes, so the table may exceed max_entries by that much.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        evict_every: int = 100,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jina_search (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jina_search_accessed_at ON jina_search (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jina_search_created_at ON jina_search (created_at)")
+        # entries left over from earlier runs are dropped once on open
+        self.evict()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.casefold().split())
+
+    @classmethod
+    def make_key(cls, query: str, num_pages: int) -> str:
+        return f"{cls.normalize_query(query)}|{num_pages}"
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads, so every thread gets its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, query: str, num_pages: int) -> Optional[JinaReaderSearchResult]:
+        key = self.make_key(query, num_pages)
+        conn = self._connection()
+        row = conn.execute("SELECT payload, created_at FROM jina_search WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        payload, created_at = row
+        now = time.time()
+        if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+            conn.execute("DELETE FROM jina_search WHERE key = ?", (key,))
+            return None
+
+        conn.execute("UPDATE jina_search SET accessed_at = ? WHERE key = ?", (now, key))
+        search_result = JinaReaderSearchResult.model_validate_json(payload)
+        search_result.query = query
+        search_result.from_cache = True
+        return search_result
+
+    def set(self, search_result: JinaReaderSearchResult, num_pages: int):
+        if not search_result.success:
+            return
+
+        key = self.make_key(search_result.query, num_pages)
+        payload = search_result.model_dump_json(exclude={"from_cache"})
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO jina_search (key, payload, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, payload, now, now),
+        )
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        conn = self._connection()
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM jina_search WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries is not None:
+            # drop least recently used entries beyond the size limit
+            conn.execute(
+                """DELETE FROM jina_search WHERE key IN (
+                    SELECT key FROM jina_search ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM jina_search")
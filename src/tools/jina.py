@@ -1,63 +1,331 @@
+import asyncio
+import concurrent.futures
 import logging
+import sqlite3
+import threading
+import weakref
+import httpx
 import requests
-from urllib.parse import urlencode
-from typing import List, Dict, Annotated
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Annotated, Any, Optional, Tuple
 
 import pydantic
 
-from rich.logging import RichHandler
-
-from ..core import jina_config
+from ..core import get_jina_config, get_rate_limiter, parse_retry_after, TokenBucketLimiter, annotate, profiled, get_replay_archive
 from ..models import JinaReaderSearchResult, ScrapedWebPage
+from .cache import SearchCache
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 
-def jina_search(query: str, max_results: int = jina_config.NUM_PAGES_PER_SEARCH) -> JinaReaderSearchResult:
-    base_url = "https://s.jina.ai/"
-    
-    # Build query parameters
-    params = {
-        "q": query,
-        "num": max_results
-    }
-    search_url = f"{base_url}?{urlencode(params)}"
-    
-    headers = {
+
+def build_jina_session() -> requests.Session:
+    jina_config = get_jina_config()
+    # 429s are not retried by the adapter, they go through the shared rate limiter so that every caller backs off
+    retry = Retry(
+        total=jina_config.MAX_RETRIES,
+        backoff_factor=jina_config.RETRY_BACKOFF_FACTOR,
+        status_forcelist=[code for code in RETRY_STATUS_CODES if code != 429],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=jina_config.POOL_SIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
         "Accept": "application/json",
         "Authorization": f"Bearer {jina_config.envs.API_KEY}",
         "X-Retain-Images": "none",
         # to add "links" section with aggregated links per page
         # "X-With-Links-Summary": "true",
+    })
+    return session
+
+
+# Keep-alive session shared by all searches to reuse DNS, TCP and TLS setup, created on first search
+_jina_session: requests.Session | None = None
+
+# Repeated queries are served from disk and cost no Jina tokens, opened on first search
+_search_cache: SearchCache | None = None
+_search_cache_ready = False
+
+_lazy_init_lock = threading.Lock()
+
+# One async client and concurrency cap per event loop, since neither can be shared across loops
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+# Long-lived loop serving synchronous callers, so their async connection pool survives between calls
+_background_loop: asyncio.AbstractEventLoop | None = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_jina_session() -> requests.Session:
+    global _jina_session
+    with _lazy_init_lock:
+        if _jina_session is None:
+            _jina_session = build_jina_session()
+    return _jina_session
+
+
+def _get_search_cache() -> SearchCache | None:
+    global _search_cache, _search_cache_ready
+    with _lazy_init_lock:
+        if not _search_cache_ready:
+            jina_config = get_jina_config()
+            if jina_config.CACHE_ENABLED:
+                _search_cache = SearchCache(
+                    jina_config.CACHE_PATH,
+                    ttl_seconds=jina_config.CACHE_TTL_SECONDS,
+                    max_entries=jina_config.CACHE_MAX_ENTRIES,
+                )
+            _search_cache_ready = True
+    return _search_cache
+
+
+def _get_rate_limiter() -> TokenBucketLimiter:
+    # Jina RPM and TPM budget, tokens are charged once the response reports them
+    return get_rate_limiter("jina")
+
+
+def _parse_jina_response(query: str, search_results: Dict[str, Any]) -> JinaReaderSearchResult:
+    pages = [
+        ScrapedWebPage(
+            url=page["url"],
+            title=page["title"],
+            description=page["description"],
+            content=page["content"],
+            jina_tokens=page["usage"]["tokens"],
+        ) for page in search_results["data"]
+    ]
+
+    return JinaReaderSearchResult(
+        query=query,
+        success=True,
+        scraped_pages=pages,
+        total_jina_tokens=search_results["meta"]["usage"]["tokens"],
+    )
+
+
+def _get_async_client() -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        jina_config = get_jina_config()
+        client = httpx.AsyncClient(
+            headers=dict(_get_jina_session().headers),
+            timeout=httpx.Timeout(
+                jina_config.READ_TIMEOUT,
+                connect=jina_config.CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=jina_config.POOL_SIZE,
+                max_keepalive_connections=jina_config.POOL_SIZE,
+            ),
+        )
+        semaphore = asyncio.Semaphore(jina_config.MAX_CONCURRENT_REQUESTS)
+        _async_clients[loop] = (client, semaphore)
+    return _async_clients[loop]
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever,
+                name="jina-async-search",
+                daemon=True,
+            ).start()
+    return _background_loop
+
+
+def _request_bytes(url: Any, headers: Any) -> int:
+    # size of the request line and headers, search requests have no body
+    return len(str(url)) + sum(len(key) + len(value) + 4 for key, value in headers.items())
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None = None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return get_jina_config().RETRY_BACKOFF_FACTOR * (2 ** attempt)
+
+
+def _read_cache(query: str, max_results: int, use_cache: bool) -> JinaReaderSearchResult | None:
+    search_cache = _get_search_cache() if use_cache else None
+    if search_cache is None:
+        return None
+    try:
+        return search_cache.get(query, max_results)
+    except sqlite3.Error:
+        logger.exception("Jina search cache read failed")
+        return None
+
+
+def _write_cache(search_result: JinaReaderSearchResult, max_results: int, use_cache: bool):
+    search_cache = _get_search_cache() if use_cache else None
+    if search_cache is None:
+        return
+    try:
+        search_cache.set(search_result, max_results)
+    except sqlite3.Error:
+        logger.exception("Jina search cache write failed")
+
+
+def _fetch_search(params: Dict[str, Any]) -> Dict[str, Any]:
+    jina_config = get_jina_config()
+    for attempt in range(jina_config.MAX_RETRIES + 1):
+        reserved = _get_rate_limiter().acquire()
+        settled = False
+        try:
+            response = _get_jina_session().get(
+                jina_config.SEARCH_URL,
+                params=params,
+                timeout=(jina_config.CONNECT_TIMEOUT, jina_config.READ_TIMEOUT),
+            )
+            annotate(bytes_sent=_request_bytes(response.request.url, response.request.headers), bytes_received=len(response.content))
+            if response.status_code == 429 and attempt < jina_config.MAX_RETRIES:
+                _get_rate_limiter().rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+                continue
+            response.raise_for_status()
+
+            search_results = response.json()
+            _get_rate_limiter().reconcile(reserved, _reported_tokens(search_results))
+            settled = True
+            return search_results
+        finally:
+            # retried and failed attempts used no tokens
+            if not settled:
+                _get_rate_limiter().refund(reserved)
+
+
+async def _fetch_search_async(params: Dict[str, Any]) -> Dict[str, Any]:
+    jina_config = get_jina_config()
+    client, semaphore = _get_async_client()
+    async with semaphore:
+        for attempt in range(jina_config.MAX_RETRIES + 1):
+            reserved = await _get_rate_limiter().acquire_async()
+            settled = False
+            try:
+                try:
+                    response = await client.get(jina_config.SEARCH_URL, params=params)
+                    annotate(bytes_sent=_request_bytes(response.request.url, response.request.headers), bytes_received=len(response.content))
+                except httpx.TransportError:
+                    if attempt == jina_config.MAX_RETRIES:
+                        raise
+                    await asyncio.sleep(_retry_delay(attempt))
+                    continue
+
+                if response.status_code == 429 and attempt < jina_config.MAX_RETRIES:
+                    # the pause applies to every pending search, acquire_async waits it out
+                    _get_rate_limiter().rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+                    continue
+                if response.status_code in RETRY_STATUS_CODES and attempt < jina_config.MAX_RETRIES:
+                    await asyncio.sleep(_retry_delay(attempt, response))
+                    continue
+                response.raise_for_status()
+
+                search_results = response.json()
+                _get_rate_limiter().reconcile(reserved, _reported_tokens(search_results))
+                settled = True
+                return search_results
+            finally:
+                # retried and failed attempts used no tokens
+                if not settled:
+                    _get_rate_limiter().refund(reserved)
+
+
+def _reported_tokens(search_results: Dict[str, Any]) -> Optional[int]:
+    return search_results.get("meta", {}).get("usage", {}).get("tokens")
+
+
+@profiled("jina", "search")
+def jina_search(query: str, max_results: Optional[int] = None, use_cache: bool = True) -> JinaReaderSearchResult:
+    jina_config = get_jina_config()
+    max_results = max_results or jina_config.NUM_PAGES_PER_SEARCH
+    # recorded and replayed runs must see every search, not the cache
+    archive = get_replay_archive()
+    use_cache = use_cache and archive is None
+    cached = _read_cache(query, max_results, use_cache)
+    if cached:
+        logger.info(f"Cache HIT for query: '{query[:50]}'")
+        annotate(cache_hit=True)
+        return cached
+
+    # Build query parameters
+    params = {
+        "q": query,
+        "num": max_results
     }
 
     try:
-        response = requests.get(search_url, headers=headers, timeout=60)
-        response.raise_for_status()
-        
-        search_results = response.json()
-
-        pages = [
-            ScrapedWebPage(
-                url=page["url"],
-                title=page["title"],
-                description=page["description"],
-                content=page["content"],
-                jina_tokens=page["usage"]["tokens"],
-            ) for page in search_results["data"]
-        ]
+        if archive is None:
+            search_results = _fetch_search(params)
+        else:
+            search_results = archive.call("jina", "search", params, lambda: _fetch_search(params))
 
-        return JinaReaderSearchResult(
-            query=query,
-            success=True,
-            scraped_pages=pages,
-            total_jina_tokens=search_results["meta"]["usage"]["tokens"],
-        )
+        search_result = _parse_jina_response(query, search_results)
+        annotate(jina_tokens=search_result.total_jina_tokens)
+        _write_cache(search_result, max_results, use_cache)
+        return search_result
 
     except requests.exceptions.RequestException:
         logger.exception("Jina API request failed")
 
-    except pydantic.ValidationError:
+    except (pydantic.ValidationError, ValueError, KeyError, TypeError):
+        # undecodable JSON or a payload missing the expected fields, one bad response must not fail a fan-out
+        logger.exception("Jina API response parsing failed")
+
+    return JinaReaderSearchResult(
+        query=query,
+        success=False,
+    )
+
+
+@profiled("jina", "search")
+async def async_jina_search(query: str, max_results: Optional[int] = None, use_cache: bool = True) -> JinaReaderSearchResult:
+    jina_config = get_jina_config()
+    max_results = max_results or jina_config.NUM_PAGES_PER_SEARCH
+    archive = get_replay_archive()
+    use_cache = use_cache and archive is None
+    # sqlite calls would block every other search on the loop
+    cached = await asyncio.to_thread(_read_cache, query, max_results, use_cache) if use_cache else None
+    if cached:
+        logger.info(f"Cache HIT for query: '{query[:50]}'")
+        annotate(cache_hit=True)
+        return cached
+
+    params = {
+        "q": query,
+        "num": max_results
+    }
+
+    try:
+        if archive is None:
+            search_results = await _fetch_search_async(params)
+        else:
+            search_results = await archive.call_async("jina", "search", params, lambda: _fetch_search_async(params))
+
+        search_result = _parse_jina_response(query, search_results)
+        annotate(jina_tokens=search_result.total_jina_tokens)
+        if use_cache:
+            await asyncio.to_thread(_write_cache, search_result, max_results, use_cache)
+        return search_result
+
+    except httpx.HTTPError:
+        logger.exception("Jina API request failed")
+
+    except (pydantic.ValidationError, ValueError, KeyError, TypeError):
+        # undecodable JSON or a payload missing the expected fields, one bad response must not fail a fan-out
         logger.exception("Jina API response parsing failed")
 
     return JinaReaderSearchResult(
@@ -66,6 +334,29 @@ def jina_search(query: str, max_results: int = jina_config.NUM_PAGES_PER_SEARCH)
     )
 
 
+async def async_jina_search_many(queries: List[str], max_results: Optional[int] = None, use_cache: bool = True) -> List[JinaReaderSearchResult]:
+    return await asyncio.gather(*(async_jina_search(query, max_results, use_cache) for query in queries))
+
+
+def jina_search_many(queries: List[str], max_results: Optional[int] = None, use_cache: bool = True) -> List[JinaReaderSearchResult]:
+    """
+    Runs several searches concurrently from synchronous code, results keep the order of queries.
+    """
+    future = asyncio.run_coroutine_threadsafe(
+        async_jina_search_many(queries, max_results, use_cache),
+        _get_background_loop(),
+    )
+    return future.result()
+
+
+def jina_search_background(query: str, max_results: Optional[int] = None, use_cache: bool = True) -> "concurrent.futures.Future[JinaReaderSearchResult]":
+    """Starts a search on the background loop without waiting for it, e.g. to prefetch a likely next query."""
+    return asyncio.run_coroutine_threadsafe(
+        async_jina_search(query, max_results, use_cache),
+        _get_background_loop(),
+    )
+
+
 def jina_result_to_formatted_pages(search_result: JinaReaderSearchResult, include_content: bool = True) -> List[str]:
     if not search_result.success:
         return ["Web search failed, try another time"]
@@ -97,7 +388,9 @@ def search_web_formatted_str_out(
     # return ["Web Search failed due to the rate limits."]
 
     search_result = jina_search(query)
-    if search_result.success:
+    if search_result.from_cache:
+        logger.info(f"Search cache returned {len(search_result.scraped_pages)} pages, no Jina API tokens burned")
+    elif search_result.success:
         logger.info(f"Jina API returned {len(search_result.scraped_pages)} pages")
         logger.info(f"Number of burned Jina API tokens: {search_result.total_jina_tokens}")
     else:
@@ -115,7 +408,29 @@ def search_web_structured_out(
     logger.info(f"Calling Jina API with query='{query}'")
 
     search_result = jina_search(query)
-    if search_result.success:
+    if search_result.from_cache:
+        logger.info(f"Search cache returned {len(search_result.scraped_pages)} pages, no Jina API tokens burned")
+    elif search_result.success:
+        logger.info(f"Jina API returned {len(search_result.scraped_pages)} pages")
+        logger.info(f"Number of burned Jina API tokens: {search_result.total_jina_tokens}")
+    else:
+        logger.warning(f"Failure to call Jina API")
+
+    return search_result.model_dump(mode='json')
+
+
+async def async_search_web_structured_out(
+    query: Annotated[str, "A query to be searched in the web"],
+) -> Dict:
+    """
+    Performs a web search without blocking the event loop and returns scraped web pages as dictionaries.
+    """
+    logger.info(f"Calling Jina API with query='{query}'")
+
+    search_result = await async_jina_search(query)
+    if search_result.from_cache:
+        logger.info(f"Search cache returned {len(search_result.scraped_pages)} pages, no Jina API tokens burned")
+    elif search_result.success:
         logger.info(f"Jina API returned {len(search_result.scraped_pages)} pages")
         logger.info(f"Number of burned Jina API tokens: {search_result.total_jina_tokens}")
     else:
@@ -125,6 +440,8 @@ def search_web_structured_out(
 
 
 if __name__ == "__main__":
+    from rich.logging import RichHandler
+
     logging.basicConfig(
         level=logging.INFO,
         format="%(message)s",
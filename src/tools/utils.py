@@ -1,13 +1,17 @@
-from typing import Any, List, Dict, Optional
+from typing import TYPE_CHECKING, Any, List, Dict, Optional
 
-from haystack.tools import Tool
-from haystack.components.tools import ToolInvoker
+if TYPE_CHECKING:
+    from haystack.tools import Tool
+    from haystack.components.tools import ToolInvoker
 
 
 def init_tool_invoker(
-    tools: List[Tool],
+    tools: List["Tool"],
     tool_invoker_kwargs: Optional[Dict[str, Any]] = None,
-) -> ToolInvoker:
+) -> "ToolInvoker":
+    # imported here so that Jina-only users of the package do not load Haystack
+    from haystack.components.tools import ToolInvoker
+
     resolved_tool_invoker_kwargs = {
         "tools": tools,
         **(tool_invoker_kwargs or {}),
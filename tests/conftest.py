@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+# settings are read on first use, tests never reach the real providers
+os.environ.setdefault("JINA_API_KEY", "test")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://test.openai.azure.com")
+
+
+@pytest.fixture(scope="session")
+def fake_openai_encoder():
+    from src.bench.fakes import build_fake_openai_encoder
+    return build_fake_openai_encoder()
+
+
+@pytest.fixture
+def v1_stand_ins(monkeypatch, tmp_path, fake_openai_encoder):
+    """
+    Runs v1_deepsearch offline with the benchmark stand-ins: synthetic Jina results, fake chat generators and
+    token counting, fresh stores and the Burr tracker under tmp_path. Returns the list of searched queries.
+    """
+    from src.bench.fakes import FakeChatGenerator, FakeGeminiClient, SyntheticPages
+    from src.fsm.v1_deepsearch import actions
+    from src.fsm.v1_deepsearch.config import fsm_config
+    from src.nlp import set_generator_override, set_gemini_client, set_openai_encoder
+    from src.tools.jina import _parse_jina_response
+
+    # 1000 tokens each, well above the 500 of too short pages
+    pages = SyntheticPages(4000)
+    searched = []
+
+    def search(query, max_results=None, use_cache=True):
+        searched.append(query)
+        return _parse_jina_response(query, pages.payload(query, 3))
+
+    monkeypatch.setattr(actions, "jina_search", search)
+    monkeypatch.setattr(actions, "jina_search_many", lambda queries, *args, **kwargs: [search(query) for query in queries])
+    monkeypatch.setattr(actions, "_content_store", None)
+    monkeypatch.setattr(actions, "_run_stores_open", False)
+    monkeypatch.setattr(fsm_config, "MAX_NUMBER_SEARCHES", 3)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+
+    set_generator_override(lambda provider, model: FakeChatGenerator(provider, model, completion_tokens=20))
+    set_gemini_client(FakeGeminiClient())
+    set_openai_encoder(fake_openai_encoder)
+    yield searched
+    set_generator_override(None)
+    set_gemini_client(None)
+    set_openai_encoder(None)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from src.fsm.v1_deepsearch import actions
+from src.fsm.v1_deepsearch.app import build_burr_app
+from src.fsm.v1_deepsearch.batch import read_queries, run_batch, run_research
+from src.fsm.v1_deepsearch.config import fsm_config
+
+
+def test_resumed_item_keeps_the_question_of_its_run(v1_stand_ins, monkeypatch, tmp_path):
+    monkeypatch.setattr(fsm_config, "CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(fsm_config, "CONTENT_STORE_PATH", str(tmp_path / "content"))
+    monkeypatch.setattr(fsm_config, "STREAM_REPORT", True)
+
+    app = build_burr_app(app_id="run-1")
+    app.run(halt_after=["prepare_report_sources"], inputs={"query": "original question"})
+
+    report_path = tmp_path / "report.md"
+    run_research("edited question", report_path, app_id="run-1")
+
+    report = report_path.read_text(encoding="utf-8")
+    assert "original question" in report
+    assert "edited question" not in report
+    assert report.split("## Report\n\n")[1].split("\n\n---")[0].strip()
+
+
+def test_every_item_gets_its_report_and_a_failure_stops_only_its_own(v1_stand_ins, monkeypatch, tmp_path):
+    search = actions.jina_search
+
+    def failing_search(query, *args, **kwargs):
+        if query == "broken question":
+            raise RuntimeError("search failed")
+        return search(query, *args, **kwargs)
+
+    monkeypatch.setattr(actions, "jina_search", failing_search)
+    queries = [
+        {"id": "first topic", "query": "first question"},
+        {"id": "broken", "query": "broken question"},
+        {"id": "third", "query": "third question"},
+    ]
+    results = {result["id"]: result for result in run_batch(queries, tmp_path / "reports", max_workers=2)}
+
+    assert results["broken"]["status"] == "failed"
+    assert "search failed" in results["broken"]["error"]
+    assert not (tmp_path / "reports" / "broken.md").exists()
+    for query_id, file_name, query in [("first topic", "first_topic.md", "first question"), ("third", "third.md", "third question")]:
+        assert results[query_id]["status"] == "done"
+        assert results[query_id]["report_path"] == str(tmp_path / "reports" / file_name)
+        assert query in (tmp_path / "reports" / file_name).read_text(encoding="utf-8")
+
+
+def test_read_queries_numbers_items_without_an_id(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text(json.dumps({"query": "first"}) + "\n\n" + json.dumps({"query": "second", "id": "mine"}) + "\n", encoding="utf-8")
+    assert read_queries(path) == [{"query": "first", "id": "query_0001"}, {"query": "second", "id": "mine"}]
+
+    path.write_text(json.dumps({"id": "empty"}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_queries(path)
@@ -0,0 +1,20 @@
+from src.bench.fakes import SyntheticPages, build_fake_openai_encoder
+from src.nlp import count_openai_tokens, get_openai_encoder, set_openai_encoder
+
+
+def test_stand_in_encoder_round_trips_at_three_to_four_chars_per_token():
+    encoder = build_fake_openai_encoder()
+    text = SyntheticPages(4000).content("query", 0)
+    tokens = encoder.encode(text, disallowed_special=())
+    assert encoder.decode(tokens) == text
+    assert 2.5 <= len(text) / len(tokens) <= 4.5
+
+
+def test_set_openai_encoder_replaces_o200k():
+    encoder = build_fake_openai_encoder()
+    set_openai_encoder(encoder)
+    try:
+        assert get_openai_encoder() is encoder
+        assert count_openai_tokens(" abc abc") == 2
+    finally:
+        set_openai_encoder(None)
@@ -0,0 +1,52 @@
+import pytest
+
+from src.fsm.v1_deepsearch import actions
+from src.fsm.v1_deepsearch.app import build_burr_app
+from src.fsm.v1_deepsearch.config import fsm_config
+
+
+@pytest.fixture
+def checkpoints(v1_stand_ins, monkeypatch, tmp_path):
+    monkeypatch.setattr(fsm_config, "CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(fsm_config, "CONTENT_STORE_PATH", str(tmp_path / "content"))
+    return v1_stand_ins
+
+
+def restart(monkeypatch):
+    # a new process finds only what is on disk
+    monkeypatch.setattr(actions, "_content_store", None)
+    monkeypatch.setattr(actions, "_run_stores_open", False)
+
+
+def test_resume_continues_after_the_last_completed_action(checkpoints, monkeypatch):
+    app = build_burr_app(app_id="run-1")
+    app.run(halt_after=["invoke_web_search_tool"], inputs={"query": "original question"})
+
+    restart(monkeypatch)
+    resumed = build_burr_app(app_id="run-1")
+    assert resumed.state.data.user_query == "original question"
+    assert resumed.state.data.search_counter == 1
+    assert resumed.get_next_action().name == "loop_breaker"
+
+    _, _, state = resumed.run(halt_after=["end"], inputs={"query": "original question"})
+    # the first search was not repeated
+    assert checkpoints[0] == "original question"
+    assert len(checkpoints) == fsm_config.MAX_NUMBER_SEARCHES
+    assert state.data.search_counter == fsm_config.MAX_NUMBER_SEARCHES
+    assert state.data.final_report
+
+
+def test_fork_continues_a_copy_and_leaves_the_original(checkpoints, monkeypatch):
+    app = build_burr_app(app_id="run-1")
+    app.run(halt_after=["invoke_web_search_tool"], inputs={"query": "original question"})
+
+    restart(monkeypatch)
+    fork = build_burr_app(app_id="run-2", fork_from_app_id="run-1")
+    assert fork.uid == "run-2"
+    assert fork.state.data.search_counter == 1
+    _, _, state = fork.run(halt_after=["end"], inputs={"query": "original question"})
+    assert state.data.final_report
+
+    original = build_burr_app(app_id="run-1")
+    assert original.state.data.search_counter == 1
+    assert not original.state.data.final_report
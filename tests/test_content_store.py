@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import time
+
+import pytest
+
+from src.core import ContentStore
+from src.models import PageRecord, SearchRecord
+
+
+def _page(content: str) -> PageRecord:
+    return PageRecord(url="https://example.com", title="t", description="d", content=content, jina_tokens=1, content_tokens=1)
+
+
+@pytest.fixture(params=["memory", "disk"])
+def store(request, tmp_path):
+    return ContentStore(None if request.param == "memory" else tmp_path / "content")
+
+
+def test_roundtrip_of_results(store):
+    result = SearchRecord(query="q", success=True, scraped_pages=[_page("first"), _page("second")], total_jina_tokens=2)
+    stored = store.store_result(result)
+
+    assert all(len(page.content_hash) == 32 for page in stored.scraped_pages)
+    loaded = store.load_result(stored)
+    assert [page.content for page in loaded.scraped_pages] == ["first", "second"]
+    with pytest.raises(KeyError):
+        store.get("0" * 32)
+
+
+def test_memory_texts_are_freed_with_their_last_reference():
+    store = ContentStore()
+    digest = store.put("shared page")
+    store.put("shared page")
+    other = store.put("other page")
+
+    store.release([digest, other])
+    assert digest in store and other not in store
+
+    store.release([digest])
+    assert digest not in store and len(store) == 0
+
+
+def test_prune_deletes_old_unreferenced_files(tmp_path):
+    store = ContentStore(tmp_path / "content")
+    old, referenced, fresh = store.put("old"), store.put("referenced"), store.put("fresh")
+    week_ago = time.time() - 7 * 86400
+    for digest in (old, referenced):
+        os.utime(store._blob_path(digest), (week_ago, week_ago))
+    leftover = store._blob_path(old).parent / "interrupted.tmp"
+    leftover.write_text("partial")
+    os.utime(leftover, (week_ago, week_ago))
+
+    assert store.prune(86400, keep=[referenced]) == 2
+    assert old not in store and not leftover.exists()
+    assert referenced in store and fresh in store
+
+
+def test_storing_a_text_again_keeps_it_from_pruning(tmp_path):
+    store = ContentStore(tmp_path / "content")
+    digest = store.put("page")
+    week_ago = time.time() - 7 * 86400
+    os.utime(store._blob_path(digest), (week_ago, week_ago))
+
+    store.put("page")
+    assert store.prune(86400) == 0
+
+
+def test_checkpointed_content_hashes(tmp_path):
+    from src.fsm.v1_deepsearch.app import CHECKPOINT_TABLE, checkpointed_content_hashes
+
+    path = tmp_path / "checkpoints.sqlite3"
+    assert checkpointed_content_hashes(path) == set()
+
+    state = {"search_results": [{"scraped_pages": [{"content_hash": "a" * 32}]}], "report_sources": [{"content_hash": "b" * 32}]}
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE {CHECKPOINT_TABLE} (app_id TEXT, state TEXT)")
+    conn.execute(f"INSERT INTO {CHECKPOINT_TABLE} VALUES (?, ?)", ("app", json.dumps(state)))
+    conn.commit()
+    conn.close()
+
+    assert checkpointed_content_hashes(path) == {"a" * 32, "b" * 32}
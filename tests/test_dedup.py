@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from src.nlp.dedup import NearDuplicateIndex, canonicalize_url, minhash_signature, signature_similarity
+
+
+@pytest.mark.parametrize("url, canonical", [
+    ("HTTP://WWW.Example.com/Path/", "https://example.com/Path"),
+    ("https://example.com:443/a#section", "https://example.com/a"),
+    ("https://example.com:8443/a", "https://example.com:8443/a"),
+    ("https://example.com", "https://example.com/"),
+    ("https://example.com/a?b=2&a=1", "https://example.com/a?a=1&b=2"),
+    ("https://example.com/a?utm_source=x&UTM_medium=y&gclid=1&fbclid=2&id=7", "https://example.com/a?id=7"),
+    ("https://[::1]:8443/x", "https://[::1]:8443/x"),
+    ("https://[2001:DB8::1]/x", "https://[2001:db8::1]/x"),
+])
+def test_canonicalize_url(url, canonical):
+    assert canonicalize_url(url) == canonical
+
+
+def test_content_selecting_params_are_kept():
+    # "ref" and "spm" select pages on some sites, only click IDs and utm_* are dropped
+    assert canonicalize_url("https://example.com/a?ref=v2") != canonicalize_url("https://example.com/a?ref=v3")
+    assert canonicalize_url("https://example.com/a?spm=1") == "https://example.com/a?spm=1"
+
+
+def _text(seed: int, words: int = 600) -> list:
+    rng = random.Random(seed)
+    return [f"word{rng.randrange(5000)}" for _ in range(words)]
+
+
+def test_minhash_estimates_similarity():
+    base = _text(0)
+    edited = list(base)
+    # change one word in fifty
+    for idx in range(0, len(edited), 50):
+        edited[idx] = "changed"
+
+    near = signature_similarity(minhash_signature(" ".join(base)), minhash_signature(" ".join(edited)))
+    unrelated = signature_similarity(minhash_signature(" ".join(base)), minhash_signature(" ".join(_text(1))))
+
+    assert near >= 0.7
+    assert unrelated <= 0.1
+
+
+def test_index_finds_near_duplicates_above_threshold():
+    index = NearDuplicateIndex(threshold=0.8)
+    original = " ".join(_text(0))
+    index.insert("original", index.signature(original))
+    index.insert("other", index.signature(" ".join(_text(2))))
+
+    copy = original + " Share this article."
+    key, similarity = index.most_similar(index.signature(copy))
+    assert key == "original" and similarity >= index.threshold
+
+    _, similarity = index.most_similar(index.signature(" ".join(_text(3))))
+    assert similarity < index.threshold
+
+
+def test_index_rejects_uneven_bands():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=64, bands=10)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from src.core import TokenBucketLimiter
+from src.tools import jina
+
+
+def _page(query: str) -> dict:
+    return {"url": f"https://example.com/{query}", "title": query, "description": "d", "content": "text", "usage": {"tokens": 10}}
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    query = request.url.params["q"]
+    if query == "broken json":
+        return httpx.Response(200, content=b"<html>not json</html>")
+    if query == "missing fields":
+        return httpx.Response(200, json={"data": [{"url": "https://example.com"}]})
+    return httpx.Response(200, json={"data": [_page(query)], "meta": {"usage": {"tokens": 10}}})
+
+
+def test_bad_responses_fail_only_their_own_search(monkeypatch):
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        monkeypatch.setattr(jina, "_get_async_client", lambda: (client, asyncio.Semaphore(5)))
+        try:
+            return await jina.async_jina_search_many(["broken json", "missing fields", "fine"], use_cache=False)
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+
+    assert [result.success for result in results] == [False, False, True]
+    assert [result.query for result in results] == ["broken json", "missing fields", "fine"]
+    assert results[2].scraped_pages[0].title == "fine"
+
+
+def test_failed_attempts_give_their_tokens_back(monkeypatch):
+    limiter = TokenBucketLimiter("jina", tokens_per_minute=600)
+    # the running average of 100 tokens becomes the reservation of every attempt
+    limiter.reconcile(0, 100)
+    monkeypatch.setattr(jina, "_get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(jina, "_retry_delay", lambda attempt, response=None: 0)
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(503),
+        httpx.Response(200, json={"data": [_page("q")], "meta": {"usage": {"tokens": 10}}}),
+        httpx.Response(500),
+    ])
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: next(responses)))
+        monkeypatch.setattr(jina, "_get_async_client", lambda: (client, asyncio.Semaphore(5)))
+        try:
+            succeeded = await jina.async_jina_search("q", use_cache=False)
+            # one attempt left, the 500 is raised and reported as a failed search
+            monkeypatch.setattr(jina.get_jina_config(), "MAX_RETRIES", 0)
+            failed = await jina.async_jina_search("q", use_cache=False)
+            return succeeded, failed
+        finally:
+            await client.aclose()
+
+    succeeded, failed = asyncio.run(run())
+
+    assert succeeded.success and not failed.success
+    # only the 10 tokens Jina reported are charged on top of the initial 100
+    assert limiter._tokens == pytest.approx(600 - 100 - 10, abs=2)
+
+
+def test_cache_is_read_and_written_off_the_event_loop(monkeypatch):
+    loop_threads = set()
+    cache_threads = []
+
+    class RecordingCache:
+        def get(self, query, max_results):
+            cache_threads.append(threading.get_ident())
+            return None
+
+        def set(self, search_result, max_results):
+            cache_threads.append(threading.get_ident())
+
+    monkeypatch.setattr(jina, "_get_search_cache", lambda: RecordingCache())
+
+    async def run():
+        loop_threads.add(threading.get_ident())
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        monkeypatch.setattr(jina, "_get_async_client", lambda: (client, asyncio.Semaphore(5)))
+        try:
+            return await jina.async_jina_search("fine")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()).success
+    assert len(cache_threads) == 2
+    assert not loop_threads & set(cache_threads)
@@ -0,0 +1,21 @@
+from src.core import get_jina_config
+from src.tools.jina import build_jina_session
+
+
+def test_session_pools_and_retries_server_errors():
+    jina_config = get_jina_config()
+    session = build_jina_session()
+
+    adapter = session.get_adapter("https://s.jina.ai/")
+    assert adapter is session.get_adapter("http://127.0.0.1/")
+    assert adapter._pool_maxsize == jina_config.POOL_SIZE
+    assert adapter.max_retries.total == jina_config.MAX_RETRIES
+    # 429s are left to the shared rate limiter
+    assert 429 not in adapter.max_retries.status_forcelist
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+def test_session_sends_auth_header():
+    session = build_jina_session()
+    assert session.headers["Authorization"] == f"Bearer {get_jina_config().envs.API_KEY}"
+    assert session.headers["Accept"] == "application/json"
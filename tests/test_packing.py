@@ -0,0 +1,74 @@
+import pytest
+
+from src.models import PageEvaluation, PageRecord
+from src.fsm.v1_deepsearch.packing import pack_sources, retrieve_source_chunks, source_utility
+
+
+def _evaluation(relevance: int, depth: int) -> PageEvaluation:
+    return PageEvaluation(depth_summary="", depth_score=depth, relevance_summary="", relevance_score=relevance)
+
+
+def test_source_utility_is_one_for_the_best_page():
+    assert source_utility(_evaluation(5, 5), query_idx=0, search_rank=0, novelty=1.0) == pytest.approx(1.0)
+
+
+def test_source_utility_decays_with_query_rank_and_overlap():
+    best = source_utility(_evaluation(5, 5), 0, 0, 1.0)
+    assert source_utility(_evaluation(5, 5), 3, 0, 1.0) < best
+    assert source_utility(_evaluation(5, 5), 0, 3, 1.0) < best
+    assert source_utility(_evaluation(5, 5), 0, 0, 0.5) == pytest.approx(best / 2)
+    # unevaluated pages score the scale midpoint
+    assert source_utility(None, 0, 0, 1.0) == pytest.approx(9 / 25)
+    # never zero, so pages can still be ranked
+    assert source_utility(_evaluation(0, 0), 0, 0, 0.0) > 0
+
+
+def test_pack_keeps_everything_within_the_limit():
+    assert pack_sources([100, 200], [0.5, 0.1], 1000) == [100, 200]
+
+
+def test_pack_splits_by_utility():
+    budgets = pack_sources([10_000, 10_000], [0.75, 0.25], 4000)
+    assert budgets == [3000, 1000]
+
+
+def test_pack_gives_budget_of_short_pages_to_the_rest():
+    budgets = pack_sources([600, 10_000, 10_000], [0.5, 0.25, 0.25], 5000)
+    assert budgets[0] == 600
+    assert budgets[1] == budgets[2] == 2200
+    assert sum(budgets) <= 5000
+
+
+def test_pack_drops_weakest_pages_below_min_tokens():
+    tokens = [5000] * 4
+    utilities = [0.9, 0.8, 0.7, 0.01]
+    budgets = pack_sources(tokens, utilities, 3000, min_tokens=500)
+    assert budgets[3] == 0
+    assert all(budget >= 500 for budget in budgets[:3])
+    assert sum(budgets) <= 3000
+
+
+def test_pack_never_exceeds_page_sizes_or_limit():
+    tokens = [700, 3000, 120, 9000, 0, 2500]
+    utilities = [0.3, 0.9, 0.2, 0.6, 0.5, 0.05]
+    budgets = pack_sources(tokens, utilities, 6000)
+    assert sum(budgets) <= 6000
+    assert all(0 <= budget <= size for budget, size in zip(budgets, tokens))
+    assert budgets[4] == 0
+
+
+def _page(content: str) -> PageRecord:
+    return PageRecord(url="https://example.com", title="t", description="d", content=content, jina_tokens=0, content_tokens=len(content) // 4)
+
+
+def test_retrieval_keeps_matching_chunks_within_the_limit():
+    relevant = "\n\n".join(["Heat pumps cut heating costs in passive houses."] * 3 + ["Unrelated gardening advice."] * 3)
+    other = "\n\n".join(["Gardening tips for spring."] * 6)
+    pages = [_page(relevant), _page(other)]
+
+    retrieved = retrieve_source_chunks(pages, [1.0, 1.0], ["heat pumps passive house"], token_limit=40, chunk_chars=60)
+
+    assert len(retrieved) == 1
+    assert "Heat pumps" in retrieved[0].content
+    assert "gardening" not in retrieved[0].content.lower()
+    assert retrieved[0].content_tokens <= 40
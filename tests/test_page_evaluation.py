@@ -0,0 +1,93 @@
+import json
+import threading
+
+import pytest
+
+from src.bench.fakes import FakeChatGenerator
+from src.core import ReplayArchive, ReplayMiss, get_replay_archive, set_replay_archive
+from src.fsm.v1_deepsearch.actions import evaluate_page
+from src.fsm.v1_deepsearch.app import build_burr_app
+from src.fsm.v1_deepsearch.config import fsm_config
+from src.models import PageRecord
+from src.nlp import set_generator_override
+
+
+class EvaluationGenerator(FakeChatGenerator):
+    """
+    Rates the first page of a search as irrelevant, fails on the second one and rates the rest as relevant.
+    Always asks to search the original question again, so that both rounds find the same pages.
+    """
+
+    def __init__(self, provider, model):
+        super().__init__(provider, model, completion_tokens=20)
+        self.evaluated = []
+        # pages are evaluated concurrently, each thread rates its own prompt
+        self._prompts = threading.local()
+
+    def _tool_call(self, messages, tools, generation_kwargs, serial):
+        self._prompts.text = messages[-1].text
+        return super()._tool_call(messages, tools, generation_kwargs, serial)
+
+    def _structured_reply(self, generation_kwargs, serial):
+        properties = generation_kwargs.get("response_format", {}).get("json_schema", {}).get("schema", {}).get("properties", {})
+        if "next_search_query" in properties:
+            return json.dumps({"search_result_evaluation": "useful", "next_search_query": "original question"})
+        if "relevance_score" not in properties:
+            return super()._structured_reply(generation_kwargs, serial)
+
+        page_idx = self._prompts.text.split("# original question (")[1][0]
+        self.evaluated.append(page_idx)
+        if page_idx == "1":
+            raise RuntimeError("provider down")
+        relevance = 1 if page_idx == "0" else 5
+        return json.dumps({"depth_summary": "deep", "depth_score": 3, "relevance_summary": "on topic", "relevance_score": relevance})
+
+
+def test_pages_are_evaluated_once_and_irrelevant_ones_dropped(v1_stand_ins, monkeypatch):
+    monkeypatch.setattr(fsm_config, "EVALUATE_PAGES", True)
+    monkeypatch.setattr(fsm_config, "EVALUATION_MIN_RELEVANCE", 2)
+    monkeypatch.setattr(fsm_config, "MAX_NUMBER_SEARCHES", 2)
+    generators = []
+    set_generator_override(lambda provider, model: generators.append(EvaluationGenerator(provider, model)) or generators[-1])
+
+    app = build_burr_app()
+    _, _, state = app.run(halt_after=["prepare_report_sources"], inputs={"query": "original question"})
+
+    # both searches found the same three pages
+    assert v1_stand_ins == ["original question", "original question"]
+    evaluated = [page_idx for generator in generators for page_idx in generator.evaluated]
+    assert sorted(evaluated) == ["0", "1", "2"]
+
+    # the failed evaluation keeps its page, unevaluated
+    sources = {page.title: page.evaluation for page in state.data.report_sources}
+    assert set(sources) == {"original question (1)", "original question (2)"}
+    assert sources["original question (1)"] is None
+    assert sources["original question (2)"].relevance_score == 5
+
+
+def test_invalid_reply_leaves_the_page_unevaluated(monkeypatch):
+    class InvalidGenerator(FakeChatGenerator):
+        def _structured_reply(self, generation_kwargs, serial):
+            return '{"relevance_score": "high"}'
+
+    set_generator_override(lambda provider, model: InvalidGenerator(provider, model))
+    try:
+        page = PageRecord(url="https://example.com", title="t", description="d", content="some content", jina_tokens=3, content_tokens=3)
+        assert evaluate_page(page, "query", token_limit=100) is None
+    finally:
+        set_generator_override(None)
+
+
+def test_replay_miss_fails_the_evaluation(tmp_path):
+    path = tmp_path / "archive.sqlite3"
+    ReplayArchive(path, "record")
+    set_generator_override(lambda provider, model: FakeChatGenerator(provider, model))
+    previous = get_replay_archive()
+    set_replay_archive(ReplayArchive(path, "replay"))
+    try:
+        page = PageRecord(url="https://example.com", title="t", description="d", content="some content", jina_tokens=3, content_tokens=3)
+        with pytest.raises(ReplayMiss):
+            evaluate_page(page, "query", token_limit=100)
+    finally:
+        set_replay_archive(previous)
+        set_generator_override(None)
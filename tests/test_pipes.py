@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.bench.fakes import FakeChatGenerator
+from src.models import PageEvaluation, SearchReasoningNextQuery
+from src.nlp import build_azure_openai_chat_pipe, build_azure_openai_struct_pipe, gemini_response_schema, get_pipe, get_type_adapter, openai_response_format, parse_struct_reply, set_generator_override
+
+
+@pytest.fixture
+def built_generators():
+    built = []
+
+    def factory(provider, model):
+        built.append((provider, model))
+        return FakeChatGenerator(provider, model)
+
+    set_generator_override(factory)
+    yield built
+    set_generator_override(None)
+
+
+def test_pipes_are_built_once_per_builder_and_model(built_generators):
+    pipe = get_pipe(build_azure_openai_struct_pipe, "deployment-a")
+    assert get_pipe(build_azure_openai_struct_pipe, "deployment-a") is pipe
+    assert get_pipe(build_azure_openai_struct_pipe, "deployment-b") is not pipe
+    assert get_pipe(build_azure_openai_chat_pipe, "deployment-a") is not pipe
+    assert built_generators == [("azure_openai", "deployment-a"), ("azure_openai", "deployment-b"), ("azure_openai", "deployment-a")]
+
+
+def test_concurrent_first_use_builds_one_pipe(built_generators):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        pipes = list(executor.map(lambda _: get_pipe(build_azure_openai_struct_pipe, "deployment-a"), range(16)))
+    assert all(pipe is pipes[0] for pipe in pipes)
+    assert len(built_generators) == 1
+
+
+def test_generator_override_drops_pipes_built_before(built_generators):
+    pipe = get_pipe(build_azure_openai_struct_pipe, "deployment-a")
+
+    set_generator_override(lambda provider, model: FakeChatGenerator(provider, model, completion_tokens=1))
+    rebuilt = get_pipe(build_azure_openai_struct_pipe, "deployment-a")
+    assert rebuilt is not pipe
+    assert rebuilt[0].get_component("llm").completion_tokens == 1
+
+
+def test_schemas_and_adapters_are_built_once_per_model():
+    response_format = openai_response_format(PageEvaluation)
+    assert openai_response_format(PageEvaluation) is response_format
+    assert openai_response_format(PageEvaluation, strict=False) is not response_format
+    assert openai_response_format(SearchReasoningNextQuery) is not response_format
+    assert gemini_response_schema(PageEvaluation) is gemini_response_schema(PageEvaluation)
+    assert get_type_adapter(PageEvaluation) is get_type_adapter(PageEvaluation)
+    assert get_type_adapter(PageEvaluation) is not get_type_adapter(SearchReasoningNextQuery)
+
+
+def test_parse_struct_reply_validates_with_the_cached_adapter():
+    reply = parse_struct_reply(SearchReasoningNextQuery, '{"search_result_evaluation": "useful", "next_search_query": "next"}')
+    assert reply == SearchReasoningNextQuery(search_result_evaluation="useful", next_search_query="next")
+    with pytest.raises(ValueError):
+        parse_struct_reply(SearchReasoningNextQuery, '{"search_result_evaluation": "useful"}')
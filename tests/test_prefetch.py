@@ -0,0 +1,79 @@
+import types
+from concurrent.futures import Future
+
+import pytest
+
+from src.fsm.v1_deepsearch import prefetch as prefetch_module
+from src.fsm.v1_deepsearch.prefetch import SearchPrefetcher
+from src.models import JinaReaderSearchResult
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(prefetch_module, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Futures of the started searches by query, left pending until a test resolves them."""
+    started = {}
+
+    def search_background(query):
+        started[query] = Future()
+        return started[query]
+
+    monkeypatch.setattr(prefetch_module, "jina_search_background", search_background)
+    return started
+
+
+def resolve(future: Future, query: str) -> Future:
+    future.set_result(JinaReaderSearchResult(query=query, success=True, scraped_pages=[]))
+    return future
+
+
+def test_exact_and_similar_queries_take_the_prefetched_search(clock, searches):
+    prefetcher = SearchPrefetcher(match_threshold=0.6)
+    prefetcher.prefetch(["solar panel subsidies germany", "heat pump prices"])
+    for query, future in searches.items():
+        resolve(future, query)
+
+    assert prefetcher.take("Heat  Pump prices").query == "heat pump prices"
+    assert prefetcher.take("solar panel subsidies in germany").query == "solar panel subsidies germany"
+    assert prefetcher.take("heat pump prices") is None
+    assert (prefetcher.started, prefetcher.served) == (2, 2)
+
+
+def test_dissimilar_queries_are_searched_anew(clock, searches):
+    prefetcher = SearchPrefetcher(match_threshold=0.6)
+    prefetcher.prefetch(["solar panel subsidies germany"])
+    assert prefetcher.take("wind turbine noise") is None
+
+
+def test_prefetchers_do_not_share_candidates(clock, searches):
+    first, second = SearchPrefetcher(), SearchPrefetcher()
+    first.prefetch(["heat pump prices"])
+    resolve(searches["heat pump prices"], "heat pump prices")
+    assert second.take("heat pump prices") is None
+    assert first.take("heat pump prices") is not None
+
+
+def test_expired_and_cleared_searches_are_cancelled(clock, searches):
+    prefetcher = SearchPrefetcher(ttl_seconds=600)
+    prefetcher.prefetch(["heat pump prices"])
+    clock.now += 601
+    prefetcher.prefetch(["solar panel subsidies germany"])
+    assert searches["heat pump prices"].cancelled()
+    assert prefetcher.take("heat pump prices") is None
+
+    prefetcher.clear()
+    assert searches["solar panel subsidies germany"].cancelled()
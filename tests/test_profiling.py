@@ -0,0 +1,43 @@
+from src.core import CallRecord, RunProfile, annotate, enter_action, exit_action, profile_call
+
+
+def test_annotate_sums_numbers_and_skips_missing_values():
+    profile = RunProfile("app")
+    token = enter_action(profile, "invoke_web_search_tool", 1)
+    with profile_call("jina", "search"):
+        annotate(bytes_sent=100, jina_tokens=None, cache_hit=False)
+        annotate(bytes_sent=20, jina_tokens=5)
+    exit_action(token, 1.0)
+
+    call = profile.actions[0].calls[0]
+    assert (call.bytes_sent, call.jina_tokens, call.cache_hit) == (120, 5, False)
+    assert profile.summary()["invoke_web_search_tool"]["jina_tokens"] == 5
+
+
+def test_annotate_is_a_no_op_outside_a_profiled_call():
+    annotate(bytes_sent=100)
+
+
+def test_summary_totals_calls_per_action_and_category():
+    profile = RunProfile("app")
+    for sequence_id, wall_seconds in [(1, 2.0), (3, 3.0)]:
+        profile.start_action("generate_search_params", sequence_id)
+        profile.add_call(CallRecord("azure_openai", "generate", sequence_id=sequence_id, wall_seconds=1.5, queue_wait_seconds=0.25, prompt_tokens=100, completion_tokens=10))
+        profile.add_call(CallRecord("gemini", "count_tokens", sequence_id=sequence_id, wall_seconds=0.5))
+        profile.finish_action(sequence_id, wall_seconds)
+    profile.start_action("invoke_web_search_tool", 2)
+    profile.add_call(CallRecord("jina", "search", sequence_id=2, wall_seconds=4.0, jina_tokens=300, bytes_received=1000))
+    profile.finish_action(2, 5.0)
+    # calls outside of an action show up in no action's totals
+    profile.add_call(CallRecord("gemini", "count_tokens", sequence_id=None, wall_seconds=9.0, prompt_tokens=1))
+
+    summary = profile.summary()
+    assert summary["generate_search_params"] == {
+        "runs": 2, "wall_seconds": 5.0, "queue_wait_seconds": 0.5,
+        "seconds_by_category": {"generation": 3.0, "tokenization": 1.0}, "calls": 4,
+        "prompt_tokens": 200, "completion_tokens": 20, "jina_tokens": 0,
+        "bytes_sent": 0, "bytes_received": 0,
+    }
+    assert summary["invoke_web_search_tool"]["seconds_by_category"] == {"network": 4.0}
+    assert (summary["invoke_web_search_tool"]["jina_tokens"], summary["invoke_web_search_tool"]["bytes_received"]) == (300, 1000)
+    assert len(profile.unattributed_calls) == 1
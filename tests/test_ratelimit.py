@@ -0,0 +1,123 @@
+import email.utils
+import time
+import types
+
+import pytest
+
+from src.core import ratelimit
+from src.core.ratelimit import TokenBucketLimiter, is_rate_limit_error, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_requests_beyond_the_minute_budget_wait(clock):
+    limiter = TokenBucketLimiter("test", requests_per_minute=60)
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.slept == 0
+
+    limiter.acquire()
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_tokens_beyond_the_minute_budget_wait(clock):
+    limiter = TokenBucketLimiter("test", tokens_per_minute=600)
+    limiter.acquire(600)
+    limiter.acquire(300)
+    assert clock.slept == pytest.approx(30.0)
+
+
+def test_reconcile_charges_the_actual_usage(clock):
+    limiter = TokenBucketLimiter("test", tokens_per_minute=600)
+    reserved = limiter.acquire(100)
+    limiter.reconcile(reserved, 700)
+
+    limiter.acquire(0)
+    assert clock.slept == pytest.approx(10.0)
+
+
+def test_rate_limited_pauses_everybody(clock):
+    limiter = TokenBucketLimiter("test", backoff_base=2, max_backoff=5)
+    limiter.rate_limited(retry_after=3)
+    limiter.acquire()
+    assert clock.slept == pytest.approx(3.0)
+
+    # exponential backoff without Retry-After, capped at max_backoff
+    limiter.rate_limited()
+    limiter.rate_limited()
+    limiter.rate_limited()
+    limiter.acquire()
+    assert clock.slept == pytest.approx(3.0 + 5.0)
+    assert limiter.stats()["rate_limited"] == 4
+
+
+def test_call_retries_rate_limit_errors_only(clock):
+    limiter = TokenBucketLimiter("test", backoff_base=1)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(attempts) == 3
+
+    with pytest.raises(ValueError):
+        limiter.call(lambda: (_ for _ in ()).throw(ValueError("bad request")))
+
+    attempts.clear()
+    with pytest.raises(RateLimited):
+        limiter.call(flaky, can_retry=lambda: False)
+    assert len(attempts) == 1
+
+
+def test_rate_limit_errors_are_found_in_the_chain():
+    try:
+        try:
+            raise RateLimited()
+        except RateLimited as e:
+            raise RuntimeError("pipeline failed") from e
+    except RuntimeError as wrapped:
+        assert is_rate_limit_error(wrapped)
+    assert not is_rate_limit_error(RuntimeError("other"))
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("2.5") == 2.5
+    in_ten_seconds = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 <= parse_retry_after(in_ten_seconds) <= 10
+
+
+def test_refund_returns_tokens_but_not_the_request(clock):
+    limiter = TokenBucketLimiter("test", requests_per_minute=1, tokens_per_minute=600)
+    reserved = limiter.acquire(600)
+    limiter.refund(reserved)
+
+    limiter.acquire(600)
+    # the tokens are back, the second request still waits for its slot
+    assert clock.slept == pytest.approx(60.0)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from src.core import ReplayArchive, ReplayMiss, get_replay_archive, use_replay_archive
+
+
+def record(path, calls):
+    archive = ReplayArchive(path, "record")
+    for request, response in calls:
+        assert archive.call("jina", "search", request, lambda: response) == response
+    return archive
+
+
+def never_called():
+    raise AssertionError("a replayed call must not reach the provider")
+
+
+def test_replay_answers_recorded_calls_without_fetching(tmp_path):
+    path = tmp_path / "archive.sqlite3"
+    record(path, [({"q": "a"}, {"data": [1]}), ({"q": "b"}, {"data": [2]})])
+
+    archive = ReplayArchive(path, "replay")
+    assert archive.call("jina", "search", {"q": "b"}, never_called) == {"data": [2]}
+    assert archive.call("jina", "search", {"q": "a"}, never_called) == {"data": [1]}
+
+
+def test_repeated_requests_replay_their_answers_in_order(tmp_path):
+    path = tmp_path / "archive.sqlite3"
+    record(path, [({"q": "a"}, "first"), ({"q": "a"}, "second")])
+
+    archive = ReplayArchive(path, "replay")
+    answers = [archive.call("jina", "search", {"q": "a"}, never_called) for _ in range(3)]
+    # sent more often than recorded, the last recorded answer repeats
+    assert answers == ["first", "second", "second"]
+
+
+def test_unrecorded_calls_raise_replay_miss(tmp_path):
+    path = tmp_path / "archive.sqlite3"
+    record(path, [({"q": "a"}, "answer")])
+
+    archive = ReplayArchive(path, "replay")
+    with pytest.raises(ReplayMiss):
+        archive.call("jina", "search", {"q": "other"}, never_called)
+    with pytest.raises(ReplayMiss):
+        archive.call("gemini", "count_tokens", {"q": "a"}, never_called)
+
+
+def test_identical_payloads_are_stored_once(tmp_path):
+    archive = record(tmp_path / "archive.sqlite3", [({"q": "a"}, "same"), ({"q": "b"}, "same")])
+    stats = archive.stats()
+    assert stats["calls"] == {"jina search": 2}
+    # two requests and one shared response
+    assert stats["blobs"] == 3
+
+
+def test_async_calls_are_recorded_and_replayed(tmp_path):
+    path = tmp_path / "archive.sqlite3"
+
+    async def fetch():
+        return {"data": "async"}
+
+    archive = ReplayArchive(path, "record")
+    assert asyncio.run(archive.call_async("jina", "search", {"q": "a"}, fetch)) == {"data": "async"}
+
+    archive = ReplayArchive(path, "replay")
+    assert asyncio.run(archive.call_async("jina", "search", {"q": "a"}, never_called)) == {"data": "async"}
+
+
+def test_use_replay_archive(tmp_path):
+    with pytest.raises(ValueError):
+        use_replay_archive(None, "record")
+    with pytest.raises(FileNotFoundError):
+        use_replay_archive(tmp_path / "missing.sqlite3", "replay")
+
+    try:
+        archive = use_replay_archive(tmp_path / "archive.sqlite3", "record")
+        assert get_replay_archive() is archive
+    finally:
+        use_replay_archive(None, None)
+    assert get_replay_archive() is None
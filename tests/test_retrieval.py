@@ -0,0 +1,34 @@
+from src.nlp import ChunkIndex, chunk_spans, tokenize_terms
+
+
+def test_short_paragraphs_are_merged_up_to_the_chunk_size():
+    text = "\n\n".join(["a" * 30] * 4)
+    spans = chunk_spans(text, 70)
+    assert [text[start:end].count("a") for start, end in spans] == [60, 60]
+
+
+def test_long_paragraphs_are_split_at_sentences_then_hard():
+    sentences = " ".join(["This sentence is about twenty chars."] * 10)
+    table = "x" * 250
+    text = sentences + "\n\n" + table
+    spans = chunk_spans(text, 100)
+    assert all(end - start <= 100 for start, end in spans)
+    assert "".join(text[start:end] for start, end in spans).count("x") == 250
+
+
+def test_tokenize_terms_drops_stopwords():
+    assert tokenize_terms("What is the cost of a Heat Pump?") == ["cost", "heat", "pump"]
+
+
+def test_search_ranks_matching_chunks_first_per_query():
+    index = ChunkIndex(chunk_chars=60)
+    index.add_document("energy", "Heat pumps lower heating bills.\n\nWindows leak heat in winter.")
+    index.add_document("permits", "Building permits are issued by the city.\n\nGardens need water.")
+    index.add_document("energy", "ignored, the document is already indexed")
+
+    hits = index.search(["heat pumps", "building permits"])
+
+    # each query's best chunk is normalized to 1, chunks matching no query are left out
+    assert {(doc_id, score) for doc_id, _, score in hits[:2]} == {("energy", 1.0), ("permits", 1.0)}
+    assert all(chunk.terms.get("gardens") is None for _, chunk, _ in hits)
+    assert "energy" in index and "gardens" not in index
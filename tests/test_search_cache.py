@@ -0,0 +1,81 @@
+from src.models import JinaReaderSearchResult, ScrapedWebPage
+from src.tools import cache as cache_module
+from src.tools.cache import SearchCache
+
+
+def _result(query: str) -> JinaReaderSearchResult:
+    page = ScrapedWebPage(url=f"https://example.com/{len(query)}", title=query, description="d", content="text", jina_tokens=1)
+    return JinaReaderSearchResult(query=query, success=True, scraped_pages=[page], total_jina_tokens=1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+def _keys(cache: SearchCache) -> list:
+    return [row[0] for row in cache._connection().execute("SELECT key FROM jina_search ORDER BY key")]
+
+
+def test_roundtrip_normalizes_query(tmp_path):
+    cache = SearchCache(tmp_path / "cache.sqlite3")
+    cache.set(_result("Solar  Panels"), 5)
+
+    hit = cache.get("solar panels", 5)
+    assert hit is not None and hit.from_cache
+    assert hit.query == "solar panels"
+    assert cache.get("solar panels", 3) is None
+
+
+def test_failed_results_are_not_cached(tmp_path):
+    cache = SearchCache(tmp_path / "cache.sqlite3")
+    cache.set(JinaReaderSearchResult(query="q", success=False), 5)
+    assert cache.get("q", 5) is None
+
+
+def test_expired_entries_are_not_served_and_get_evicted(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    cache = SearchCache(tmp_path / "cache.sqlite3", ttl_seconds=100, evict_every=10)
+    for idx in range(5):
+        cache.set(_result(f"old {idx}"), 5)
+
+    clock.now += 1000
+    assert cache.get("old 0", 5) is None
+    # the remaining expired rows go with the next eviction pass
+    for idx in range(6):
+        cache.set(_result(f"new {idx}"), 5)
+    assert all(key.startswith("new") for key in _keys(cache))
+    assert len(_keys(cache)) == 6
+
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module.time, "time", FakeClock().time)
+    cache = SearchCache(tmp_path / "cache.sqlite3", max_entries=3, evict_every=1)
+    for query in ("a", "b", "c"):
+        cache.set(_result(query), 5)
+    assert cache.get("a", 5) is not None
+
+    cache.set(_result("d"), 5)
+
+    assert _keys(cache) == ["a|5", "c|5", "d|5"]
+
+
+def test_eviction_is_batched(tmp_path):
+    cache = SearchCache(tmp_path / "cache.sqlite3", max_entries=10, evict_every=50)
+    for idx in range(49):
+        cache.set(_result(f"q {idx}"), 5)
+    assert len(_keys(cache)) == 49
+
+    cache.set(_result("q 49"), 5)
+    assert len(_keys(cache)) == 10
+
+
+def test_ttl_eviction_uses_an_index(tmp_path):
+    cache = SearchCache(tmp_path / "cache.sqlite3", ttl_seconds=100)
+    plan = cache._connection().execute("EXPLAIN QUERY PLAN DELETE FROM jina_search WHERE created_at < 0").fetchall()
+    assert any("jina_search_created_at" in row[-1] for row in plan)
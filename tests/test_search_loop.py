@@ -0,0 +1,46 @@
+import json
+
+from src.bench.fakes import FakeChatGenerator
+from src.fsm.v1_deepsearch.app import build_burr_app
+from src.fsm.v1_deepsearch.config import fsm_config
+from src.nlp import set_generator_override
+
+
+class FollowUpsGenerator(FakeChatGenerator):
+    """Answers every search reasoning call with the same follow-ups."""
+
+    def __init__(self, provider, model, follow_ups):
+        super().__init__(provider, model, completion_tokens=20)
+        self.follow_ups = follow_ups
+
+    def _structured_reply(self, generation_kwargs, serial):
+        schema = generation_kwargs.get("response_format", {}).get("json_schema", {}).get("schema", {})
+        if "search_result_follow_ups" not in schema.get("properties", {}):
+            return super()._structured_reply(generation_kwargs, serial)
+        return json.dumps({"search_result_evaluation": "useful", "search_result_follow_ups": self.follow_ups})
+
+
+def run_search_loop(follow_ups, fan_out, max_searches, monkeypatch):
+    monkeypatch.setattr(fsm_config, "SEARCH_FAN_OUT", fan_out)
+    monkeypatch.setattr(fsm_config, "MAX_NUMBER_SEARCHES", max_searches)
+    set_generator_override(lambda provider, model: FollowUpsGenerator(provider, model, follow_ups))
+    app = build_burr_app()
+    _, _, state = app.run(halt_after=["prepare_report_sources"], inputs={"query": "original question"})
+    return state.data
+
+
+def test_fan_out_skips_repeats_and_counts_every_query(v1_stand_ins, monkeypatch):
+    follow_ups = ["first", " first ", "second", "original question", "third", "fourth"]
+    state = run_search_loop(follow_ups, fan_out=2, max_searches=4, monkeypatch=monkeypatch)
+
+    # the last round is cut to the one search left
+    assert v1_stand_ins == ["original question", "first", "second", "third"]
+    assert state.executed_queries == v1_stand_ins
+    assert state.search_counter == 4
+
+
+def test_fan_out_repeats_a_query_when_nothing_new_is_suggested(v1_stand_ins, monkeypatch):
+    state = run_search_loop(["original question"], fan_out=3, max_searches=2, monkeypatch=monkeypatch)
+
+    assert v1_stand_ins == ["original question", "original question"]
+    assert state.search_counter == 2
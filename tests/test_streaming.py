@@ -0,0 +1,74 @@
+from typing import List, Optional
+
+import pytest
+from haystack import component
+from haystack.dataclasses import ChatMessage, StreamingChunk, StreamingCallbackT
+
+from src.core import TokenBucketLimiter
+from src.nlp import StreamSink, QueueSink, FileSink, build_streaming_callback
+from src.nlp.governed_pipeline import GovernedPipeline
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+@component
+class FlakyLLM:
+    """Streams "Hello world", failing with a 429 on the first call before or after the first chunk."""
+
+    def __init__(self, fail_after_chunks: int):
+        self.fail_after_chunks = fail_after_chunks
+        self.calls = 0
+
+    @component.output_types(replies=List[ChatMessage])
+    def run(self, messages: List[ChatMessage], streaming_callback: Optional[StreamingCallbackT] = None):
+        self.calls += 1
+        for idx, word in enumerate(["Hello", " world"]):
+            if self.calls == 1 and idx == self.fail_after_chunks:
+                raise RateLimited("429 Too Many Requests")
+            streaming_callback(StreamingChunk(content=word))
+        return {"replies": [ChatMessage.from_assistant("Hello world")]}
+
+
+def _run(llm: FlakyLLM, sink: QueueSink):
+    pipe = GovernedPipeline(TokenBucketLimiter("test", backoff_base=0.001))
+    pipe.add_component("llm", llm)
+    return pipe.run({"llm": {"messages": [ChatMessage.from_user("hi")], "streaming_callback": build_streaming_callback(sink)}})
+
+
+def _drain(sink: QueueSink) -> str:
+    text = []
+    while not sink.queue.empty():
+        text.append(sink.queue.get())
+    return "".join(text)
+
+
+def test_stream_sink_is_abstract():
+    with pytest.raises(TypeError):
+        StreamSink()
+
+
+def test_rate_limit_before_first_chunk_is_retried():
+    llm, sink = FlakyLLM(fail_after_chunks=0), QueueSink()
+    result = _run(llm, sink)
+    assert llm.calls == 2
+    assert result["llm"]["replies"][0].text == "Hello world"
+    assert _drain(sink) == "Hello world"
+
+
+def test_rate_limit_after_first_chunk_is_not_retried():
+    llm, sink = FlakyLLM(fail_after_chunks=1), QueueSink()
+    with pytest.raises(Exception):
+        _run(llm, sink)
+    assert llm.calls == 1
+    assert _drain(sink) == "Hello"
+
+
+def test_file_sink_appends_chunks(tmp_path):
+    sink = FileSink(tmp_path / "report.md")
+    callback = build_streaming_callback(sink)
+    for text in ("# Report", "\n", "body", ""):
+        callback(StreamingChunk(content=text))
+    sink.close()
+    assert (tmp_path / "report.md").read_text(encoding="utf-8") == "# Report\nbody"
@@ -0,0 +1,36 @@
+import threading
+
+from src.nlp.tokenizer import TokenCountCache
+
+
+def test_counts_survive_in_the_sqlite_tier(tmp_path):
+    path = tmp_path / "token_counts.sqlite3"
+    cache = TokenCountCache(path)
+    digest = cache.digest("some page")
+    cache.set("model", digest, 42)
+
+    fresh = TokenCountCache(path)
+    assert fresh.get("model", digest) == 42
+    assert fresh.get("other model", digest) is None
+
+
+def test_set_path_closes_the_connections_of_every_thread(tmp_path):
+    cache = TokenCountCache(tmp_path / "first.sqlite3")
+    worker = threading.Thread(target=lambda: cache.get("model", "digest"))
+    worker.start()
+    worker.join()
+    old_connections = list(cache._connections)
+    assert len(old_connections) == 2
+
+    cache.set_path(tmp_path / "second.sqlite3")
+
+    for conn in old_connections:
+        try:
+            conn.execute("SELECT 1")
+        except Exception as e:
+            assert "closed" in str(e)
+        else:
+            raise AssertionError("connection was left open")
+    assert len(cache._connections) == 1
+    cache.set_path(None)
+    assert cache._connections == []
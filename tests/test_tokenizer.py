@@ -0,0 +1,127 @@
+import math
+import threading
+import types
+
+import pytest
+
+from src.nlp import GeminiTokenCounter, TokenCountCache, count_gemini_tokens_many, count_openai_tokens_many, set_gemini_client, set_openai_encoder
+from src.nlp import tokenizer
+
+
+class RecordingCounts:
+    """Exact Gemini counts at 2 chars per token, remembering which texts were counted."""
+
+    def __init__(self):
+        self.counted = []
+
+    def count(self, text, model):
+        self.counted.append(text)
+        return math.ceil(len(text) / 2)
+
+    def count_many(self, texts, model, max_workers=8):
+        return [self.count(text, model) for text in texts]
+
+
+@pytest.fixture
+def exact_counts(monkeypatch):
+    counts = RecordingCounts()
+    monkeypatch.setattr(tokenizer, "count_gemini_tokens", counts.count)
+    monkeypatch.setattr(tokenizer, "count_gemini_tokens_many", counts.count_many)
+    return counts
+
+
+def test_estimate_mode_counts_calibration_samples_exactly(exact_counts):
+    counter = GeminiTokenCounter("gemini-test", mode="estimate", calibration_samples=2)
+    assert counter.chars_per_token == 4.0
+
+    assert counter("a" * 40) == 20
+    assert counter("b" * 60) == 30
+    assert counter.chars_per_token == 2.0
+
+    # the fitted ratio is used from here on, no further exact counts
+    assert counter("c" * 100) == 50
+    assert exact_counts.counted == ["a" * 40, "b" * 60]
+
+
+def test_estimate_mode_batch_counts_only_missing_samples_exactly(exact_counts):
+    counter = GeminiTokenCounter("gemini-test", mode="estimate", calibration_samples=2)
+    counter("a" * 40)
+
+    assert counter.count_many(["b" * 20, "c" * 30, "d" * 50]) == [10, 15, 25]
+    assert exact_counts.counted == ["a" * 40, "b" * 20]
+
+
+def test_exact_mode_never_estimates(exact_counts):
+    counter = GeminiTokenCounter("gemini-test", mode="exact", calibration_samples=1)
+    counter("a" * 10)
+    counter("b" * 10)
+    counter.count_many(["c" * 10])
+    assert exact_counts.counted == ["a" * 10, "b" * 10, "c" * 10]
+
+
+def test_is_near_only_flags_estimates_within_the_margin():
+    estimate = GeminiTokenCounter("gemini-test", mode="estimate", margin=0.1)
+    assert estimate.is_near(95, 100)
+    assert estimate.is_near(110, 100)
+    assert not estimate.is_near(89, 100)
+    assert not estimate.is_near(111, 100)
+    assert not GeminiTokenCounter("gemini-test", mode="exact").is_near(100, 100)
+
+
+class RecordingGeminiClient:
+    """Counts one token per word and remembers every requested text."""
+
+    def __init__(self):
+        self.requested = []
+        self._lock = threading.Lock()
+        self.models = types.SimpleNamespace(count_tokens=self.count_tokens)
+
+    def count_tokens(self, model, contents):
+        with self._lock:
+            self.requested.append(contents)
+        return types.SimpleNamespace(total_tokens=len(contents.split()))
+
+
+class RecordingEncoder:
+    name = "recording"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_batch(self, texts, num_threads=8):
+        self.encoded.extend(texts)
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def fresh_count_cache(monkeypatch):
+    monkeypatch.setattr(tokenizer, "token_count_cache", TokenCountCache())
+
+
+def test_gemini_batch_keeps_order_and_requests_each_text_once(fresh_count_cache):
+    client = RecordingGeminiClient()
+    set_gemini_client(client)
+    try:
+        texts = ["b b", "a", "b b", "c c c", "a"]
+        assert count_gemini_tokens_many(texts, "gemini-test", max_workers=4) == [2, 1, 2, 3, 1]
+        assert sorted(client.requested) == ["a", "b b", "c c c"]
+
+        # cached texts are not requested again
+        assert count_gemini_tokens_many(["d d d d", "a"], "gemini-test") == [4, 1]
+        assert sorted(client.requested) == ["a", "b b", "c c c", "d d d d"]
+    finally:
+        set_gemini_client(None)
+
+
+def test_openai_batch_keeps_order_and_encodes_each_text_once(fresh_count_cache):
+    encoder = RecordingEncoder()
+    set_openai_encoder(encoder)
+    try:
+        texts = ["b b", "a", "b b", "c c c", "a"]
+        assert count_openai_tokens_many(texts) == [2, 1, 2, 3, 1]
+        assert encoder.encoded == ["b b", "a", "c c c"]
+
+        assert count_openai_tokens_many(["a", "d d d d"]) == [1, 4]
+        assert encoder.encoded == ["b b", "a", "c c c", "d d d d"]
+    finally:
+        set_openai_encoder(None)
@@ -0,0 +1,95 @@
+import math
+import re
+
+import pytest
+
+from src.nlp import trimming
+from src.nlp.trimming import token_offsets, trim_to_token_budget
+
+
+class WordEncoder:
+    """Stand-in for o200k_base: words with their leading whitespace, split into pieces of up to six characters."""
+
+    def encode(self, text, disallowed_special=()):
+        self._pieces = re.findall(r"\s*\S{1,6}|\s+", text)
+        return list(range(len(self._pieces)))
+
+    def decode_with_offsets(self, tokens):
+        offsets, position = [], 0
+        for piece in self._pieces:
+            offsets.append(position)
+            position += len(piece)
+        return "".join(self._pieces), offsets
+
+
+@pytest.fixture(autouse=True)
+def word_encoder(monkeypatch):
+    monkeypatch.setattr(trimming, "get_openai_encoder", lambda: WordEncoder())
+    trimming._token_offsets_cache.clear()
+    yield
+    trimming._token_offsets_cache.clear()
+
+
+def test_short_text_is_kept():
+    assert trim_to_token_budget("one two three", 10) == ("one two three", 3)
+
+
+def test_cut_prefers_paragraph_break():
+    text = " ".join(f"w{i}" for i in range(95)) + "\n\n" + " ".join(f"x{i}" for i in range(50))
+    trimmed, tokens = trim_to_token_budget(text, 100)
+    assert trimmed.endswith("w94")
+    assert tokens == 95
+
+
+def test_cut_prefers_sentence_end():
+    text = " ".join(f"word{i}" for i in range(92)) + ". " + " ".join(f"more{i}" for i in range(50))
+    trimmed, _ = trim_to_token_budget(text, 100)
+    assert trimmed.endswith("word91.")
+
+
+def test_boundary_search_is_capped_in_chars():
+    # the paragraph break is within 10% of the kept text but further back than max_boundary_chars
+    text = " ".join(f"w{i}" for i in range(900)) + "\n\n" + " ".join(f"x{i}" for i in range(200))
+    trimmed, tokens = trim_to_token_budget(text, 1000, max_boundary_chars=200)
+    assert "\n\n" in trimmed
+    assert tokens > 950
+
+    trimmed, tokens = trim_to_token_budget(text, 1000, max_boundary_chars=1000)
+    assert trimmed.endswith("w899")
+    assert tokens == 900
+
+
+def test_cut_never_ends_mid_word():
+    # every "sentence" is two tokens, an odd budget lands inside a word
+    text = " ".join(["sentence"] * 300)
+    trimmed, tokens = trim_to_token_budget(text, 101)
+    assert trimmed.endswith("sentence")
+    assert tokens <= 101
+
+
+def test_counts_are_scaled_to_the_given_total():
+    text = " ".join(f"w{i}" for i in range(200))
+    trimmed, tokens = trim_to_token_budget(text, 50, total_tokens=400)
+    assert tokens <= 50
+    assert len(trimmed.split()) <= 25
+
+
+def test_returned_count_is_the_scaled_estimate_of_the_kept_text():
+    text = " ".join(f"w{i}" for i in range(28))
+    # 21 of 28 tokens scale to 27.000000000000004 Gemini tokens, one over the budget once rounded up
+    trimmed, tokens = trim_to_token_budget(text, 27, total_tokens=36)
+    kept = len(trimmed.split())
+    assert tokens == math.ceil(kept * 36 / 28)
+    assert tokens <= 27
+    assert kept == 20
+
+
+def test_offsets_cache_is_keyed_by_digest_and_bounded(monkeypatch):
+    monkeypatch.setattr(trimming, "TOKEN_OFFSETS_CACHE_SIZE", 2)
+    texts = ["a b", "c d e", "f"]
+    for text in texts:
+        token_offsets(text)
+
+    assert len(trimming._token_offsets_cache) == 2
+    assert all(len(key) == 32 for key in trimming._token_offsets_cache)
+    assert token_offsets("c d e") == [0, 1, 3]